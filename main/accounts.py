@@ -0,0 +1,28 @@
+import functools
+
+from django.contrib.auth.hashers import make_password
+
+from main.backends import forget_users
+from main.models import *
+from project_college.settings import DEFAULT_ACCOUNT_PASSWORD
+
+
+@functools.lru_cache(maxsize=None)
+def default_password_hash():
+    # A full PBKDF2 run, done once per process and shared by every new or reset account.
+    # The default password is no secret anyway, it has to be changed on the first login
+    return make_password(DEFAULT_ACCOUNT_PASSWORD)
+
+
+def set_default_password(user):
+    user.password = default_password_hash()
+    user.must_change_password = True
+
+
+def reset_passwords(users):
+    # users: User queryset, reset with one UPDATE however many accounts it has
+    user_ids = list(users.values_list('pk', flat=True))
+    count = users.update(password=default_password_hash(), must_change_password=True)
+    # update() skips post_save, the cached users still carry the old password hash
+    forget_users(user_ids)
+    return count
@@ -1,16 +1,43 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
+from .accounts import reset_passwords
+from .notifications import deliver_notification
+from .timetable import schedule_queryset
 from .models import *
 
 # Register your models here.
 admin.site.register(Module)
 admin.site.register(User)
-admin.site.register(Schedule)
 admin.site.register(Student)
-admin.site.register(Group)
 admin.site.register(Qualification)
 admin.site.register(Specialization)
 admin.site.register(Topic)
 admin.site.register(Mark)
 admin.site.register(DismissedStudent)
-admin.site.register(Notification)
+admin.site.register(NotificationReadState)
+admin.site.register(NotificationInbox)
 admin.site.register(CompletedTopic)
+admin.site.register(ImportJob)
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    def get_queryset(self, request):
+        return schedule_queryset()
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        deliver_notification(form.instance)
+
+
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    actions = ['reset_passwords']
+
+    @admin.action(description=_('Сбросить пароли студентов выбранных групп'))
+    def reset_passwords(self, request, queryset):
+        count = reset_passwords(User.objects.filter(student_profile__group__in=queryset))
+        self.message_user(request, _('Пароли сброшены: %d') % count)
@@ -0,0 +1,34 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+from project_college.settings import USER_CACHE, USER_CACHE_TIMEOUT
+
+
+def user_cache():
+    return caches[USER_CACHE]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_users(user_ids):
+    keys = [user_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        # now for this request, after commit for requests that cached the old row meanwhile
+        user_cache().delete_many(keys)
+        transaction.on_commit(lambda: user_cache().delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    # AuthenticationMiddleware loads the session's user on every request, the row is served from the cache.
+    # Anything changing users without save() (queryset.update) has to call forget_users
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache().set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, register
+from django.core.cache.backends.locmem import LocMemCache
+
+from project_college.settings import ROLE_CACHE, USER_CACHE
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    # Invalidation of cached users and roles only reaches the process that made the change when the cache
+    # is per process, the other gunicorn workers would keep serving revoked rights and old passwords
+    errors = []
+    enabled = [('main.backends.CachedModelBackend', settings.AUTHENTICATION_BACKENDS, USER_CACHE),
+               ('main.middleware.SessionRoleContextMiddleware', settings.MIDDLEWARE, ROLE_CACHE)]
+    for path, setting, alias in enabled:
+        if path in setting and isinstance(caches[alias], LocMemCache):
+            errors.append(Error(f'{path} needs a cache shared by all processes, "{alias}" is a LocMemCache',
+                                hint='Use FileBasedCache, DatabaseCache or Redis, see settings_production',
+                                id='main.E001'))
+    return errors
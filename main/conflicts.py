@@ -0,0 +1,80 @@
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from main.models import *
+from main.timetable import group_conflicts_key, schedule_cache, schedule_queryset
+from project_college.settings import SCHEDULE_CACHE_TIMEOUT
+
+
+def lesson_intervals(entries):
+    # (sch, day, start, end, group, teachers), lessons without both times can't overlap anything
+    for sch in entries:
+        if sch.time_start is not None and sch.time_end is not None:
+            yield sch, sch.date, sch.time_start, sch.time_end, sch.group, list(sch.teachers.all())
+
+
+def find_conflicts(intervals):
+    # Every group and teacher gets one lane per day, a lane sorted by start is swept once
+    # keeping the lesson that ends last, so a day costs O(n log n) instead of comparing all pairs
+    lanes = {}
+    for sch, day, start, end, group, teachers in intervals:
+        resources = [('teacher', teacher) for teacher in teachers]
+        if group is not None:
+            resources.append(('group', group))
+        for kind, resource in resources:
+            lanes.setdefault((day, kind, resource.pk), (resource, []))[1].append((start, end, sch))
+
+    conflicts = []
+    for (day, kind, resource_pk), (resource, lane) in sorted(lanes.items(), key=lambda item: item[0]):
+        lane.sort(key=lambda lesson: lesson[:2])
+        latest = None
+        for lesson in lane:
+            if latest is not None and lesson[0] < latest[1]:
+                conflicts.append({'day': day, 'kind': kind, 'resource': resource, 'first': latest[2],
+                                  'second': lesson[2]})
+            if latest is None or lesson[1] > latest[1]:
+                latest = lesson
+    return conflicts
+
+
+def lesson_label(sch):
+    return f'{sch.group}, {sch.module} {sch.time_start:%H:%M}-{sch.time_end:%H:%M}'
+
+
+def conflict_message(conflict):
+    if conflict['kind'] == 'teacher':
+        who = _('Преподаватель %s') % conflict['resource']
+    else:
+        who = _('Группа %s') % conflict['resource']
+    return f'{DAY_NAMES[conflict["day"]]}: {who} - {lesson_label(conflict["first"])} / ' \
+           f'{lesson_label(conflict["second"])}'
+
+
+def timetable_conflicts():
+    return find_conflicts(lesson_intervals(schedule_queryset()))
+
+
+def group_conflicts(group_id):
+    # Lessons of the group plus every lesson of its teachers, so double-booked teachers show up too
+    teachers = Schedule.teachers.through.objects.filter(schedule__group_id=group_id).values('user_id')
+    entries = schedule_queryset().filter(Q(group_id=group_id) | Q(teachers__in=teachers)).distinct()
+    return [conflict for conflict in find_conflicts(lesson_intervals(entries))
+            if group_id in (conflict['first'].group_id, conflict['second'].group_id)]
+
+
+def get_group_conflicts(group_id):
+    # group_conflicts cached next to the group's schedule, main.timetable.invalidate_schedules clears both
+    key = group_conflicts_key(group_id)
+    conflicts = schedule_cache().get(key)
+    if conflicts is None:
+        conflicts = group_conflicts(group_id)
+        schedule_cache().set(key, conflicts, SCHEDULE_CACHE_TIMEOUT)
+    return conflicts
+
+
+def lesson_conflicts(sch, date, time_start, time_end, group, teachers):
+    # Conflicts of a lesson that is about to be saved, only overlapping rows are loaded
+    others = schedule_queryset().filter(date=date, time_start__lt=time_end, time_end__gt=time_start).filter(
+        Q(group=group) | Q(teachers__in=teachers)).exclude(pk=sch.pk).distinct()
+    intervals = [*lesson_intervals(others), (sch, date, time_start, time_end, group, list(teachers))]
+    return [conflict for conflict in find_conflicts(intervals) if sch in (conflict['first'], conflict['second'])]
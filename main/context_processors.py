@@ -0,0 +1,9 @@
+from main.notifications import notification_state
+
+
+def notifications(request):
+    # Unread count for the header, only computed (from cache) when a template uses it
+    role = getattr(request, 'role', None)
+    if role is None or not (role.is_student or role.is_teacher):
+        return {}
+    return {'unread_notifications': lambda: notification_state(request.user)[1]}
@@ -0,0 +1,70 @@
+import itertools
+import re
+import tempfile
+
+import openpyxl
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from main.models import *
+
+
+def sheet_title(title):
+    return re.sub(r'[\[\]:*?/\\]', ' ', title)[:31] or '-'
+
+
+def journal_rows(group_id, module_id):
+    # Students and their marks are read with the same ordering and merged, one row in memory at a time
+    topics = list(Topic.objects.filter(module_id=module_id).only('pk', 'name', 'hours'))
+    compl_topics = {}
+    for topic_id, date_time in CompletedTopic.objects.filter(module_id=module_id).order_by('pk').values_list(
+            'topic_id', 'date_time'):
+        compl_topics.setdefault(topic_id, date_time)
+    summaries = {summary.student_id: summary for summary in MarkSummary.objects.filter(
+        module_id=module_id, student__group_id=group_id)}
+
+    yield ['№', _('ФИО'), *[topic.name for topic in topics], _('Текущая средняя оценка'), _('Количество пропусков')]
+    yield [None, _('Дата проведения занятия'),
+           *[timezone.localtime(compl_topics[topic.pk]).date() if topic.pk in compl_topics else None
+             for topic in topics]]
+    yield [None, _('Количество учебных часов'), *[topic.hours for topic in topics],
+           _('Итого часов') + f': {sum(topic.hours for topic in topics)}']
+
+    ordering = ['last_name', 'first_name', 'middle_name', 'pk']
+    students = Student.objects.filter(group_id=group_id).order_by(*ordering).only(*ordering).iterator()
+    marks = Mark.objects.filter(module_id=module_id, student__group_id=group_id).order_by(
+        *[f'student__{field}' for field in ordering]).values_list('student_id', 'topic_id', 'mark').iterator()
+    marks = itertools.groupby(marks, key=lambda mark: mark[0])
+    student_marks = next(marks, (None, None))
+
+    for n, student in enumerate(students, start=1):
+        row_marks = {}
+        if student_marks[0] == student.pk:
+            row_marks = {topic_id: mark for student_id, topic_id, mark in student_marks[1]}
+            student_marks = next(marks, (None, None))
+
+        summary = summaries.get(student.pk)
+        yield [n, str(student),
+               *[(row_marks[topic.pk] or _('н')) if topic.pk in row_marks else None for topic in topics],
+               summary.average() if summary else 0, summary.absences if summary else 0]
+
+
+def write_journal_sheet(excel, group, module):
+    sheet = excel.create_sheet(sheet_title(str(module)))
+    for row in journal_rows(group.pk, module.pk):
+        sheet.append(row)
+    return sheet
+
+
+def journal_workbook(group, modules):
+    # Write-only workbooks keep rows on disk, the result is a temporary file removed once it's closed
+    excel = openpyxl.Workbook(write_only=True)
+    for module in modules:
+        write_journal_sheet(excel, group, module)
+    if not excel.worksheets:
+        excel.create_sheet(sheet_title(group.name))
+
+    file = tempfile.TemporaryFile()
+    excel.save(file)
+    file.seek(0)
+    return file
@@ -3,7 +3,9 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.utils.translation import gettext_lazy as _
 from project_college.settings import DEFAULT_ACCOUNT_PASSWORD
+from .accounts import set_default_password
 from .models import *
+from .conflicts import conflict_message, lesson_conflicts
 
 
 class UserLoginForm(AuthenticationForm):
@@ -41,7 +43,7 @@ class UserForm(forms.ModelForm):
 
     def save(self, commit=True):
         user = super().save(commit=False)
-        user.set_password(DEFAULT_ACCOUNT_PASSWORD)
+        set_default_password(user)
         if commit:
             user.save()
         return user
@@ -96,7 +98,7 @@ class StudentForm(forms.ModelForm):
                 student.user.save()
         except ObjectDoesNotExist:
             user = User(student_profile=student, username=student.username)
-            user.set_password(DEFAULT_ACCOUNT_PASSWORD)
+            set_default_password(user)
             if commit:
                 user.save()
 
@@ -143,7 +145,7 @@ class ResetPassword(forms.Form):
         except ObjectDoesNotExist:
             raise ValidationError(_('Пользователя с таким логином не существует'))
 
-        user.set_password(DEFAULT_ACCOUNT_PASSWORD)
+        set_default_password(user)
         user.save()
         return cleaned_data
 
@@ -167,7 +169,10 @@ class ChangePassword(forms.Form):
             raise ValidationError(_('Неправильный текущий пароль'))
         if cleaned_data['new_password'] != cleaned_data['repeat_new_password']:
             raise ValidationError(_('Пароли не совпадают'))
+        if cleaned_data['new_password'] == DEFAULT_ACCOUNT_PASSWORD:
+            raise ValidationError(_('Новый пароль не должен совпадать со стандартным'))
         self.current_user.set_password(cleaned_data['new_password'])
+        self.current_user.must_change_password = False
         self.current_user.save()
         return cleaned_data
 
@@ -189,10 +194,30 @@ class ScheduleForm(forms.ModelForm):
             'group': forms.HiddenInput()
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        time_start, time_end = cleaned_data.get('time_start'), cleaned_data.get('time_end')
+
+        if time_start is not None and time_end is not None and cleaned_data.get('date') is not None:
+            if time_end <= time_start:
+                raise ValidationError(_('Время конца должно быть позже времени начала'))
+
+            lesson = Schedule(pk=self.instance.pk, group=cleaned_data.get('group'), module=cleaned_data.get('module'),
+                              date=cleaned_data['date'], time_start=time_start, time_end=time_end)
+            conflicts = lesson_conflicts(lesson, lesson.date, time_start, time_end, lesson.group,
+                                         cleaned_data.get('teachers', []))
+            if conflicts:
+                raise ValidationError([conflict_message(conflict) for conflict in conflicts])
+
+        return cleaned_data
+
 
 class AddTopicsFileForm(forms.Form):
     module = forms.ModelChoiceField(queryset=Module.objects.get_queryset(), label=_('Предмет'))
     excel_file = forms.FileField(label=_('Excel файл'))
+    update_existing = forms.BooleanField(label=_('Обновить существующие темы'), required=False, initial=True,
+                                         help_text=_('Темы с тем же названием и порядковым номером будут обновлены, '
+                                                     'а не добавлены повторно'))
 
     def clean(self):
         cleaned_data = super().clean()
@@ -219,4 +244,11 @@ class AddStudentsFileForm(forms.Form):
 class TopicForm(forms.ModelForm):
     class Meta:
         model = Topic
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class ReportForm(forms.Form):
+    semester = forms.TypedChoiceField(label=_('Семестр'), coerce=int, choices=[
+        (0, _('Все семестры')),
+        *[(i, f'{i} ' + _('семестр')) for i in range(1, 9)]
+    ])
@@ -1,9 +1,13 @@
 import datetime
-import os
 import openpyxl
 
+from django.db import transaction
+from django.db.models import Max
+
+from main.accounts import default_password_hash, set_default_password
 from main.models import *
-from project_college.settings import MEDIA_ROOT, DEFAULT_ACCOUNT_PASSWORD
+from main.notifications import deliver_broadcasts
+from main.search import index_people
 from django.utils.translation import gettext_lazy as _
 
 
@@ -26,168 +30,209 @@ def add_student(student):
 
     student.save()
     user = User(student_profile=student, username=student.username)
-    user.set_password(DEFAULT_ACCOUNT_PASSWORD)
+    set_default_password(user)
     user.save()
 
     return True,
 
 
-def excel_handler_topic(request):
+def excel_handler_topic(file_path, module_id, progress=None, update_existing=True):
     errors = []
     objects = []
 
-    file_path = f'{MEDIA_ROOT}/files/excel/{request.user.pk}.xlsx'.replace("\\", "/")
-    with open(file_path, 'wb+') as file:
-        for chunk in request.FILES['excel_file'].chunks():
-            file.write(chunk)
-
-            excel = openpyxl.open(file, read_only=True)
-            excel = excel.active
-
-            # Кол-во часов, тема, что задано
-            count = 2
-            for i in list(excel)[1:]:
-                hours = i[0].value
-
-                topic = None
-                try:
-                    topic = i[1].value.strip()
-                except AttributeError:
-                    errors.append(_('Пустая ячейка') + f': столбец - 2; строка - {count}')
-
-                homework = None
-                try:
-                    homework = i[2].value.strip()
-                except AttributeError:
-                    errors.append(_('Пустая ячейка') + f': столбец - 3; строка - {count}')
+    # Кол-во часов, тема, что задано
+    for count, row in read_excel_rows(file_path, 3):
+        hours, topic, homework = row[0], cell_str(row[1]), cell_str(row[2])
 
-                if type(hours) is not int:
-                    errors.append(_('Неверный формат данных') + f': столбец - 1; строка - {count}')
+        if topic is None:
+            errors.append(excel_error(_('Пустая ячейка'), 2, count))
+        if homework is None:
+            errors.append(excel_error(_('Пустая ячейка'), 3, count))
+        if type(hours) is not int:
+            errors.append(excel_error(_('Неверный формат данных'), 1, count))
 
-                count += 1
-                objects.append((hours, topic, homework))
-    os.remove(file_path)
+        objects.append((hours, topic, homework))
+        if progress:
+            progress(len(objects))
 
+    result = {'inserted': 0, 'updated': 0, 'unchanged': 0}
     if not errors:
-        for hours, topic, homework in objects:
-            Topic(
-                name=topic,
-                hours=hours,
-                home_task=homework,
-                module_id=request.POST['module']
-            ).save()
-
-    return errors
-
-
-def excel_handler_student(request):
+        result = upsert_topics(module_id, objects, update_existing)
+
+    return errors, result
+
+
+def next_topic_position(module_id):
+    return (Topic.objects.filter(module_id=module_id).aggregate(Max('position'))['position__max'] or 0) + 1
+
+
+def upsert_topics(module_id, objects, update_existing=True):
+    # Topics are matched by name (the n-th topic of a name for repeated names) and take their position from the row
+    # order in the file, so rows added in the middle or topics created before positions existed are not duplicated
+    result = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    new_topics = []
+    changed_topics = []
+
+    with transaction.atomic():
+        offset = 0
+        existing = {}
+        if update_existing:
+            for topic in Topic.objects.filter(module_id=module_id).order_by('position', 'name', 'pk'):
+                existing.setdefault(topic.name, []).append(topic)
+        else:
+            offset = next_topic_position(module_id) - 1
+
+        for position, (hours, name, homework) in enumerate(objects, start=offset + 1):
+            matches = existing.get(name)
+            topic = matches.pop(0) if matches else None
+            if topic is None:
+                new_topics.append(Topic(
+                    name=name,
+                    position=position,
+                    hours=hours,
+                    home_task=homework,
+                    module_id=module_id
+                ))
+            elif topic.hours != hours or topic.home_task != homework or topic.position != position:
+                topic.hours = hours
+                topic.home_task = homework
+                topic.position = position
+                changed_topics.append(topic)
+            else:
+                result['unchanged'] += 1
+
+        Topic.objects.bulk_create(new_topics)
+        Topic.objects.bulk_update(changed_topics, ['hours', 'home_task', 'position'])
+
+    result['inserted'] = len(new_topics)
+    result['updated'] = len(changed_topics)
+    return result
+
+
+def cell_str(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def excel_error(msg, column, row):
+    return {'row': row, 'column': column, 'msg': str(msg)}
+
+
+def read_excel_rows(file_path, columns):
+    # Streams rows after the header as (row_number, values)
+    excel = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        for count, row in enumerate(excel.active.iter_rows(min_row=2, max_col=columns, values_only=True), start=2):
+            if any(value is not None for value in row):
+                yield count, tuple(row) + (None,) * (columns - len(row))
+    finally:
+        excel.close()
+
+
+def count_excel_rows(file_path):
+    excel = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        return max((excel.active.max_row or 1) - 1, 0)
+    finally:
+        excel.close()
+
+
+def parse_birthday(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    elif isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value).strip(), '%d.%m.%y').date()
+
+
+def excel_handler_student(file_path, group_id, progress=None):
     errors = []
-    objects = []
-
-    file_path = f'{MEDIA_ROOT}/files/excel/{request.user.pk}.xlsx'.replace("\\", "/")
-    with open(file_path, 'wb+') as file:
-        for chunk in request.FILES['excel_file'].chunks():
-            file.write(chunk)
-
-            excel = openpyxl.open(file, read_only=True)
-            excel = excel.active
-
-            # first name, last name, Отчество, Номер телефона, Число; месяц; год рождения, email,
-            # Номер по поименной книге, Дата и № приказа о зачислении, Домашний адрес обучающегося, Движение контингента
-            # Дополнительные сведения
-            count = 2
-            for i in list(excel)[1:]:
-                username = None
-                try:
-                    username = i[0].value.strip()
-                    st_exist = student_exist(username)
-                    if st_exist[0]:
-                        errors.append(st_exist[1] + ': ' +
-                                      _('столбец') + ' - 1; ' + _('строка') + ' - ' + str(count))
-                except AttributeError:
-                    errors.append(
-                        _('Пустая ячейка') + ': ' + _('столбец') + ' - 1; ' + _('строка') + ' - ' + str(count))
-
-                first_name = None
-                try:
-                    first_name = i[1].value.strip()
-                except AttributeError:
-                    errors.append(_('Пустая ячейка') + ': ' + _('столбец') + ' - 1; ' + _('строка') + ' - ' + str(count))
-
-                last_name = None
-                try:
-                    last_name = i[2].value.strip()
-                except AttributeError:
-                    errors.append(_('Пустая ячейка') + ': ' + _('столбец') + ' - 2; ' + _('строка') + ' - ' + str(count))
-
-                middle_name = None
-                if i[3].value:
-                    middle_name = i[3].value.strip()
-
-                phone_number = None
-                if i[4].value:
-                    phone_number = i[4].value.strip()
-
-                birthday = None
-                try:
-                    if i[5].value:
-                        if type(i[5].value) is str:
-                            birthday = datetime.datetime.strptime(i[5].value.strip(), '%d.%m.%y')
-                        elif type(i[5].value) is datetime.datetime:
-                            birthday = datetime.datetime(year=i[5].value.year, month=i[5].value.month,
-                                                         day=i[5].value.day)
-                        birthday = datetime.date(birthday.year, birthday.month, birthday.day)
-                except ValueError:
-                    errors.append(_('Неверный формат даты, нужный формат - дд.мм.гг'))
-
-                email = None
-                if i[6].value:
-                    email = i[6].value.strip()
-
-                book_number = None
-                if i[7].value:
-                    book_number = i[7].value.strip()
-
-                date_in = None
-                if i[8].value:
-                    date_in = i[8].value.strip()
-
-                home_address = None
-                if i[9].value:
-                    home_address = i[9].value.strip()
-
-                move = None
-                if i[10].value:
-                    move = i[10].value.strip()
-
-                additional = None
-                if i[11].value:
-                    additional = i[11].value.strip()
-
-                count += 1
-                objects.append((username, first_name, last_name, middle_name, phone_number, birthday, email,
-                                book_number, date_in, home_address, move, additional))
-    os.remove(file_path)
+    students = []
+
+    # first name, last name, Отчество, Номер телефона, Число; месяц; год рождения, email,
+    # Номер по поименной книге, Дата и № приказа о зачислении, Домашний адрес обучающегося, Движение контингента
+    # Дополнительные сведения
+    for count, row in read_excel_rows(file_path, 12):
+        username, first_name, last_name = cell_str(row[0]), cell_str(row[1]), cell_str(row[2])
+        for column, value in enumerate((username, first_name, last_name), start=1):
+            if value is None:
+                errors.append(excel_error(_('Пустая ячейка'), column, count))
+
+        birthday = None
+        if cell_str(row[5]):
+            try:
+                birthday = parse_birthday(row[5])
+            except ValueError:
+                errors.append(excel_error(_('Неверный формат даты, нужный формат - дд.мм.гг'), 6, count))
+
+        number = row[7]
+        if isinstance(number, float) and number.is_integer():
+            number = int(number)
+        number = cell_str(number)
+        if number is not None:
+            if number.isdigit():
+                number = int(number)
+            else:
+                errors.append(excel_error(_('Неверный формат данных'), 8, count))
+
+        students.append((count, Student(
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            middle_name=cell_str(row[3]),
+            phone_number=cell_str(row[4]),
+            birthday=birthday,
+            email=cell_str(row[6]),
+            number=number,
+            enrollment_date=cell_str(row[8]),
+            home_address=cell_str(row[9]),
+            courses=cell_str(row[10]),
+            additional_info=cell_str(row[11]),
+            group_id=group_id
+        )))
+        if progress:
+            progress(len(students))
+
+    usernames = [student.username for count, student in students if student.username]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    existing.update(Student.objects.filter(username__in=usernames).values_list('username', flat=True))
+    seen = set()
+    for count, student in students:
+        # an empty login is already reported as an empty cell
+        if not student.username:
+            continue
+        if student.username in existing or student.username in seen:
+            errors.append(excel_error(_('Пользователь с таким логином уже существует'), 1, count))
+        seen.add(student.username)
 
     if not errors:
-        for username, first_name, last_name, middle_name, phone_number, birthday, email, book_number, date_in, home_address, move, additional in objects:
-            result = add_student(Student(
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                middle_name=middle_name,
-                phone_number=phone_number,
-                birthday=birthday,
-                email=email,
-                number=book_number,
-                enrollment_date=date_in,
-                home_address=home_address,
-                courses=move,
-                additional_info=additional,
-                group_id=request.POST['group']
-            ))
-
-            if not result[0]:
-                errors.append(result[1])
-
-    return errors
+        add_students([student for count, student in students])
+
+    return errors, {'inserted': 0 if errors else len(students)}
+
+
+def add_students(students):
+    password = default_password_hash()
+
+    with transaction.atomic():
+        students = Student.objects.bulk_create(students)
+        if any(student.pk is None for student in students):
+            pks = dict(Student.objects.filter(username__in=[student.username for student in students]).values_list(
+                'username', 'pk'))
+            for student in students:
+                student.pk = pks[student.username]
+
+        User.objects.bulk_create([User(
+            student_profile=student,
+            username=student.username,
+            password=password,
+            must_change_password=True
+        ) for student in students])
+        # bulk_create skips post_save, so the search index and the inboxes are filled here
+        index_people('student', students, replace=False)
+        deliver_broadcasts(User.objects.filter(student_profile__in=students).values_list('pk', flat=True),
+                           {'students'})
+
+    return students
@@ -0,0 +1,206 @@
+import datetime
+import math
+import time
+from collections import Counter
+
+from django.db import transaction
+
+from main.models import *
+from main.timetable import invalidate_schedules, schedule_queryset
+from project_college.settings import LESSON_HOURS, LESSON_SLOTS, MAX_GROUP_LESSONS_PER_DAY, SEMESTER_WEEKS
+
+
+def solve_timetable(assignments, days, slots, max_per_day=None, time_limit=10, fixed=()):
+    # assignments: [{'group': id, 'teachers': [id], 'lessons': lessons per week}]
+    # fixed: {(('group' or 'teacher', id), (day, slot))} taken by lessons that stay where they are.
+    # Returns ([(assignment index, day, slot)], Counter of unplaced lessons per assignment index).
+    # Lessons are placed greedily, hardest first, each repair only moves lessons that block one cell,
+    # so the runtime grows with lessons * cells and time_limit bounds the repairs
+    deadline = time.perf_counter() + time_limit
+    cells = [(day, slot) for day in range(days) for slot in range(slots)]
+    busy = {}
+    placed = {}
+    day_lessons = Counter()
+    group_day_load = Counter()
+
+    def resources(n):
+        return [('group', assignments[n]['group']), *(('teacher', teacher) for teacher in assignments[n]['teachers'])]
+
+    def blockers(n, cell):
+        return {busy[(resource, cell)] for resource in resources(n) if (resource, cell) in busy}
+
+    def is_fixed(n, cell):
+        return any((resource, cell) in fixed for resource in resources(n))
+
+    def fits(n, cell):
+        if max_per_day is not None and group_day_load[(assignments[n]['group'], cell[0])] >= max_per_day:
+            return False
+        return not is_fixed(n, cell) and not blockers(n, cell)
+
+    def place(unit, n, cell):
+        for resource in resources(n):
+            busy[(resource, cell)] = unit
+        placed[unit] = (n, cell)
+        day_lessons[(n, cell[0])] += 1
+        group_day_load[(assignments[n]['group'], cell[0])] += 1
+
+    def remove(unit):
+        n, cell = placed.pop(unit)
+        for resource in resources(n):
+            del busy[(resource, cell)]
+        day_lessons[(n, cell[0])] -= 1
+        group_day_load[(assignments[n]['group'], cell[0])] -= 1
+        return n, cell
+
+    def score(n, cell):
+        # Spread a module over the week, balance the group's days, keep lessons early and without gaps
+        day, slot = cell
+        group = ('group', assignments[n]['group'])
+        gap = slot > 0 and (group, (day, slot - 1)) not in busy and (group, (day, slot - 1)) not in fixed
+        return day_lessons[(n, day)], group_day_load[(group[1], day)], gap, slot
+
+    def best_cell(n, exclude=None):
+        free = [cell for cell in cells if cell != exclude and fits(n, cell)]
+        return min(free, key=lambda cell: score(n, cell)) if free else None
+
+    def repair(unit, n):
+        # Frees a cell by moving every lesson that blocks it somewhere else
+        options = []
+        for cell in cells:
+            if max_per_day is not None and group_day_load[(assignments[n]['group'], cell[0])] >= max_per_day:
+                continue
+            if is_fixed(n, cell):
+                continue
+            options.append((len(blockers(n, cell)), score(n, cell), cell))
+        for count, _, cell in sorted(options):
+            if time.perf_counter() > deadline:
+                return False
+            moved = []
+            for blocker in blockers(n, cell):
+                blocker_n, blocker_cell = remove(blocker)
+                moved.append((blocker, blocker_n, blocker_cell))
+            # the cell must stay free while the blockers look for new ones
+            place(unit, n, cell)
+            targets = []
+            for blocker, blocker_n, blocker_cell in moved:
+                target = best_cell(blocker_n)
+                if target is None:
+                    break
+                place(blocker, blocker_n, target)
+                targets.append(blocker)
+            if len(targets) == len(moved):
+                return True
+            for blocker in targets:
+                remove(blocker)
+            remove(unit)
+            for blocker, blocker_n, blocker_cell in moved:
+                place(blocker, blocker_n, blocker_cell)
+        return False
+
+    load = Counter()
+    for assignment in assignments:
+        for resource in [('group', assignment['group']), *(('teacher', t) for t in assignment['teachers'])]:
+            load[resource] += assignment['lessons']
+    units = [n for n, assignment in enumerate(assignments) for _ in range(assignment['lessons'])]
+    order = sorted(range(len(units)), key=lambda unit: (
+        -max(load[resource] for resource in resources(units[unit])), -assignments[units[unit]]['lessons'], unit))
+
+    unplaced = Counter()
+    for unit in order:
+        n = units[unit]
+        cell = best_cell(n)
+        if cell is not None:
+            place(unit, n, cell)
+        elif time.perf_counter() > deadline or not repair(unit, n):
+            unplaced[n] += 1
+
+    return sorted((n, day, slot) for n, (day, slot) in placed.values()), unplaced
+
+
+def weekly_lessons(module, semesters):
+    hours = sum(getattr(module, f'hours_{semester}') for semester in semesters)
+    return math.ceil(hours / (SEMESTER_WEEKS * LESSON_HOURS))
+
+
+def timetable_assignments(semesters):
+    # One assignment per (group, module) found in Schedule, with the teachers of all its rows,
+    # whatever days and times it has now
+    assignments = {}
+    for sch in schedule_queryset().exclude(group=None).exclude(module=None):
+        key = (sch.group_id, sch.module_id)
+        if key not in assignments:
+            assignments[key] = {'group': sch.group_id, 'module': sch.module, 'teachers': set(),
+                                'lessons': weekly_lessons(sch.module, semesters)}
+        assignments[key]['teachers'].update(teacher.pk for teacher in sch.teachers.all())
+    for assignment in assignments.values():
+        assignment['teachers'] = sorted(assignment['teachers'])
+    return [assignment for assignment in assignments.values() if assignment['lessons']]
+
+
+def lesson_times():
+    return [tuple(datetime.time.fromisoformat(value) for value in slot) for slot in LESSON_SLOTS]
+
+
+def kept_cells(replaced):
+    # The cells taken by the timed rows apply_timetable keeps, that is every row outside the replaced
+    # (group, module) pairs, as solve_timetable's fixed. A row takes every slot its times overlap
+    times = lesson_times()
+    cells = set()
+    for sch in schedule_queryset().exclude(time_start=None).exclude(time_end=None):
+        if (sch.group_id, sch.module_id) in replaced:
+            continue
+        resources = [('teacher', teacher.pk) for teacher in sch.teachers.all()]
+        if sch.group_id is not None:
+            resources.append(('group', sch.group_id))
+        for slot, (start, end) in enumerate(times):
+            if sch.time_start < end and start < sch.time_end:
+                cells.update((resource, (sch.date, slot)) for resource in resources)
+    return cells
+
+
+def generate_timetable(semesters, time_limit=10):
+    # A (group, module) that can't be placed in full keeps its current rows: the one with the most unplaced
+    # lessons is left out, its rows join the fixed cells and the rest is solved again. Returns (assignments,
+    # placements, Counter of lessons not placed per kept assignment index), every placed assignment is placed in full
+    deadline = time.perf_counter() + time_limit
+    assignments = timetable_assignments(semesters)
+    kept = Counter()
+    while True:
+        active = [n for n in range(len(assignments)) if n not in kept]
+        replaced = {(assignments[n]['group'], assignments[n]['module'].pk) for n in active}
+        placements, unplaced = solve_timetable([assignments[n] for n in active], len(DAY_NAMES), len(LESSON_SLOTS),
+                                               MAX_GROUP_LESSONS_PER_DAY, max(deadline - time.perf_counter(), 0),
+                                               kept_cells(replaced))
+        if not unplaced:
+            break
+        worst = max(unplaced, key=lambda n: (unplaced[n], -n))
+        kept[active[worst]] = unplaced[worst]
+    return assignments, [(active[n], day, slot) for n, day, slot in placements], kept
+
+
+def apply_timetable(assignments, placements):
+    # Replaces the lessons of every placed (group, module) with the generated ones, placements come from
+    # generate_timetable, so each of them is placed in full. Modules without lessons in the chosen semesters
+    # and the kept ones keep their rows, Schedule is where the group, module and teachers links live
+    times = lesson_times()
+    placed = {(assignments[n]['group'], assignments[n]['module'].pk) for n, day, slot in placements}
+    group_ids = {group_id for group_id, module_id in placed}
+
+    with transaction.atomic():
+        replaced = [pk for pk, group_id, module_id in Schedule.objects.filter(group_id__in=group_ids).values_list(
+            'pk', 'group_id', 'module_id') if (group_id, module_id) in placed]
+        Schedule.objects.filter(pk__in=replaced).delete()
+        schedules = Schedule.objects.bulk_create([Schedule(
+            group_id=assignments[n]['group'],
+            module=assignments[n]['module'],
+            date=day,
+            time_start=times[slot][0],
+            time_end=times[slot][1]
+        ) for n, day, slot in placements])
+        Schedule.teachers.through.objects.bulk_create([
+            Schedule.teachers.through(schedule_id=sch.pk, user_id=teacher_id)
+            for sch, (n, day, slot) in zip(schedules, placements) for teacher_id in assignments[n]['teachers']
+        ], batch_size=500)
+        invalidate_schedules(group_ids, {teacher for assignment in assignments for teacher in assignment['teachers']})
+
+    return schedules
@@ -0,0 +1,83 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from main.functions import *
+from main.models import *
+from project_college.settings import IMPORT_JOBS_STALE_TIMEOUT, IMPORT_JOBS_WORKERS
+
+IMPORT_HANDLERS = {
+    'students': lambda job, progress: excel_handler_student(job.file.path, job.params['group'], progress),
+    'topics': lambda job, progress: excel_handler_topic(job.file.path, job.params['module'], progress,
+                                                        job.params.get('update_existing', False)),
+}
+PROGRESS_STEP = 100
+
+executor = None
+
+
+def run_import_job(pk):
+    # Claims the job so that the in-process pool and run_import_jobs never process it twice
+    now = timezone.now()
+    if not ImportJob.objects.filter(pk=pk, status='pending').update(status='running', started_at=now, updated_at=now):
+        return False
+    job = ImportJob.objects.get(pk=pk)
+    processed = [0]
+
+    def progress(rows):
+        processed[0] = rows
+        if rows % PROGRESS_STEP == 0:
+            ImportJob.objects.filter(pk=pk).update(rows_processed=rows, updated_at=timezone.now())
+
+    try:
+        job.rows_total = count_excel_rows(job.file.path)
+        ImportJob.objects.filter(pk=pk).update(rows_total=job.rows_total)
+        job.errors, job.result = IMPORT_HANDLERS[job.kind](job, progress)
+    except Exception as e:
+        job.errors = [{'row': None, 'column': None, 'msg': str(e)}]
+
+    job.file.delete(save=False)
+    job.rows_processed = processed[0]
+    job.status = 'failed' if job.errors else 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'rows_total', 'rows_processed', 'errors', 'result', 'status', 'finished_at'])
+    return True
+
+
+def fail_stale_import_jobs():
+    # Jobs whose thread or process died (worker restart, kill) would stay pending or running forever
+    cutoff = timezone.now() - datetime.timedelta(seconds=IMPORT_JOBS_STALE_TIMEOUT)
+    stale = list(ImportJob.objects.filter(status__in=['pending', 'running'], updated_at__lt=cutoff))
+    for job in stale:
+        job.file.delete(save=False)
+        job.status = 'failed'
+        job.errors = [{'row': None, 'column': None, 'msg': _('Импорт был прерван, загрузите файл еще раз')}]
+        job.finished_at = timezone.now()
+        job.save(update_fields=['file', 'status', 'errors', 'finished_at', 'updated_at'])
+    return len(stale)
+
+
+def run_import_job_thread(pk):
+    try:
+        run_import_job(pk)
+    finally:
+        connection.close()
+
+
+def start_import_job(job):
+    global executor
+
+    if not IMPORT_JOBS_WORKERS:
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=IMPORT_JOBS_WORKERS, thread_name_prefix='import-job')
+    transaction.on_commit(lambda: executor.submit(run_import_job_thread, job.pk))
+
+
+def create_import_job(request, kind, file, params):
+    job = ImportJob.objects.create(kind=kind, file=file, params=params, created_by=request.user)
+    start_import_job(job)
+    return job
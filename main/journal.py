@@ -0,0 +1,354 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Q, Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from main.models import *
+from project_college.settings import MARK_VALUES
+
+
+def mark_contribution(value):
+    # marks_count, marks_sum, absences
+    if value:
+        return 1, value, 0
+    elif value is None:
+        return 0, 0, 1
+    return 0, 0, 0
+
+
+def build_journal_grid(topics, students, marks, completed_topics, summaries=None):
+    # (topic_id, student_id) -> mark; topic_id -> completed topic
+    marks_index = {}
+    for mark in marks:
+        marks_index.setdefault((mark.topic_id, mark.student_id), mark)
+
+    compl_index = {}
+    for compl_topic in completed_topics:
+        compl_index.setdefault(compl_topic.topic_id, compl_topic)
+
+    journal = {
+        'students': students,
+        'topics': topics,
+        'marks': [],
+        'total_hours': 0,
+        'mid_marks': [],
+        'absences': [],
+    }
+    totals = [[0, 0, 0] for _ in students]
+
+    for topic in topics:
+        topic_marks = [(topic, compl_index.get(topic.pk, ' '), 'date')]
+        journal['total_hours'] += topic.hours
+
+        for n, student in enumerate(students):
+            mark = marks_index.get((topic.pk, student.pk))
+            if mark is None:
+                topic_marks.append((' ', student.pk))
+                continue
+
+            if summaries is None:
+                for i, value in enumerate(mark_contribution(mark.mark)):
+                    totals[n][i] += value
+            topic_marks.append((mark.pk, mark.mark))
+        journal['marks'].append(topic_marks)
+
+    if summaries is not None:
+        summaries_index = {summary.student_id: summary for summary in summaries}
+        for n, student in enumerate(students):
+            summary = summaries_index.get(student.pk)
+            if summary is not None:
+                totals[n] = [summary.marks_count, summary.marks_sum, summary.absences]
+
+    for marks_count, marks_sum, absences in totals:
+        journal['mid_marks'].append(mid_mark(marks_count, marks_sum))
+        journal['absences'].append(absences)
+
+    return journal
+
+
+def mid_mark(marks_count, marks_sum):
+    return round(marks_sum / marks_count, 1) if marks_sum else 0
+
+
+def fake_journal(topics_count, students_count):
+    # Unsaved grid input of the given size, for benchmarks and tests of build_journal_grid
+    topics = [Topic(pk=t, name=f'Topic {t}', hours=2, module_id=1) for t in range(1, topics_count + 1)]
+    students = [Student(pk=s, first_name=f'{s}', last_name=f'{s}') for s in range(1, students_count + 1)]
+    marks = [Mark(pk=t * students_count + s, topic_id=t, student_id=s, module_id=1, mark=(t + s) % 100 or None)
+             for t in range(1, topics_count + 1) for s in range(1, students_count + 1) if (t + s) % 7]
+    completed = [CompletedTopic(pk=t, topic_id=t, module_id=1) for t in range(1, topics_count + 1, 2)]
+    return topics, students, marks, completed
+
+
+def build_journal(sch):
+    students = list(sch.group.student_set.all())
+    return build_journal_grid(
+        list(sch.module.topic_set.all()),
+        students,
+        Mark.objects.filter(module_id=sch.module_id, student__in=students).only('pk', 'mark', 'topic', 'student'),
+        CompletedTopic.objects.filter(module_id=sch.module_id).order_by('pk'),
+        MarkSummary.objects.filter(module_id=sch.module_id, student__in=students)
+    )
+
+
+def journal_totals(sch):
+    # (mid marks, absences) of the journal rows in page order, read back after a cell save
+    student_ids = list(Student.objects.filter(group_id=sch.group_id).values_list('pk', flat=True))
+    summaries = {summary.student_id: summary for summary in MarkSummary.objects.filter(
+        module_id=sch.module_id, student_id__in=student_ids)}
+    mid_marks, absences = [], []
+    for student_id in student_ids:
+        summary = summaries.get(student_id)
+        mid_marks.append(mid_mark(summary.marks_count, summary.marks_sum) if summary else 0)
+        absences.append(summary.absences if summary else 0)
+    return mid_marks, absences
+
+
+def add_mark_delta(deltas, student_id, value, sign=1):
+    delta = deltas.setdefault(student_id, [0, 0, 0])
+    for i, change in enumerate(mark_contribution(value)):
+        delta[i] += sign * change
+
+
+def apply_summary_deltas(module_id, deltas, now=None):
+    # deltas: student_id -> [marks_count, marks_sum, absences]
+    deltas = {student_id: delta for student_id, delta in deltas.items() if any(delta)}
+    if not deltas or module_id is None:
+        return
+    now = now or timezone.now()
+
+    summaries = {summary.student_id: summary for summary in MarkSummary.objects.filter(
+        module_id=module_id, student_id__in=list(deltas)).only('pk', 'student')}
+    changed = []
+    for student_id, (marks_count, marks_sum, absences) in deltas.items():
+        summary = summaries.get(student_id)
+        if summary is None:
+            continue
+        summary.marks_count = F('marks_count') + marks_count
+        summary.marks_sum = F('marks_sum') + marks_sum
+        summary.absences = F('absences') + absences
+        summary.updated_at = now
+        changed.append(summary)
+    MarkSummary.objects.bulk_update(changed, ['marks_count', 'marks_sum', 'absences', 'updated_at'])
+
+    # a missing summary can't take a delta, count it from the marks already written
+    missing = [student_id for student_id in deltas if student_id not in summaries]
+    if missing:
+        refresh_mark_summaries(module_id, missing)
+
+
+def refresh_mark_summaries(module_id, student_ids=None):
+    # Recounts summaries from Mark rows, used where the previous mark value is unknown
+    marks = Mark.objects.filter(module_id=module_id)
+    summaries = MarkSummary.objects.filter(module_id=module_id)
+    if student_ids is not None:
+        marks = marks.filter(student_id__in=student_ids)
+        summaries = summaries.filter(student_id__in=student_ids)
+
+    totals = {row['student_id']: row for row in marks.values('student_id').annotate(
+        marks_count=Count('pk', filter=Q(mark__gt=0)),
+        marks_sum=Coalesce(Sum('mark', filter=Q(mark__gt=0)), 0),
+        absences=Count('pk', filter=Q(mark=None)),
+    )}
+
+    now = timezone.now()
+    with transaction.atomic():
+        summaries.exclude(student_id__in=list(totals)).delete()
+        existing = {summary.student_id: summary for summary in summaries}
+        changed = []
+        for student_id, row in totals.items():
+            summary = existing.get(student_id)
+            if summary is None:
+                continue
+            summary.marks_count = row['marks_count']
+            summary.marks_sum = row['marks_sum']
+            summary.absences = row['absences']
+            summary.updated_at = now
+            changed.append(summary)
+        MarkSummary.objects.bulk_update(changed, ['marks_count', 'marks_sum', 'absences', 'updated_at'])
+
+        MarkSummary.objects.bulk_create([MarkSummary(
+            student_id=student_id,
+            module_id=module_id,
+            marks_count=row['marks_count'],
+            marks_sum=row['marks_sum'],
+            absences=row['absences']
+        ) for student_id, row in totals.items() if student_id not in existing])
+
+
+def parse_journal_date(value):
+    date_time = datetime.datetime.strptime(value, '%d.%m.%y')
+    now = timezone.localtime()
+    return timezone.make_aware(date_time.replace(hour=now.hour, minute=now.minute, second=now.second))
+
+
+def parse_journal_post(data):
+    # mark_id or topic_id, student_id; date, compl_topic_id or date, empty, topic_id;
+    diff = {
+        'new_marks': {},
+        'marks': {},
+        'deleted_marks': set(),
+        'new_dates': {},
+        'dates': {},
+        'deleted_dates': set(),
+    }
+    msg = None
+
+    for key, value in data.items():
+        ids = key.split('_')
+        value = value.strip()
+
+        if ids[0] == 'date':
+            if len(ids) == 3 and ids[1] == 'empty' and ids[2].isdigit():
+                if value:
+                    try:
+                        diff['new_dates'][int(ids[2])] = parse_journal_date(value)
+                    except ValueError:
+                        msg = _('Неправильный формат даты, нужный формат: дд.мм.гг')
+            elif len(ids) == 2 and ids[1].isdigit():
+                if not value:
+                    diff['deleted_dates'].add(int(ids[1]))
+                else:
+                    try:
+                        diff['dates'][int(ids[1])] = parse_journal_date(value)
+                    except ValueError:
+                        pass
+        elif all(i.isdigit() for i in ids):
+            if value in MARK_VALUES:
+                mark = int(value) if value.isdigit() else None
+                if len(ids) == 1:
+                    diff['marks'][int(ids[0])] = mark
+                elif len(ids) == 2:
+                    diff['new_marks'][(int(ids[0]), int(ids[1]))] = mark
+            elif value == '' and len(ids) == 1:
+                diff['deleted_marks'].add(int(ids[0]))
+
+    return diff, msg
+
+
+def get_journal_version(sch):
+    journal_version, created = JournalVersion.objects.get_or_create(group_id=sch.group_id, module_id=sch.module_id)
+    return journal_version.version
+
+
+def bump_journal_version(sch, version=None):
+    journal_version = JournalVersion.objects.filter(group_id=sch.group_id, module_id=sch.module_id)
+    if version is not None:
+        journal_version = journal_version.filter(version=version)
+    return journal_version.update(version=F('version') + 1)
+
+
+def apply_journal_diff(sch, teacher, diff, version=None):
+    # Returns renamed journal inputs {old_name: new_name}, or None if the journal version is outdated
+    now = timezone.now()
+    renamed = {}
+
+    with transaction.atomic():
+        get_journal_version(sch)
+        if not bump_journal_version(sch, version):
+            return None
+
+        changed_marks = []
+        deltas = {}
+        marks = Mark.objects.filter(module_id=sch.module_id).only('pk', 'mark', 'teacher', 'topic', 'student').in_bulk(
+            [*diff['marks'], *diff['deleted_marks']])
+        values = dict(diff['marks'])
+        new_values = dict(diff['new_marks'])
+        # A cell can only hold one mark, an "empty" cell from an outdated page updates the existing mark
+        if new_values:
+            cells = Mark.objects.filter(
+                module_id=sch.module_id,
+                topic_id__in={topic_id for topic_id, student_id in new_values},
+                student_id__in={student_id for topic_id, student_id in new_values}
+            ).only('pk', 'mark', 'teacher', 'topic', 'student')
+        else:
+            cells = []
+        for mark in cells:
+            key = (mark.topic_id, mark.student_id)
+            if key in new_values:
+                marks[mark.pk] = mark
+                values[mark.pk] = new_values.pop(key)
+                renamed[f'{mark.topic_id}_{mark.student_id}'] = str(mark.pk)
+        for pk, value in values.items():
+            mark = marks.get(pk)
+            if mark is not None and mark.mark != value:
+                add_mark_delta(deltas, mark.student_id, mark.mark, -1)
+                add_mark_delta(deltas, mark.student_id, value)
+                mark.mark = value
+                mark.teacher = teacher
+                mark.date_time = now
+                changed_marks.append(mark)
+        Mark.objects.bulk_update(changed_marks, ['mark', 'teacher', 'date_time'])
+
+        deleted_marks = [marks[pk] for pk in diff['deleted_marks'] if pk in marks]
+        if deleted_marks:
+            # One DELETE without the per-row post_delete signal, the deltas below already cover these marks
+            queryset = Mark.objects.filter(pk__in=[mark.pk for mark in deleted_marks])
+            queryset._raw_delete(queryset.db)
+        for mark in deleted_marks:
+            add_mark_delta(deltas, mark.student_id, mark.mark, -1)
+            renamed[str(mark.pk)] = f'{mark.topic_id}_{mark.student_id}'
+
+        new_marks = Mark.objects.bulk_create([Mark(
+            student_id=student_id,
+            teacher=teacher,
+            topic_id=topic_id,
+            module_id=sch.module_id,
+            mark=value
+        ) for (topic_id, student_id), value in new_values.items()])
+        for mark in new_marks:
+            add_mark_delta(deltas, mark.student_id, mark.mark)
+            if mark.pk is not None:
+                renamed[f'{mark.topic_id}_{mark.student_id}'] = str(mark.pk)
+
+        apply_summary_deltas(sch.module_id, deltas, now)
+
+        changed_dates = []
+        compl_topics = CompletedTopic.objects.filter(module_id=sch.module_id).in_bulk(
+            [*diff['dates'], *diff['deleted_dates']])
+        dates = dict(diff['dates'])
+        new_dates = dict(diff['new_dates'])
+        if new_dates:
+            for compl_topic in CompletedTopic.objects.filter(module_id=sch.module_id, topic_id__in=new_dates):
+                compl_topics[compl_topic.pk] = compl_topic
+                dates[compl_topic.pk] = new_dates.pop(compl_topic.topic_id)
+                renamed[f'date_empty_{compl_topic.topic_id}'] = f'date_{compl_topic.pk}'
+        for pk, date_time in dates.items():
+            compl_topic = compl_topics.get(pk)
+            if compl_topic is not None:
+                compl_topic.date_time = date_time
+                compl_topic.teacher = teacher
+                changed_dates.append(compl_topic)
+        CompletedTopic.objects.bulk_update(changed_dates, ['date_time', 'teacher'])
+
+        deleted_dates = [compl_topics[pk] for pk in diff['deleted_dates'] if pk in compl_topics]
+        if deleted_dates:
+            CompletedTopic.objects.filter(pk__in=[compl_topic.pk for compl_topic in deleted_dates]).delete()
+        for compl_topic in deleted_dates:
+            renamed[f'date_{compl_topic.pk}'] = f'date_empty_{compl_topic.topic_id}'
+
+        new_dates = CompletedTopic.objects.bulk_create([CompletedTopic(
+            date_time=date_time,
+            topic_id=topic_id,
+            teacher=teacher,
+            module_id=sch.module_id
+        ) for topic_id, date_time in new_dates.items()])
+        for compl_topic in new_dates:
+            if compl_topic.pk is not None:
+                renamed[f'date_empty_{compl_topic.topic_id}'] = f'date_{compl_topic.pk}'
+
+    return renamed
+
+
+def save_journal(sch, teacher, data):
+    diff, msg = parse_journal_post(data)
+    apply_journal_diff(sch, teacher, diff)
+    return msg
+
+
+def save_journal_cells(sch, teacher, cells, version):
+    diff, msg = parse_journal_post(cells)
+    return apply_journal_diff(sch, teacher, diff, version), msg
@@ -0,0 +1,195 @@
+import datetime
+import random
+import statistics
+import threading
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main.accounts import default_password_hash
+from main.journal import refresh_mark_summaries
+from main.models import *
+from main.notifications import deliver_notification
+from project_college.settings import DEFAULT_ACCOUNT_PASSWORD
+
+MARK_CHOICES = [None, *range(40, 101, 5)]
+# a successful login or logout redirects, every other step renders a page
+REDIRECT_ROUTES = {'login_page', 'logout'}
+
+
+def seed_college(groups=10, students_per_group=25, modules_per_group=8, topics_per_module=40, seed=0):
+    # A college with a year of marks: every student has a mark or a blank for every topic of the group's modules.
+    # Every account has the default password, see main.accounts
+    rnd = random.Random(seed)
+    password = default_password_hash()
+    year_start = timezone.now() - datetime.timedelta(days=365)
+
+    admin = User.objects.create(username='loadtest_admin', first_name='Admin', last_name='Loadtest',
+                                is_junioradmin=True, password=password)
+    teachers = User.objects.bulk_create([User(
+        username=f'loadtest_teacher_{n}', first_name='Teacher', last_name=f'Loadtest {n}', is_teacher=True,
+        password=password
+    ) for n in range(max(groups * modules_per_group // 6, 1))])
+    modules = Module.objects.bulk_create([Module(
+        module_name=f'Module {n}', exam_type='e', hours_1=topics_per_module
+    ) for n in range(modules_per_group * 2)])
+    topics = {module.pk: Topic.objects.bulk_create([Topic(
+        name=f'Topic {n}', position=n, hours=2, module=module
+    ) for n in range(topics_per_module)]) for module in modules}
+    CompletedTopic.objects.bulk_create([CompletedTopic(
+        date_time=year_start + datetime.timedelta(days=n * 365 // topics_per_module), topic=topic,
+        module_id=topic.module_id, teacher=rnd.choice(teachers)
+    ) for module_topics in topics.values() for n, topic in enumerate(module_topics)])
+
+    students, schedules = [], []
+    for n in range(groups):
+        group = Group.objects.create(name=f'Group {n}')
+        group_students = Student.objects.bulk_create([Student(
+            username=f'loadtest_student_{n}_{i}', first_name='Student', last_name=f'Loadtest {i}', group=group
+        ) for i in range(students_per_group)])
+        students.extend(User.objects.bulk_create([User(
+            username=student.username, first_name=student.first_name, last_name=student.last_name,
+            student_profile=student, password=password
+        ) for student in group_students]))
+
+        for day, module in enumerate(rnd.sample(modules, modules_per_group)):
+            sch = Schedule.objects.create(group=group, module=module, date=day % len(DAY_NAMES))
+            sch.teachers.add(rnd.choice(teachers))
+            schedules.append(sch)
+            Mark.objects.bulk_create([Mark(
+                student=student, topic=topic, module=module, mark=rnd.choice(MARK_CHOICES),
+                teacher=rnd.choice(teachers)
+            ) for topic in topics[module.pk] for student in group_students], batch_size=1000)
+
+    for module in modules:
+        refresh_mark_summaries(module.pk)
+    for n in range(20):
+        deliver_notification(Notification.objects.create(content=f'Notification {n}', for_students=True,
+                                                         for_teachers=True))
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return {'admin': admin, 'teachers': teachers, 'students': students, 'schedules': schedules}
+
+
+def login_steps(user):
+    return [('login_page', 'post', reverse('login_page'),
+             {'username': user.username, 'password': DEFAULT_ACCOUNT_PASSWORD})]
+
+
+def student_journey(college, rnd):
+    # Steps: (route name, method, url, POST data)
+    user = rnd.choice(college['students'])
+    schedules = [sch for sch in college['schedules'] if sch.group_id == user.student_profile.group_id]
+    return [
+        *login_steps(user),
+        ('student-modules', 'get', reverse('student-modules'), None),
+        *(('student-marks', 'get', reverse('student-marks', kwargs={'sch_pk': sch.pk}), None)
+          for sch in rnd.sample(schedules, min(3, len(schedules)))),
+        ('student-notifs', 'get', reverse('student-notifs'), None),
+        ('logout', 'get', reverse('logout'), None),
+    ]
+
+
+def teacher_journey(college, rnd):
+    sch = rnd.choice(college['schedules'])
+    user = sch.teachers.all()[0]
+    url = reverse('teacher-journal', kwargs={'sch_pk': sch.pk})
+    # A few cells of the journal: "topic_student" names update the existing mark of the cell
+    topic_ids = list(Topic.objects.filter(module_id=sch.module_id).values_list('pk', flat=True))
+    student_ids = list(Student.objects.filter(group_id=sch.group_id).values_list('pk', flat=True))
+    cells = {f'{rnd.choice(topic_ids)}_{rnd.choice(student_ids)}': str(rnd.choice(MARK_CHOICES[1:]))
+             for _ in range(5)}
+    return [
+        *login_steps(user),
+        ('teacher-groups', 'get', reverse('teacher-groups'), None),
+        ('teacher-journal', 'get', url, None),
+        ('teacher-journal save', 'post', url, cells),
+        ('logout', 'get', reverse('logout'), None),
+    ]
+
+
+def admin_journey(college, rnd):
+    group_id = rnd.choice(college['schedules']).group_id
+    return [
+        *login_steps(college['admin']),
+        ('dashboard', 'get', reverse('dashboard'), None),
+        ('students-groups', 'get', reverse('students-groups'), None),
+        ('students-list', 'get', reverse('students-list', kwargs={'group_id': group_id}), None),
+        ('teachers-list', 'get', reverse('teachers-list'), None),
+        ('groups-list', 'get', reverse('groups-list'), None),
+        ('modules-list', 'get', reverse('modules-list'), None),
+        ('logout', 'get', reverse('logout'), None),
+    ]
+
+
+JOURNEYS = {'student': student_journey, 'teacher': teacher_journey, 'admin': admin_journey}
+
+
+def run_journeys(college, journeys, iterations, concurrency=1, seed=0):
+    # Runs every journey `iterations` times in each of `concurrency` threads, each thread is one client.
+    # Returns ({route: {'latencies': [s], 'queries': [count], 'errors': count}}, wall time in seconds)
+    results = {}
+    lock = threading.Lock()
+
+    def worker(n):
+        rnd = random.Random(seed + n)
+        client = Client()
+        # the steps are built up front, so their lookups stay out of the timings
+        plans = [JOURNEYS[name](college, rnd) for _ in range(iterations) for name in journeys]
+        samples = []
+        for steps in plans:
+            for route, method, url, data in steps:
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    elapsed = time.perf_counter() - start
+                expected = 302 if route in REDIRECT_ROUTES else 200
+                samples.append((route, elapsed, len(queries), response.status_code != expected))
+        with lock:
+            for route, elapsed, queries, error in samples:
+                result = results.setdefault(route, {'latencies': [], 'queries': [], 'errors': 0})
+                result['latencies'].append(elapsed)
+                result['queries'].append(queries)
+                result['errors'] += error
+
+    def thread_worker(n):
+        try:
+            worker(n)
+        finally:
+            # every thread opens its own connection
+            connection.close()
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        # in the calling thread, so a test sees its own database
+        worker(0)
+    else:
+        threads = [threading.Thread(target=thread_worker, args=(n,)) for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def route_summary(result, wall_time):
+    latencies = result['latencies']
+    return {
+        'requests': len(latencies),
+        'p50': statistics.median(latencies),
+        'p95': percentile(latencies, 0.95),
+        'rps': len(latencies) / wall_time,
+        'queries': statistics.mean(result['queries']),
+        'max_queries': max(result['queries']),
+        'errors': result['errors'],
+    }
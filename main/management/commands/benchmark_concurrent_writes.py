@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from main.models import *
+from project_college.settings import BASE_DIR
+
+STUDENTS = 30
+TOPICS = 40
+MARKS_PER_TRANSACTION = 5
+
+
+class Command(BaseCommand):
+    help = 'Writes journal marks from several processes into one SQLite file, with the stock and the tuned backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=5, help='Processes, like gunicorn workers')
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per process')
+        # used by the processes this command starts
+        parser.add_argument('--seed', action='store_true')
+        parser.add_argument('--worker', type=int)
+        parser.add_argument('--start-at', type=float)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            return self.seed()
+        if options['worker'] is not None:
+            return self.work(options['worker'], options['transactions'], options['start_at'])
+
+        self.stdout.write(f'{"backend":<10}{"committed":>10}{"locked":>8}{"tx/s":>8}{"p50 ms":>8}{"p95 ms":>8}')
+        for name, tuning in (('stock', '0'), ('tuned', '1')):
+            env = {**os.environ, 'DJANGO_DB_NAME': os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3'),
+                   'DJANGO_SQLITE_TUNING': tuning}
+            self.manage(env, 'migrate', '-v', '0')
+            self.manage(env, 'benchmark_concurrent_writes', '--seed')
+
+            # the processes start together once all of them have loaded Django
+            start_at = time.time() + 5
+            processes = [subprocess.Popen([
+                sys.executable, os.path.join(BASE_DIR, 'manage.py'), 'benchmark_concurrent_writes',
+                '--worker', str(n), '--transactions', str(options['transactions']), '--start-at', str(start_at)
+            ], env=env, stdout=subprocess.PIPE) for n in range(options['workers'])]
+            results = [json.loads(process.communicate()[0]) for process in processes]
+            elapsed = max(result['finished'] for result in results) - start_at
+
+            latencies = sorted(latency for result in results for latency in result['latencies'])
+            committed = len(latencies)
+            locked = sum(result['locked'] for result in results)
+            p50 = statistics.median(latencies) if latencies else 0
+            p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+            self.stdout.write(f'{name:<10}{committed:>10}{locked:>8}{committed / elapsed:>8.0f}'
+                              f'{p50 * 1000:>8.1f}{p95 * 1000:>8.1f}')
+
+    def manage(self, env, *args):
+        subprocess.run([sys.executable, os.path.join(BASE_DIR, 'manage.py'), *args], env=env, check=True)
+
+    def seed(self):
+        group = Group.objects.create(name='Group 1')
+        module = Module.objects.create(module_name='Module 1', exam_type='e')
+        Student.objects.bulk_create([Student(username=f'student_{i}', first_name='Name', last_name=f'Student {i}',
+                                             group=group) for i in range(STUDENTS)])
+        Topic.objects.bulk_create([Topic(name=f'Topic {i}', position=i, hours=2, module=module)
+                                   for i in range(TOPICS)])
+
+    def work(self, worker, transactions, start_at):
+        # Journal-like transactions: read a topic's marks, then update or add them
+        rnd = random.Random(worker)
+        module = Module.objects.get()
+        topics = list(Topic.objects.values_list('pk', flat=True))
+        students = list(Student.objects.values_list('pk', flat=True))
+        connection.close()
+        time.sleep(max(start_at - time.time(), 0))
+
+        latencies, locked = [], 0
+        for _ in range(transactions):
+            topic = rnd.choice(topics)
+            student_ids = rnd.sample(students, MARKS_PER_TRANSACTION)
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    marks = {mark.student_id: mark for mark in Mark.objects.filter(topic_id=topic,
+                                                                                    student_id__in=student_ids)}
+                    for student_id in student_ids:
+                        mark = marks.get(student_id) or Mark(topic_id=topic, student_id=student_id, module=module)
+                        mark.mark = rnd.randint(1, 100)
+                        mark.save()
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+        self.stdout.write(json.dumps({'latencies': latencies, 'locked': locked, 'finished': time.time()}))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.journal import build_journal_grid, fake_journal
+
+
+class Command(BaseCommand):
+    help = 'Measures journal grid build time for growing group and module sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for topics_count, students_count in ((30, 15), (60, 30), (120, 30), (240, 60), (480, 120)):
+            data = fake_journal(topics_count, students_count)
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                build_journal_grid(*data)
+                timings.append(time.perf_counter() - start)
+
+            best = min(timings)
+            cells = topics_count * students_count
+            self.stdout.write(f'{topics_count:>4} topics x {students_count:>3} students: '
+                              f'{best * 1000:8.2f} ms, {best / cells * 1e6:.3f} us/cell')
@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from main.journal import build_journal
+from main.models import *
+
+STUDENTS_PER_GROUP = 25
+TOPICS_PER_MODULE = 40
+MODULES_PER_GROUP = 10
+MODULES = 20
+
+
+class Command(BaseCommand):
+    help = 'Measures journal queries on a seeded test database with and without the Mark/CompletedTopic indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--marks', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Runs in a throwaway test database, the real one is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            schedules = self.seed(options['marks'])
+            self.stdout.write(f'seeded {Mark.objects.count()} marks in {time.perf_counter() - start:.1f} s')
+
+            after = self.measure(schedules, options['repeat'])
+            self.drop_indexes()
+            before = self.measure(schedules, options['repeat'])
+
+            for name in after:
+                self.stdout.write(f'{name:<22} before: {before[name] * 1000:8.2f} ms   '
+                                  f'after: {after[name] * 1000:8.2f} ms')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, marks_count):
+        groups_count = max(marks_count // (STUDENTS_PER_GROUP * TOPICS_PER_MODULE * MODULES_PER_GROUP), 1)
+        modules = Module.objects.bulk_create([Module(module_name=f'Module {n}', exam_type='e') for n in range(MODULES)])
+        topics = {module.pk: Topic.objects.bulk_create([Topic(
+            name=f'Topic {n}', position=n, hours=2, module=module
+        ) for n in range(TOPICS_PER_MODULE)]) for module in modules}
+        CompletedTopic.objects.bulk_create([CompletedTopic(
+            date_time=timezone.now(), topic=topic, module_id=topic.module_id
+        ) for module_topics in topics.values() for topic in module_topics])
+
+        schedules = []
+        for n in range(groups_count):
+            group = Group.objects.create(name=f'Group {n}')
+            students = Student.objects.bulk_create([Student(
+                username=f'student_{n}_{i}', first_name='Name', last_name=f'Student {i}', group=group
+            ) for i in range(STUDENTS_PER_GROUP)])
+
+            for module in random.sample(modules, MODULES_PER_GROUP):
+                schedules.append(Schedule.objects.create(group=group, module=module, date=n % 6))
+                Mark.objects.bulk_create([Mark(
+                    student=student, topic=topic, module=module, mark=random.choice((None, 2, 3, 4, 5))
+                ) for topic in topics[module.pk] for student in students], batch_size=1000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return schedules
+
+    def measure(self, schedules, repeat):
+        samples = random.Random(0).sample(schedules, min(repeat, len(schedules)))
+        student_ids = [sch.group.student_set.values_list('pk', flat=True).first() for sch in samples]
+        queries = {
+            'journal marks': lambda sch, student_id: list(Mark.objects.filter(
+                module_id=sch.module_id, student__group_id=sch.group_id).only('pk', 'mark', 'topic', 'student')),
+            'student module marks': lambda sch, student_id: list(Mark.objects.filter(
+                module_id=sch.module_id, student_id=student_id)),
+            'completed topic': lambda sch, student_id: CompletedTopic.objects.filter(
+                topic__module_id=sch.module_id, module_id=sch.module_id).first(),
+            'build_journal': lambda sch, student_id: build_journal(sch),
+        }
+
+        timings = {}
+        for name, query in queries.items():
+            start = time.perf_counter()
+            for sch, student_id in zip(samples, student_ids):
+                query(sch, student_id)
+            timings[name] = (time.perf_counter() - start) / len(samples)
+        return timings
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in (Mark, CompletedTopic):
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+                for constraint in model._meta.constraints:
+                    editor.remove_constraint(model, constraint)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
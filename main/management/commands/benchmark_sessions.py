@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.models import *
+from main.notifications import deliver_notification
+
+SESSION_ENGINES = ['db', 'cached_db', 'cache', 'signed_cookies']
+AUTH_BACKENDS = ['django.contrib.auth.backends.ModelBackend', 'main.backends.CachedModelBackend']
+
+
+class Command(BaseCommand):
+    help = 'Measures authenticated requests to the student and teacher pages with each session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page and configuration')
+        parser.add_argument('--engines', nargs='+', default=SESSION_ENGINES, choices=SESSION_ENGINES)
+
+    def handle(self, *args, **options):
+        # A throwaway database file, so session writes pay for the SQLite file lock like in production
+        path = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}), 'NAME': path}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            student, teacher = self.seed()
+            pages = [(student, reverse('student-modules')), (student, reverse('student-notifs')),
+                     (student, reverse('notifications-feed')), (teacher, reverse('teacher-groups')),
+                     (teacher, reverse('teacher-week'))]
+            self.stdout.write(f'{"sessions":<16}{"user lookup":<44}{"req/s":>8}{"queries/req":>13}')
+            for engine in options['engines']:
+                for backend in AUTH_BACKENDS:
+                    rate, queries = self.measure(engine, backend, pages, options['requests'])
+                    self.stdout.write(f'{engine:<16}{backend:<44}{rate:>8.0f}{queries:>13.1f}')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self):
+        group = Group.objects.create(name='Group 1')
+        module = Module.objects.create(module_name='Module 1', exam_type='e')
+        students = Student.objects.bulk_create([Student(
+            username=f'student_{i}', first_name='Name', last_name=f'Student {i}', group=group) for i in range(30)])
+        User.objects.bulk_create([User(username=student.username, student_profile=student) for student in students])
+        teacher = User.objects.create(username='teacher', first_name='Name', last_name='Teacher', is_teacher=True)
+        for day in range(len(DAY_NAMES)):
+            Schedule.objects.create(group=group, module=module, date=day).teachers.add(teacher)
+        for i in range(30):
+            notification = Notification.objects.create(content=f'Notification {i}', for_students=True,
+                                                       for_teachers=True)
+            deliver_notification(notification)
+        return User.objects.get(username='student_0'), teacher
+
+    def measure(self, engine, backend, pages, requests):
+        # DEBUG off keeps the debug toolbar out of the timings
+        with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                               AUTHENTICATION_BACKENDS=[backend], DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            caches['default'].clear()
+            clients = {}
+            for user, url in pages:
+                if user not in clients:
+                    clients[user] = Client()
+                    clients[user].force_login(user)
+                clients[user].get(url)
+
+            count = 0
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for user, url in pages:
+                    for _ in range(requests):
+                        clients[user].get(url)
+                        count += 1
+                elapsed = time.perf_counter() - start
+        return count / elapsed, len(queries) / count
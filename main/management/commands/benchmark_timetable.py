@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.generator import solve_timetable
+from main.models import DAY_NAMES
+from project_college.settings import LESSON_SLOTS, MAX_GROUP_LESSONS_PER_DAY
+
+
+def synthetic_college(groups_count, modules_per_group=8, lessons_per_group=18, seed=0):
+    # About 24 lessons a week per teacher, a few modules are taught by two teachers.
+    # Modules go to the less loaded of a few random teachers, the way a department shares them out
+    rnd = random.Random(seed)
+    teachers_count = max(groups_count * lessons_per_group // 24, 2)
+    load = [0] * teachers_count
+    assignments = []
+    for group in range(groups_count):
+        lessons = [1] * modules_per_group
+        for _ in range(lessons_per_group - modules_per_group):
+            lessons[rnd.randrange(modules_per_group)] += 1
+        for count in lessons:
+            candidates = sorted(rnd.sample(range(teachers_count), min(3, teachers_count)), key=lambda t: load[t])
+            teachers = candidates[:2 if rnd.random() < 0.05 else 1]
+            for teacher in teachers:
+                load[teacher] += count
+            assignments.append({'group': group, 'teachers': teachers, 'lessons': count})
+    return assignments
+
+
+class Command(BaseCommand):
+    help = 'Measures the timetable solver on synthetic colleges of growing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 200, 400])
+        parser.add_argument('--lessons-per-group', type=int, default=18)
+        parser.add_argument('--time-limit', type=float, default=30)
+
+    def handle(self, *args, **options):
+        for groups_count in options['sizes']:
+            assignments = synthetic_college(groups_count, lessons_per_group=options['lessons_per_group'])
+            lessons = sum(assignment['lessons'] for assignment in assignments)
+            start = time.perf_counter()
+            placements, unplaced = solve_timetable(assignments, len(DAY_NAMES), len(LESSON_SLOTS),
+                                                   MAX_GROUP_LESSONS_PER_DAY, options['time_limit'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{groups_count:>4} groups, {lessons:>5} lessons: {elapsed:7.2f} s, '
+                              f'{len(placements) / lessons:.1%} placed, {sum(unplaced.values())} not placed')
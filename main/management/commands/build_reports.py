@@ -0,0 +1,21 @@
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from main.reports import build_reports
+from project_college.settings import REPORTS_PROCESSES
+
+
+class Command(BaseCommand):
+    help = 'Builds end-of-semester report workbooks for every group into a zip archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the zip archive')
+        parser.add_argument('--semester', type=int, choices=range(1, 9), help='Semester of Module.hours_N')
+        parser.add_argument('--processes', type=int, default=REPORTS_PROCESSES,
+                            help='Worker processes, 0 writes workbooks in this process')
+
+    def handle(self, *args, **options):
+        with build_reports(options['semester'], options['processes']) as archive, open(options['output'], 'wb') as file:
+            shutil.copyfileobj(archive, file)
+        self.stdout.write(f'{options["output"]}')
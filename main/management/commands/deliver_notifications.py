@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Notification
+from main.notifications import deliver_notification
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds notification inboxes, e.g. after students changed groups or new users were added'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--last', type=int, help='Only the given number of newest notifications')
+
+    def handle(self, *args, **options):
+        notifications = Notification.objects.order_by('-pk')
+        if options['last'] is not None:
+            notifications = notifications[:options['last']]
+        count = 0
+        for notification in notifications:
+            deliver_notification(notification)
+            count += 1
+        self.stdout.write(f'{count} notifications delivered')
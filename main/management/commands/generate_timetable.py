@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from main.generator import apply_timetable, generate_timetable
+
+
+class Command(BaseCommand):
+    help = 'Places every (group, module) of the timetable into lesson slots without conflicts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int, choices=range(1, 9), action='append', required=True,
+                            help='Semester of Module.hours_N, repeat for groups of different years')
+        parser.add_argument('--time-limit', type=float, default=10, help='Seconds spent on repairs')
+        parser.add_argument('--apply', action='store_true', help='Replace the current lessons of the placed group modules')
+
+    def handle(self, *args, **options):
+        assignments, placements, unplaced = generate_timetable(options['semester'], options['time_limit'])
+        self.stdout.write(f'{len(assignments)} group modules, {len(placements)} lessons placed, '
+                          f'{sum(unplaced.values())} not placed')
+        for n, count in unplaced.items():
+            assignment = assignments[n]
+            self.stdout.write(f'  group {assignment["group"]}, {assignment["module"]}: {count} lessons not placed, '
+                              f'its current lessons are kept')
+
+        if options['apply']:
+            apply_timetable(assignments, placements)
+            self.stdout.write('Timetable saved')
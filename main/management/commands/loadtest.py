@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from main.loadtest import JOURNEYS, route_summary, run_journeys, seed_college
+
+
+class Command(BaseCommand):
+    help = 'Seeds a synthetic college and drives the student, teacher and admin pages, ' \
+           'reports latency, throughput and queries per route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--students', type=int, default=25, help='Students per group')
+        parser.add_argument('--modules', type=int, default=8, help='Modules per group')
+        parser.add_argument('--topics', type=int, default=40, help='Topics per module')
+        parser.add_argument('--journeys', nargs='+', default=list(JOURNEYS), choices=list(JOURNEYS))
+        parser.add_argument('--iterations', type=int, default=20, help='Runs of every journey per client')
+        parser.add_argument('--concurrency', type=int, default=1, help='Clients running at the same time')
+
+    def handle(self, *args, **options):
+        # A throwaway database file, the real one is never touched and the clients' threads share it
+        path = os.path.join(tempfile.mkdtemp(), 'loadtest.sqlite3')
+        connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}), 'NAME': path}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            college = seed_college(options['groups'], options['students'], options['modules'], options['topics'])
+            self.stdout.write(f'{options["groups"]} groups, {len(college["students"])} students, '
+                              f'{len(college["teachers"])} teachers, {len(college["schedules"])} journals')
+
+            # DEBUG off keeps the debug toolbar out of the timings
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                caches['default'].clear()
+                results, wall_time = run_journeys(college, options['journeys'], options['iterations'],
+                                                  options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(f'{"route":<24}{"requests":>9}{"p50 ms":>9}{"p95 ms":>9}{"req/s":>8}'
+                          f'{"queries":>9}{"max":>5}{"errors":>8}')
+        for route, result in results.items():
+            summary = route_summary(result, wall_time)
+            self.stdout.write(f'{route:<24}{summary["requests"]:>9}{summary["p50"] * 1000:>9.1f}'
+                              f'{summary["p95"] * 1000:>9.1f}{summary["rps"]:>8.1f}{summary["queries"]:>9.1f}'
+                              f'{summary["max_queries"]:>5}{summary["errors"]:>8}')
+        total = sum(len(result['latencies']) for result in results.values())
+        self.stdout.write(f'{total} requests in {wall_time:.1f} s, {total / wall_time:.1f} req/s')
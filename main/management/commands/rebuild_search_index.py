@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from main.search import rebuild_search_index, use_fts
+
+
+class Command(BaseCommand):
+    help = 'Refills the full-text index of students, dismissed students and teachers'
+
+    def handle(self, *args, **options):
+        if not use_fts():
+            self.stdout.write('No full-text table on this database, nothing to rebuild')
+            return
+        self.stdout.write(f'{rebuild_search_index()} people indexed')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.imports import fail_stale_import_jobs, run_import_job
+from main.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Processes pending Excel import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=2)
+
+    def handle(self, *args, **options):
+        while True:
+            # jobs left behind by a stopped web worker or an earlier run of this command
+            failed = fail_stale_import_jobs()
+            if failed:
+                self.stdout.write(f'{failed} stale jobs marked as failed')
+            for pk in ImportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True):
+                if run_import_job(pk):
+                    job = ImportJob.objects.get(pk=pk)
+                    self.stdout.write(f'{job}: {job.rows_processed}/{job.rows_total}')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
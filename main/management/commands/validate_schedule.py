@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.conflicts import conflict_message, timetable_conflicts
+
+
+class Command(BaseCommand):
+    help = 'Finds overlapping lessons of the same group or teacher across the whole timetable'
+
+    def handle(self, *args, **options):
+        conflicts = timetable_conflicts()
+        for conflict in conflicts:
+            self.stdout.write(conflict_message(conflict))
+
+        if conflicts:
+            raise CommandError(f'{len(conflicts)} conflicts found')
+        self.stdout.write('No conflicts found')
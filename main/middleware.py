@@ -0,0 +1,38 @@
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+from main.roles import get_request_role, get_role_context
+
+
+class RoleContextMiddleware:
+    # request.role is resolved on first use
+    resolve = staticmethod(get_request_role)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: self.resolve(request))
+        return self.get_response(request)
+
+
+class SessionRoleContextMiddleware(RoleContextMiddleware):
+    # request.role is served from the session, only with a shared ROLE_CACHE, see main.checks
+    resolve = staticmethod(get_role_context)
+
+
+class PasswordChangeMiddleware:
+    # Accounts still on the default password can only change it or log out
+    allowed_urls = ('change-password', 'logout', 'login_page')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.user.is_authenticated and request.user.must_change_password and \
+                request.resolver_match.url_name not in self.allowed_urls:
+            return redirect('change-password')
+        return None
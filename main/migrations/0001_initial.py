@@ -0,0 +1,256 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:30
+
+# The tables of a database created before main had migrations already exist,
+# mark this migration as applied there with: python manage.py migrate main --fake-initial
+
+from django.conf import settings
+import django.contrib.auth.models
+import django.contrib.auth.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import main.validators
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('username', models.CharField(error_messages={'unique': 'Пользователь с таким именем уже существует.'}, max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='Логин')),
+                ('first_name', models.CharField(max_length=150, verbose_name='имя')),
+                ('last_name', models.CharField(max_length=150, verbose_name='фамилия')),
+                ('middle_name', models.CharField(blank=True, max_length=150, null=True, verbose_name='Отчество')),
+                ('phone_number', models.CharField(blank=True, db_index=True, max_length=12, null=True, verbose_name='Номер телефона')),
+                ('is_teacher', models.BooleanField(default=False, verbose_name='Права учителя')),
+                ('is_junioradmin', models.BooleanField(default=False, verbose_name='Права администратора')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+            ],
+            options={
+                'verbose_name': 'Пользователь',
+                'verbose_name_plural': 'Пользователи',
+                'ordering': ['last_name'],
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DismissedStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(error_messages={'unique': 'Пользователь с таким именем уже существует.'}, max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='Логин')),
+                ('first_name', models.CharField(db_index=True, max_length=150, verbose_name='имя')),
+                ('last_name', models.CharField(db_index=True, max_length=150, verbose_name='фамилия')),
+                ('middle_name', models.CharField(blank=True, max_length=150, null=True, verbose_name='Отчество')),
+                ('phone_number', models.CharField(blank=True, db_index=True, max_length=12, null=True, verbose_name='Номер телефона')),
+                ('birthday', models.DateField(blank=True, null=True, verbose_name='Число, месяц, год рождения')),
+                ('email', models.EmailField(blank=True, max_length=254, null=True, verbose_name='адрес электронной почты')),
+                ('dismiss_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата отчисления')),
+                ('home_address', models.CharField(blank=True, max_length=200, null=True, verbose_name='Домашний адрес обучающегося')),
+                ('additional_info', models.TextField(blank=True, null=True, verbose_name='Дополнительные сведения')),
+            ],
+            options={
+                'verbose_name': 'Отчисленный студент',
+                'verbose_name_plural': 'Отчисленные студенты',
+                'ordering': ['last_name', 'first_name', 'middle_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=50, unique=True, verbose_name='Название группы')),
+            ],
+            options={
+                'verbose_name': 'Группа',
+                'verbose_name_plural': 'Группы',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Module',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('module_index', models.CharField(blank=True, db_index=True, max_length=20, null=True, verbose_name='Индекс предмета')),
+                ('module_name', models.CharField(db_index=True, max_length=100, verbose_name='Наименование предмета')),
+                ('hours_1', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 1 семестре')),
+                ('hours_2', models.PositiveSmallIntegerField(default=0, verbose_name='Часов во 2 семестре')),
+                ('hours_3', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 3 семестре')),
+                ('hours_4', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 4 семестре')),
+                ('hours_5', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 5 семестре')),
+                ('hours_6', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 6 семестре')),
+                ('hours_7', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 7 семестре')),
+                ('hours_8', models.PositiveSmallIntegerField(default=0, verbose_name='Часов в 8 семестре')),
+                ('exam_type', models.CharField(choices=[(None, 'Выберите форму итоговой аттестации'), ('e', 'Экзамен'), ('z', 'Зачет')], max_length=200, verbose_name='Форма итоговой атестации')),
+            ],
+            options={
+                'verbose_name': 'Модуль',
+                'verbose_name_plural': 'Модули',
+                'ordering': ['module_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_time', models.DateTimeField(auto_now_add=True)),
+                ('content', models.TextField(verbose_name='Текст')),
+                ('for_students', models.BooleanField(default=False, verbose_name='Для студентов')),
+                ('for_teachers', models.BooleanField(default=False, verbose_name='Для учителей')),
+            ],
+            options={
+                'verbose_name': 'Объявление',
+                'verbose_name_plural': 'Объявления',
+                'ordering': ['-date_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Qualification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(db_index=True, max_length=100, verbose_name='Код квалификации')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='Имя квалификации')),
+            ],
+            options={
+                'verbose_name': 'Квалификация',
+                'verbose_name_plural': 'Квалификации',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Specialization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(db_index=True, max_length=100, verbose_name='Код специализации')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='Имя специализации')),
+            ],
+            options={
+                'verbose_name': 'Специализация',
+                'verbose_name_plural': 'Специализации',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=150, verbose_name='Имя темы')),
+                ('hours', models.PositiveSmallIntegerField(default=0, verbose_name='Количество учебных часов')),
+                ('home_task', models.TextField(blank=True, null=True, verbose_name='Что задано')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.module', verbose_name='Предмет')),
+            ],
+            options={
+                'verbose_name': 'Тема',
+                'verbose_name_plural': 'Темы',
+                'ordering': ['module', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(error_messages={'unique': 'Пользователь с таким именем уже существует.'}, max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='Логин')),
+                ('first_name', models.CharField(db_index=True, max_length=150, verbose_name='имя')),
+                ('last_name', models.CharField(db_index=True, max_length=150, verbose_name='фамилия')),
+                ('middle_name', models.CharField(blank=True, max_length=150, null=True, verbose_name='Отчество')),
+                ('phone_number', models.CharField(blank=True, db_index=True, max_length=12, null=True, verbose_name='Номер телефона')),
+                ('birthday', models.DateField(blank=True, null=True, verbose_name='Число, месяц, год рождения')),
+                ('email', models.EmailField(blank=True, max_length=254, null=True, verbose_name='адрес электронной почты')),
+                ('number', models.PositiveSmallIntegerField(blank=True, db_index=True, null=True, verbose_name='Номер по поименной книге')),
+                ('enrollment_date', models.CharField(blank=True, max_length=300, null=True, verbose_name='Дата и № приказа о зачислении')),
+                ('home_address', models.CharField(blank=True, max_length=200, null=True, verbose_name='Домашний адрес обучающегося')),
+                ('courses', models.CharField(blank=True, max_length=100, null=True, verbose_name='Движение контингента')),
+                ('additional_info', models.TextField(blank=True, null=True, verbose_name='Дополнительные сведения')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Студент',
+                'verbose_name_plural': 'Студенты',
+                'ordering': ['last_name', 'first_name', 'middle_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.PositiveSmallIntegerField(choices=[(None, 'Выберите день недели'), (0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота')], verbose_name='День недели')),
+                ('time_start', models.TimeField(blank=True, null=True, verbose_name='Время начала')),
+                ('time_end', models.TimeField(blank=True, null=True, verbose_name='Время конца')),
+                ('group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='main.group', verbose_name='Группа')),
+                ('module', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.module', verbose_name='Предмет')),
+                ('teachers', models.ManyToManyField(to=settings.AUTH_USER_MODEL, verbose_name='Преподаватели')),
+            ],
+            options={
+                'verbose_name': 'Содержание',
+                'verbose_name_plural': 'Содержание',
+                'ordering': ['time_start', 'time_end'],
+            },
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='qualifications',
+            field=models.ManyToManyField(blank=True, to='main.qualification', verbose_name='Квалификации'),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='specializations',
+            field=models.ManyToManyField(blank=True, to='main.specialization', verbose_name='Специализации'),
+        ),
+        migrations.CreateModel(
+            name='Mark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_time', models.DateTimeField(auto_now=True, verbose_name='Дата и время')),
+                ('mark', models.PositiveSmallIntegerField(null=True, validators=[main.validators.correct_mark], verbose_name='Оценка')),
+                ('module', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.module', verbose_name='Предмет')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.student', verbose_name='Студент')),
+                ('teacher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Учитель')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.topic', verbose_name='Тема')),
+            ],
+            options={
+                'verbose_name': 'Оценка',
+                'verbose_name_plural': 'Оценки',
+                'ordering': ['topic'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CompletedTopic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_time', models.DateTimeField(verbose_name='Дата')),
+                ('module', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.module', verbose_name='Предмет')),
+                ('teacher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Преподаватель')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.topic', verbose_name='Тема')),
+            ],
+            options={
+                'verbose_name': 'Пройденная тема',
+                'verbose_name_plural': 'Пройденные темы',
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='student_profile',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.student', verbose_name='Профиль студента'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions'),
+        ),
+    ]
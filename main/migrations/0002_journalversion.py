@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.group', verbose_name='Группа')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.module', verbose_name='Предмет')),
+            ],
+            options={
+                'verbose_name': 'Версия журнала',
+                'verbose_name_plural': 'Версии журналов',
+                'unique_together': {('group', 'module')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_mark_summaries(apps, schema_editor):
+    Mark = apps.get_model('main', 'Mark')
+    MarkSummary = apps.get_model('main', 'MarkSummary')
+
+    rows = Mark.objects.exclude(module=None).values('student_id', 'module_id').annotate(
+        marks_count=Count('pk', filter=Q(mark__gt=0)),
+        marks_sum=Coalesce(Sum('mark', filter=Q(mark__gt=0)), 0),
+        absences=Count('pk', filter=Q(mark=None)),
+    ).order_by()
+    MarkSummary.objects.bulk_create([MarkSummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_journalversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarkSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marks_count', models.PositiveIntegerField(default=0, verbose_name='Количество оценок')),
+                ('marks_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('absences', models.PositiveIntegerField(default=0, verbose_name='Количество пропусков')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последнее обновление')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.module', verbose_name='Предмет')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.student', verbose_name='Студент')),
+            ],
+            options={
+                'verbose_name': 'Итоги по оценкам',
+                'verbose_name_plural': 'Итоги по оценкам',
+                'unique_together': {('student', 'module')},
+            },
+        ),
+        migrations.RunPython(fill_mark_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_marksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('students', 'Студенты'), ('topics', 'Темы')], max_length=20, verbose_name='Тип импорта')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Завершен с ошибками')], db_index=True, default='pending', max_length=20, verbose_name='Статус')),
+                ('file', models.FileField(blank=True, upload_to='files/imports/', verbose_name='Excel файл')),
+                ('params', models.JSONField(default=dict, verbose_name='Параметры')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата начала')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата окончания')),
+                ('rows_total', models.PositiveIntegerField(default=0, verbose_name='Всего строк')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('errors', models.JSONField(default=list, verbose_name='Ошибки')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Импорт',
+                'verbose_name_plural': 'Импорты',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='topic',
+            options={'ordering': ['module', 'position', 'name'], 'verbose_name': 'Тема', 'verbose_name_plural': 'Темы'},
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='result',
+            field=models.JSONField(default=dict, verbose_name='Результат'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='position',
+            field=models.PositiveIntegerField(default=0, verbose_name='Порядковый номер'),
+        ),
+    ]
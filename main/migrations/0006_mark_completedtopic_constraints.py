@@ -0,0 +1,65 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def delete_duplicates(model, fields, keep):
+    # Deletes every row of a duplicated key except the one picked by keep (Max/Min of pk)
+    duplicates = list(model.objects.values(*fields).annotate(rows=Count('pk'), keep=keep('pk')).filter(
+        rows__gt=1).order_by())
+    deleted = []
+    for row in duplicates:
+        rows = model.objects.filter(**{field: row[field] for field in fields}).exclude(pk=row['keep'])
+        deleted.extend(rows.values_list('pk', flat=True))
+    for i in range(0, len(deleted), 500):
+        model.objects.filter(pk__in=deleted[i:i + 500]).delete()
+    return duplicates
+
+
+def deduplicate(apps, schema_editor):
+    Mark = apps.get_model('main', 'Mark')
+    CompletedTopic = apps.get_model('main', 'CompletedTopic')
+    MarkSummary = apps.get_model('main', 'MarkSummary')
+
+    # The journal only ever edits one mark per cell, the newest one wins
+    topics = {row['topic'] for row in delete_duplicates(Mark, ['topic', 'student'], Max)}
+    # The journal shows the first date of a topic
+    delete_duplicates(CompletedTopic, ['topic', 'module'], Min)
+
+    if not topics:
+        return
+
+    modules = set(Mark.objects.filter(topic__in=topics).exclude(module=None).values_list('module', flat=True))
+    for module_id in modules:
+        MarkSummary.objects.filter(module_id=module_id).delete()
+        rows = Mark.objects.filter(module_id=module_id).values('student_id', 'module_id').annotate(
+            marks_count=Count('pk', filter=Q(mark__gt=0)),
+            marks_sum=Coalesce(Sum('mark', filter=Q(mark__gt=0)), 0),
+            absences=Count('pk', filter=Q(mark=None)),
+        ).order_by()
+        MarkSummary.objects.bulk_create([MarkSummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_topic_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['module', 'student', 'topic'], name='mark_module_student_topic'),
+        ),
+        migrations.AddConstraint(
+            model_name='completedtopic',
+            constraint=models.UniqueConstraint(fields=('topic', 'module'), name='unique_completed_topic_module'),
+        ),
+        migrations.AddConstraint(
+            model_name='mark',
+            constraint=models.UniqueConstraint(fields=('topic', 'student'), name='unique_mark_topic_student'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'main_person_fts'
+
+
+def create_person_fts(apps, schema_editor):
+    # SQLite only, PostgreSQL searches the tables directly, see main.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            f'kind UNINDEXED, object_id UNINDEXED, name, phone_number, username, number, '
+            f'tokenize="unicode61 remove_diacritics 2", prefix="2 3")'
+        )
+    except OperationalError:
+        # SQLite built without FTS5, main.search falls back to LIKE queries
+        return
+
+    rows = []
+    people = [
+        ('student', apps.get_model('main', 'Student').objects.all()),
+        ('dismissed', apps.get_model('main', 'DismissedStudent').objects.all()),
+        ('teacher', apps.get_model('main', 'User').objects.filter(is_teacher=True, student_profile=None)),
+    ]
+    for kind, queryset in people:
+        for person in queryset.iterator():
+            number = getattr(person, 'number', None)
+            rows.append((kind, person.pk,
+                         ' '.join(filter(None, (person.last_name, person.first_name, person.middle_name))),
+                         person.phone_number or '', person.username, '' if number is None else str(number)))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (kind, object_id, name, phone_number, username, number) '
+                           f'VALUES (%s, %s, %s, %s, %s, %s)', rows)
+
+
+def drop_person_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_mark_completedtopic_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_person_fts, drop_person_fts),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_person_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_state', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('last_read', models.PositiveIntegerField(default=0, verbose_name='Последнее прочитанное объявление')),
+            ],
+            options={
+                'verbose_name': 'Прочитанные объявления',
+                'verbose_name_plural': 'Прочитанные объявления',
+            },
+        ),
+    ]
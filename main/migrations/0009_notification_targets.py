@@ -0,0 +1,61 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fan_out_broadcasts(apps, schema_editor):
+    # Existing notifications only had for_students / for_teachers, the inboxes start with those
+    User = apps.get_model('main', 'User')
+    Notification = apps.get_model('main', 'Notification')
+    NotificationInbox = apps.get_model('main', 'NotificationInbox')
+
+    students = list(User.objects.exclude(student_profile=None).values_list('pk', flat=True))
+    teachers = list(User.objects.filter(is_teacher=True).values_list('pk', flat=True))
+    for notification in Notification.objects.filter(models.Q(for_students=True) | models.Q(for_teachers=True)):
+        users = set(students if notification.for_students else []) | set(teachers if notification.for_teachers else [])
+        NotificationInbox.objects.bulk_create([NotificationInbox(user_id=user_id, notification_id=notification.pk)
+                                               for user_id in users], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_notificationreadstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='groups',
+            field=models.ManyToManyField(blank=True, to='main.group', verbose_name='Для групп'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='modules',
+            field=models.ManyToManyField(blank=True, to='main.module', verbose_name='Для предметов'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='users',
+            field=models.ManyToManyField(blank=True, related_name='targeted_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Для пользователей'),
+        ),
+        migrations.CreateModel(
+            name='NotificationInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to='main.notification', verbose_name='Объявление')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Входящее объявление',
+                'verbose_name_plural': 'Входящие объявления',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationinbox',
+            constraint=models.UniqueConstraint(fields=('user', 'notification'), name='unique_inbox_user_notification'),
+        ),
+        migrations.RunPython(fan_out_broadcasts, migrations.RunPython.noop),
+    ]
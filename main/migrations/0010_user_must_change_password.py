@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_notification_targets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='must_change_password',
+            field=models.BooleanField(default=False, verbose_name='Сменить пароль при входе'),
+        ),
+    ]
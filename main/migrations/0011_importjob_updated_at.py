@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_user_must_change_password'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее обновление'),
+        ),
+    ]
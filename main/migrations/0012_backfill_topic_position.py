@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def backfill_positions(apps, schema_editor):
+    # Topics created before 0005 all have position 0, number them after the module's imported topics
+    # in the order they were listed in (by name)
+    Topic = apps.get_model('main', 'Topic')
+    module_ids = Topic.objects.filter(position=0).values_list('module_id', flat=True).distinct()
+    for module_id in module_ids:
+        topics = Topic.objects.filter(module_id=module_id)
+        last = topics.aggregate(Max('position'))['position__max'] or 0
+        unnumbered = list(topics.filter(position=0).order_by('name', 'pk'))
+        for position, topic in enumerate(unnumbered, start=last + 1):
+            topic.position = position
+        Topic.objects.bulk_update(unnumbered, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_importjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
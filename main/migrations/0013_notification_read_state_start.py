@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def mark_existing_read(apps, schema_editor):
+    # Users without a read mark would see every notification sent before the feed as unread,
+    # they start at the newest one instead
+    User = apps.get_model('main', 'User')
+    Notification = apps.get_model('main', 'Notification')
+    NotificationReadState = apps.get_model('main', 'NotificationReadState')
+
+    last_id = Notification.objects.aggregate(Max('pk'))['pk__max']
+    if last_id is None:
+        return
+    NotificationReadState.objects.bulk_create([
+        NotificationReadState(user_id=user_id, last_read=last_id)
+        for user_id in User.objects.filter(notification_state=None).values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_backfill_topic_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_existing_read, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'main_person_fts'
+COLUMNS = ['name', 'phone_number', 'username', 'number']
+
+
+def rebuild_person_fts(apps, schema_editor, columns):
+    # FTS5 tables can't get new columns, so the table is created again and refilled, see migration 0007
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f'kind UNINDEXED, object_id UNINDEXED, {", ".join(columns)}, '
+            f'tokenize="unicode61 remove_diacritics 2", prefix="2 3")'
+        )
+    except OperationalError:
+        # SQLite built without FTS5, main.search falls back to LIKE queries
+        return
+
+    rows = []
+    people = [
+        ('student', apps.get_model('main', 'Student').objects.all()),
+        ('dismissed', apps.get_model('main', 'DismissedStudent').objects.all()),
+        ('teacher', apps.get_model('main', 'User').objects.filter(is_teacher=True, student_profile=None)),
+    ]
+    for kind, queryset in people:
+        for person in queryset.iterator():
+            number = getattr(person, 'number', None)
+            values = {
+                'name': ' '.join(filter(None, (person.last_name, person.first_name, person.middle_name))),
+                'phone_number': person.phone_number or '',
+                'username': person.username,
+                'number': '' if number is None else str(number),
+                'email': person.email or '',
+            }
+            rows.append((kind, person.pk, *(values[column] for column in columns)))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (kind, object_id, {", ".join(columns)}) '
+                           f'VALUES ({", ".join(["%s"] * (len(columns) + 2))})', rows)
+
+
+def add_email(apps, schema_editor):
+    rebuild_person_fts(apps, schema_editor, [*COLUMNS, 'email'])
+
+
+def remove_email(apps, schema_editor):
+    rebuild_person_fts(apps, schema_editor, COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_notification_read_state_start'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email, remove_email),
+    ]
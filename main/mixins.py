@@ -1,4 +1,9 @@
+import base64
+import binascii
+import json
+
 from django.contrib.auth.mixins import AccessMixin
+from django.db.models import Q
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from .models import *
@@ -10,27 +15,113 @@ class ViewsMixin:
 
 class TeacherRequiredMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_teacher:
+        if not request.role.is_teacher:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
 
 class StudentRequiredMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.student_profile:
+        if not request.role.is_student:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
 
 class AdminRequiredMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_junioradmin and not request.user.is_superuser:
+        if not request.role.is_admin:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
 
 class StuffRequiredMixin(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_superuser and not request.user.is_junioradmin and not request.user.is_teacher:
+        if not request.role.is_staff_member:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
+
+
+PERSON_SEARCH_FIELDS = ('last_name__istartswith', 'first_name__istartswith', 'phone_number__startswith')
+
+
+class KeysetPaginationMixin:
+    # Pages continue from the last shown row (WHERE ordering > row) instead of OFFSET,
+    # so every page costs one indexed seek. keyset_ordering must end with a unique field
+    keyset_ordering = ('pk',)
+    search_fields = ()
+    page_size = 50
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def search(self, queryset):
+        # Every word has to match one of search_fields, integer fields only take numbers
+        for word in self.get_search_query().split():
+            condition = Q()
+            for lookup in self.search_fields:
+                field = queryset.model._meta.get_field(lookup.split('__')[0])
+                if field.get_internal_type().endswith('IntegerField'):
+                    if word.isdigit():
+                        condition |= Q(**{lookup: int(word)})
+                else:
+                    condition |= Q(**{lookup: word})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name.lstrip('-')) for name in self.keyset_ordering]
+        # isoformat keeps microseconds, DjangoJSONEncoder would round datetimes to milliseconds
+        return base64.urlsafe_b64encode(json.dumps(values, default=lambda value: value.isoformat()).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, binascii.Error):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.keyset_ordering):
+            return None
+        return values
+
+    def seek(self, queryset, values, backwards=False):
+        # (a, b, pk) > (x, y, z) written out as a > x OR (a = x AND b > y) OR (a = x AND b = y AND pk > z)
+        condition = Q()
+        for i, name in enumerate(self.keyset_ordering):
+            descending = name.startswith('-') != backwards
+            step = Q(**{f'{name.lstrip("-")}__{"lt" if descending else "gt"}': values[i]})
+            for previous, value in zip(self.keyset_ordering[:i], values):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return queryset.filter(condition)
+
+    def keyset_page(self, queryset):
+        queryset = self.search(queryset)
+        after = self.decode_cursor(self.request.GET.get('after'))
+        before = self.decode_cursor(self.request.GET.get('before'))
+        keyset = {'q': self.get_search_query(), 'next': None, 'previous': None}
+
+        if before is not None:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.keyset_ordering]
+            rows = list(self.seek(queryset, before, backwards=True).order_by(*ordering)[:self.page_size + 1])
+            more = len(rows) > self.page_size
+            rows = rows[:self.page_size][::-1]
+            if rows:
+                keyset['next'] = self.encode_cursor(rows[-1])
+                if more:
+                    keyset['previous'] = self.encode_cursor(rows[0])
+        else:
+            if after is not None:
+                queryset = self.seek(queryset, after)
+            rows = list(queryset.order_by(*self.keyset_ordering)[:self.page_size + 1])
+            more = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+            if rows and more:
+                keyset['next'] = self.encode_cursor(rows[-1])
+            if rows and after is not None:
+                keyset['previous'] = self.encode_cursor(rows[0])
+        return rows, keyset
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        rows, keyset = self.keyset_page(self.object_list if object_list is None else object_list)
+        return super().get_context_data(object_list=rows, keyset=keyset, **kwargs)
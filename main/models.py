@@ -4,7 +4,7 @@ from django.utils.translation import gettext as _
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
-from project_college.settings import DAY_NAMES
+from project_college.settings import DAY_NAMES, MARKS_RATING
 from .validators import correct_mark
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
@@ -43,6 +43,7 @@ class Qualification(models.Model):
 
 class Topic(models.Model):
     name = models.CharField(max_length=150, verbose_name=_('Имя темы'), db_index=True)
+    position = models.PositiveIntegerField(verbose_name=_('Порядковый номер'), default=0)
     hours = models.PositiveSmallIntegerField(verbose_name=_('Количество учебных часов'), default=0)
     home_task = models.TextField(verbose_name=_('Что задано'), blank=True, null=True)
 
@@ -57,7 +58,7 @@ class Topic(models.Model):
     class Meta:
         verbose_name = _('Тема')
         verbose_name_plural = _('Темы')
-        ordering = ['module', 'name']
+        ordering = ['module', 'position', 'name']
 
 
 class Module(models.Model):
@@ -120,6 +121,7 @@ class User(AbstractUser):
                                     null=True)
     is_teacher = models.BooleanField(default=False, verbose_name=_('Права учителя'))
     is_junioradmin = models.BooleanField(default=False, verbose_name=_('Права администратора'))
+    must_change_password = models.BooleanField(default=False, verbose_name=_('Сменить пароль при входе'))
 
     student_profile = models.OneToOneField('Student', on_delete=models.SET_NULL, verbose_name=_('Профиль студента'),
                                            null=True, blank=True)
@@ -158,9 +160,9 @@ class Schedule(models.Model):
     time_end = models.TimeField(verbose_name=_('Время конца'), blank=True, null=True)
 
     def __str__(self):
-        return f'{DAY_NAMES[self.date]}, {self.group.name}; {_("Предмет")}: {self.module.module_name}; ' \
-               f'{_("Преподаватели")}: ' \
-               f'{", ".join(list(map(lambda x: x.first_name, list(self.teachers.all()))))}'
+        # Uses prefetched teachers when there are any, see main.timetable.schedule_queryset
+        return f'{DAY_NAMES[self.date]}, {self.group}; {_("Предмет")}: {self.module}; ' \
+               f'{_("Преподаватели")}: {", ".join(teacher.first_name for teacher in self.teachers.all())}'
 
     class Meta:
         verbose_name = _('Содержание')
@@ -282,6 +284,12 @@ class Mark(models.Model):
         verbose_name = _('Оценка')
         verbose_name_plural = _('Оценки')
         ordering = ['topic']
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'student'], name='unique_mark_topic_student'),
+        ]
+        indexes = [
+            models.Index(fields=['module', 'student', 'topic'], name='mark_module_student_topic'),
+        ]
 
 
 class Notification(models.Model):
@@ -289,6 +297,10 @@ class Notification(models.Model):
     content = models.TextField(verbose_name=_('Текст'))
     for_students = models.BooleanField(verbose_name=_('Для студентов'), default=False)
     for_teachers = models.BooleanField(verbose_name=_('Для учителей'), default=False)
+    groups = models.ManyToManyField(Group, verbose_name=_('Для групп'), blank=True)
+    modules = models.ManyToManyField(Module, verbose_name=_('Для предметов'), blank=True)
+    users = models.ManyToManyField(User, verbose_name=_('Для пользователей'), blank=True,
+                                   related_name='targeted_notifications')
 
     def __str__(self):
         return f'{_("Дата")}: {self.date_time.strftime("%d/%m/%Y %H:%M")}, {_("Текст")}: {self.content}'
@@ -302,6 +314,37 @@ class Notification(models.Model):
         ordering = ['-date_time']
 
 
+class NotificationInbox(models.Model):
+    # Notifications fanned out to their recipients, a user's inbox is one range of the unique index
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('Пользователь'), db_index=False)
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, verbose_name=_('Объявление'),
+                                     related_name='inbox')
+
+    def __str__(self):
+        return f'{self.user}: {self.notification_id}'
+
+    class Meta:
+        verbose_name = _('Входящее объявление')
+        verbose_name_plural = _('Входящие объявления')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='unique_inbox_user_notification'),
+        ]
+
+
+class NotificationReadState(models.Model):
+    # One row per user: every notification up to last_read is read
+    user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name=_('Пользователь'),
+                                related_name='notification_state', primary_key=True)
+    last_read = models.PositiveIntegerField(verbose_name=_('Последнее прочитанное объявление'), default=0)
+
+    def __str__(self):
+        return f'{self.user}: {self.last_read}'
+
+    class Meta:
+        verbose_name = _('Прочитанные объявления')
+        verbose_name_plural = _('Прочитанные объявления')
+
+
 class CompletedTopic(models.Model):
     date_time = models.DateTimeField(verbose_name=_('Дата'))
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, verbose_name=_('Тема'))
@@ -311,6 +354,89 @@ class CompletedTopic(models.Model):
     class Meta:
         verbose_name = _('Пройденная тема')
         verbose_name_plural = _('Пройденные темы')
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'module'], name='unique_completed_topic_module'),
+        ]
 
     def __str__(self):
         return f'{self.date_time.strftime("%d/%m/%Y %H:%M")}, {self.module}, {self.topic} - {self.teacher}'
+
+
+class JournalVersion(models.Model):
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, verbose_name=_('Группа'))
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, verbose_name=_('Предмет'))
+    version = models.PositiveIntegerField(verbose_name=_('Версия'), default=0)
+
+    class Meta:
+        verbose_name = _('Версия журнала')
+        verbose_name_plural = _('Версии журналов')
+        unique_together = ['group', 'module']
+
+    def __str__(self):
+        return f'{self.group}, {self.module}: {self.version}'
+
+
+class MarkSummary(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name=_('Студент'))
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, verbose_name=_('Предмет'))
+    marks_count = models.PositiveIntegerField(verbose_name=_('Количество оценок'), default=0)
+    marks_sum = models.PositiveIntegerField(verbose_name=_('Сумма оценок'), default=0)
+    absences = models.PositiveIntegerField(verbose_name=_('Количество пропусков'), default=0)
+    updated_at = models.DateTimeField(verbose_name=_('Последнее обновление'), auto_now=True)
+
+    def average(self):
+        if not self.marks_count:
+            return 0
+        return round(self.marks_sum / self.marks_count, 1)
+
+    def rating(self):
+        average = self.average()
+        if MARKS_RATING['good_min'] <= average <= MARKS_RATING['good_max']:
+            return 'good'
+        elif MARKS_RATING['mid_min'] <= average <= MARKS_RATING['mid_max']:
+            return 'mid'
+        return 'bad'
+
+    def __str__(self):
+        return f'{self.student}, {self.module}: {self.average()}'
+
+    class Meta:
+        verbose_name = _('Итоги по оценкам')
+        verbose_name_plural = _('Итоги по оценкам')
+        unique_together = ['student', 'module']
+
+
+class ImportJob(models.Model):
+    kind = models.CharField(max_length=20, verbose_name=_('Тип импорта'), choices=[
+        ('students', _('Студенты')),
+        ('topics', _('Темы')),
+    ])
+    status = models.CharField(max_length=20, verbose_name=_('Статус'), default='pending', db_index=True, choices=[
+        ('pending', _('В очереди')),
+        ('running', _('Выполняется')),
+        ('done', _('Завершен')),
+        ('failed', _('Завершен с ошибками')),
+    ])
+    file = models.FileField(upload_to='files/imports/', verbose_name=_('Excel файл'), blank=True)
+    params = models.JSONField(verbose_name=_('Параметры'), default=dict)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, verbose_name=_('Пользователь'), null=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Дата создания'))
+    started_at = models.DateTimeField(verbose_name=_('Дата начала'), null=True, blank=True)
+    finished_at = models.DateTimeField(verbose_name=_('Дата окончания'), null=True, blank=True)
+    # Touched when the job is claimed and on progress, see main.imports.fail_stale_import_jobs
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Последнее обновление'))
+    rows_total = models.PositiveIntegerField(verbose_name=_('Всего строк'), default=0)
+    rows_processed = models.PositiveIntegerField(verbose_name=_('Обработано строк'), default=0)
+    errors = models.JSONField(verbose_name=_('Ошибки'), default=list)
+    result = models.JSONField(verbose_name=_('Результат'), default=dict)
+
+    def __str__(self):
+        return f'{self.get_kind_display()}, {self.created_at.strftime("%d/%m/%Y %H:%M")}: {self.get_status_display()}'
+
+    def get_absolute_url(self):
+        return reverse('import-job', kwargs={'pk': self.pk})
+
+    class Meta:
+        verbose_name = _('Импорт')
+        verbose_name_plural = _('Импорты')
+        ordering = ['-created_at']
@@ -0,0 +1,139 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Q
+
+from main.models import *
+from project_college.settings import NOTIFICATION_CACHE, NOTIFICATION_CACHE_TIMEOUT, NOTIFICATION_FEED_LIMIT
+
+FEED_VERSION_KEY = 'notifications:version'
+INBOX_BATCH = 500
+
+
+def notification_cache():
+    return caches[NOTIFICATION_CACHE]
+
+
+def user_state_key(user_id):
+    return f'notifications:user:{user_id}'
+
+
+def user_notifications(user):
+    # The user's inbox, filled by deliver_notification. Filtering and ordering by position
+    # (the inbox's notification id) keeps the query on the (user, notification) index range
+    return Notification.objects.filter(inbox__user=user).annotate(position=F('inbox__notification'))
+
+
+def notification_recipients(notification):
+    # Ids of everyone the notification targets, one simple query per kind of target
+    modules = notification.modules.all()
+    queries = [notification.users.values_list('pk', flat=True),
+               User.objects.filter(student_profile__group__in=notification.groups.all()).values_list('pk', flat=True),
+               User.objects.filter(student_profile__group__schedule__module__in=modules).values_list('pk', flat=True),
+               User.objects.filter(schedule__module__in=modules).values_list('pk', flat=True)]
+    if notification.for_students:
+        queries.append(User.objects.exclude(student_profile=None).values_list('pk', flat=True))
+    if notification.for_teachers:
+        queries.append(User.objects.filter(is_teacher=True).values_list('pk', flat=True))
+    return set().union(*queries)
+
+
+def deliver_notification(notification):
+    # Fan-out on write: the inbox is rebuilt in bulk whenever the notification or its targets are saved
+    with transaction.atomic():
+        NotificationInbox.objects.filter(notification=notification).delete()
+        NotificationInbox.objects.bulk_create([
+            NotificationInbox(user_id=user_id, notification=notification)
+            for user_id in sorted(notification_recipients(notification))
+        ], batch_size=INBOX_BATCH)
+        bump_feed_version()
+
+
+def broadcast_audiences(is_teacher, student_profile_id):
+    # The for_students / for_teachers broadcasts a user with these fields receives
+    return {*(['students'] if student_profile_id is not None else []), *(['teachers'] if is_teacher else [])}
+
+
+def deliver_broadcasts(user_ids, audiences):
+    # Broadcasts reach everyone in their audience, including accounts created or given the role later
+    query = Q()
+    if 'students' in audiences:
+        query |= Q(for_students=True)
+    if 'teachers' in audiences:
+        query |= Q(for_teachers=True)
+    if not query:
+        return
+    user_ids = list(user_ids)
+    notification_ids = list(Notification.objects.filter(query).values_list('pk', flat=True))
+    NotificationInbox.objects.bulk_create([
+        NotificationInbox(user_id=user_id, notification_id=notification_id)
+        for user_id in user_ids for notification_id in notification_ids
+    ], batch_size=INBOX_BATCH, ignore_conflicts=True)
+    keys = list(map(user_state_key, user_ids))
+    notification_cache().delete_many(keys)
+    # older broadcasts can arrive already read, so the unread count alone doesn't show the new rows
+    bump_feed_version()
+
+
+def feed_version():
+    # Changes whenever a notification is added, edited or deleted, a lost key simply starts a new version
+    version = notification_cache().get(FEED_VERSION_KEY)
+    if version is None:
+        notification_cache().add(FEED_VERSION_KEY, time.time_ns(), None)
+        version = notification_cache().get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    transaction.on_commit(lambda: notification_cache().set(FEED_VERSION_KEY, time.time_ns(), None))
+
+
+def notification_state(user):
+    # (last read id, unread count), cached until the feed version or the user's read mark changes
+    version = feed_version()
+    cached = notification_cache().get(user_state_key(user.pk))
+    if cached is not None and cached[0] == version:
+        return cached[1:]
+    last_read = NotificationReadState.objects.filter(user=user).values_list('last_read', flat=True).first() or 0
+    unread = NotificationInbox.objects.filter(user=user, notification__gt=last_read).count()
+    notification_cache().set(user_state_key(user.pk), (version, last_read, unread), NOTIFICATION_CACHE_TIMEOUT)
+    return last_read, unread
+
+
+def mark_notifications_read(user, last_id):
+    # The read mark only moves forward
+    if not NotificationReadState.objects.filter(user=user, last_read__lt=last_id).update(last_read=last_id):
+        NotificationReadState.objects.get_or_create(user=user, defaults={'last_read': last_id})
+    # now for this request, after commit for requests that cached the old mark meanwhile
+    notification_cache().delete(user_state_key(user.pk))
+    transaction.on_commit(lambda: notification_cache().delete(user_state_key(user.pk)))
+
+
+def notification_feed(user, since=None, before=None, limit=NOTIFICATION_FEED_LIMIT):
+    # since: notifications after that id, oldest first, for polling; otherwise the newest ones before the id
+    last_read, unread = notification_state(user)
+    notifications = user_notifications(user)
+    if since is not None:
+        rows = list(notifications.filter(position__gt=since).order_by('position')[:limit + 1])
+    else:
+        if before is not None:
+            notifications = notifications.filter(position__lt=before)
+        rows = list(notifications.order_by('-position')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'notifications': [{'id': notification.pk, 'date_time': notification.date_time.isoformat(),
+                           'content': notification.content, 'unread': notification.pk > last_read}
+                          for notification in rows],
+        'last_id': max([notification.pk for notification in rows], default=since),
+        'more': more,
+        'unread': unread,
+    }
+
+
+def notification_feed_etag(request, *args, **kwargs):
+    # Feed responses only change with the feed version, the read mark and the unread count,
+    # a match costs two cache reads
+    last_read, unread = notification_state(request.user)
+    return f'{request.user.pk}-{feed_version()}-{last_read}-{unread}'
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import openpyxl
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.utils.translation import gettext as _
+
+from main.exports import sheet_title
+from main.models import *
+
+SEMESTERS = range(1, 9)
+
+
+def planned_hours(module, semester):
+    if semester:
+        return module[f'hours_{semester}']
+    return sum(module[f'hours_{i}'] for i in SEMESTERS)
+
+
+def collect_report_data(semester=None):
+    # Every figure comes from a grouped query, nothing is counted row by row in Python
+    modules = {module['pk']: module for module in Module.objects.values(
+        'pk', 'module_index', 'module_name', *[f'hours_{i}' for i in SEMESTERS])}
+
+    topics = Topic.objects.annotate(
+        completed=Exists(CompletedTopic.objects.filter(topic_id=OuterRef('pk')))
+    ).values('module_id').annotate(
+        topics_count=Count('pk'),
+        completed_count=Count('pk', filter=Q(completed=True)),
+        completed_hours=Sum('hours', filter=Q(completed=True)),
+    ).order_by()
+    topics = {row['module_id']: row for row in topics}
+
+    marks = MarkSummary.objects.values('student__group_id', 'module_id').annotate(
+        marks_sum=Sum('marks_sum'),
+        marks_count=Sum('marks_count'),
+        absences=Sum('absences'),
+    ).order_by()
+    marks = {(row['student__group_id'], row['module_id']): row for row in marks}
+
+    students = dict(Student.objects.values('group_id').annotate(count=Count('pk')).order_by().values_list(
+        'group_id', 'count'))
+
+    groups = {pk: {'pk': pk, 'name': name, 'students': students.get(pk, 0), 'rows': []}
+              for pk, name in Group.objects.values_list('pk', 'name')}
+    group_modules = Schedule.objects.exclude(module=None).exclude(group=None).values_list(
+        'group_id', 'module_id').distinct().order_by('group__name', 'module__module_name')
+
+    for group_id, module_id in group_modules:
+        module = modules[module_id]
+        module_topics = topics.get(module_id, {})
+        module_marks = marks.get((group_id, module_id), {})
+        marks_count = module_marks.get('marks_count') or 0
+
+        groups[group_id]['rows'].append([
+            f'{module["module_index"]} {module["module_name"]}' if module['module_index'] else module['module_name'],
+            planned_hours(module, semester),
+            module_topics.get('topics_count', 0),
+            module_topics.get('completed_count', 0),
+            module_topics.get('completed_hours') or 0,
+            round(module_marks['marks_sum'] / marks_count, 1) if marks_count else 0,
+            module_marks.get('absences') or 0,
+        ])
+
+    return list(groups.values())
+
+
+def write_group_report(directory, pk, name, rows):
+    # Runs in a worker process, gets only plain data and never touches the database
+    excel = openpyxl.Workbook(write_only=True)
+    sheet = excel.create_sheet(sheet_title(name))
+    for row in rows:
+        sheet.append(row)
+
+    # sheet titles are cut to 31 characters, the pk keeps long names that share a prefix apart
+    file_path = os.path.join(directory, f'{pk} {sheet_title(name)}.xlsx')
+    excel.save(file_path)
+    return file_path
+
+
+def build_reports(semester=None, processes=0):
+    # processes is for manage.py build_reports only, a web request writes the few rows per group itself
+    # rather than forking its gunicorn worker
+    title = _('Семестр') + f' {semester}' if semester else _('Все семестры')
+    header = [_('Предмет'), _('Часов по плану'), _('Тем всего'), _('Тем пройдено'), _('Часов пройдено'),
+              _('Средняя оценка'), _('Пропуски')]
+    tasks = [(group['pk'], group['name'], [[title], [_('Группа'), group['name'], _('Студентов'), group['students']], header,
+                              *group['rows']]) for group in collect_report_data(semester)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        if processes and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) as executor:
+                files = list(executor.map(write_group_report, [directory] * len(tasks), *zip(*tasks)))
+        else:
+            files = [write_group_report(directory, pk, name, rows) for pk, name, rows in tasks]
+
+        archive = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for file_path in files:
+                zip_file.write(file_path, os.path.basename(file_path))
+
+    archive.seek(0)
+    return archive
@@ -0,0 +1,93 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from main.models import *
+from project_college.settings import ROLE_CACHE
+
+ROLE_SESSION_KEY = '_role_context'
+
+
+class RoleContext:
+    # What pages need to know about the user: role flags plus the student's name and group
+    def __init__(self, user_id=None, is_admin=False, is_teacher=False, student_id=None, student_name='',
+                 group_id=None, group_name=''):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.is_teacher = is_teacher
+        self.student_id = student_id
+        self.student_name = student_name
+        self.group_id = group_id
+        self.group_name = group_name
+
+    @property
+    def is_student(self):
+        return self.student_id is not None
+
+    @property
+    def is_staff_member(self):
+        return self.is_admin or self.is_teacher
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def role_cache():
+    return caches[ROLE_CACHE]
+
+
+def role_version_key(user_id):
+    return f'role:user:{user_id}'
+
+
+def role_version(user_id):
+    # Bumped when the user, their student profile or its group changes, a lost key starts a new version
+    version = role_cache().get(role_version_key(user_id))
+    if version is None:
+        role_cache().add(role_version_key(user_id), time.time_ns(), None)
+        version = role_cache().get(role_version_key(user_id))
+    return version
+
+
+def invalidate_roles(user_ids):
+    keys = [role_version_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        # after commit, so a request running meanwhile can't store the old role under the new version
+        transaction.on_commit(lambda: role_cache().set_many(dict.fromkeys(keys, time.time_ns()), None))
+
+
+def resolve_role(user):
+    # One query for students (student joined with its group), none for everybody else
+    context = RoleContext(user.pk, user.is_superuser or user.is_junioradmin, user.is_teacher)
+    if user.student_profile_id is not None:
+        student = Student.objects.filter(pk=user.student_profile_id).values(
+            'last_name', 'first_name', 'middle_name', 'group_id', 'group__name').first()
+        if student is not None:
+            context.student_id = user.student_profile_id
+            context.student_name = ' '.join(filter(None, (student['last_name'], student['first_name'],
+                                                           student['middle_name'])))
+            context.group_id = student['group_id']
+            context.group_name = student['group__name'] or ''
+    return context
+
+
+def get_request_role(request):
+    # Resolved for every request, right with any cache
+    if not request.user.is_authenticated:
+        return RoleContext()
+    return resolve_role(request.user)
+
+
+def get_role_context(request):
+    # Kept in the session until the role version changes, the versions have to live in a cache shared by all workers
+    user = request.user
+    if not user.is_authenticated:
+        return RoleContext()
+    version = role_version(user.pk)
+    stored = request.session.get(ROLE_SESSION_KEY)
+    if stored is not None and stored['user_id'] == user.pk and stored['version'] == version:
+        return RoleContext(**stored['role'])
+    context = resolve_role(user)
+    request.session[ROLE_SESSION_KEY] = {'user_id': user.pk, 'version': version, 'role': context.as_dict()}
+    return context
@@ -0,0 +1,166 @@
+import re
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.db.models import F, Func, Q, Value
+from django.urls import reverse
+
+from main.models import *
+
+FTS_TABLE = 'main_person_fts'
+INDEX_BATCH = 500
+
+fts_tables = {}
+
+
+def person_querysets():
+    return {
+        'student': Student.objects.all(),
+        'dismissed': DismissedStudent.objects.all(),
+        'teacher': User.objects.filter(is_teacher=True, student_profile=None),
+    }
+
+
+def use_fts():
+    # The table only exists on SQLite builds with FTS5, see migrations 0007 and 0014
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in fts_tables:
+        fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+    return fts_tables[name]
+
+
+def full_name(person):
+    return ' '.join(filter(None, (person.last_name, person.first_name, person.middle_name)))
+
+
+def person_row(kind, person):
+    number = getattr(person, 'number', None)
+    return (kind, person.pk, full_name(person), person.phone_number or '', person.username,
+            '' if number is None else str(number), person.email or '')
+
+
+def indexed_fields(model):
+    # Fields whose change can change the model's rows in the index
+    names = ['last_name', 'first_name', 'middle_name', 'phone_number', 'username', 'number',
+             'email', 'is_teacher', 'student_profile']
+    return [field for field in model._meta.concrete_fields if field.name in names]
+
+
+def needs_reindex(instance, update_fields=None):
+    # Called before a save: False when the save can't change what is indexed, e.g. last_login or password updates
+    fields = indexed_fields(type(instance))
+    if update_fields is not None and not {field.name for field in fields} & set(update_fields):
+        return False
+    if instance.pk is None:
+        return True
+    old = type(instance).objects.filter(pk=instance.pk).values(*(field.attname for field in fields)).first()
+    return old is None or any(old[field.attname] != getattr(instance, field.attname) for field in fields)
+
+
+def index_people(kind, people, replace=True):
+    # replace=False skips dropping old rows, for people that were just created
+    if not use_fts():
+        return
+    people = list(people)
+    with connection.cursor() as cursor:
+        for i in range(0, len(people), INDEX_BATCH):
+            batch = people[i:i + INDEX_BATCH]
+            if replace:
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE kind = %s '
+                               f'AND object_id IN ({", ".join(["%s"] * len(batch))})',
+                               [kind, *(person.pk for person in batch)])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (kind, object_id, name, phone_number, username, number, '
+                               f'email) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                               [person_row(kind, person) for person in batch])
+
+
+def unindex_person(kind, pk):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE kind = %s AND object_id = %s', [kind, pk])
+
+
+def rebuild_search_index():
+    if not use_fts():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    count = 0
+    for kind, queryset in person_querysets().items():
+        people = list(queryset.iterator(chunk_size=INDEX_BATCH))
+        index_people(kind, people, replace=False)
+        count += len(people)
+    return count
+
+
+def person_url(kind, pk, name):
+    if kind == 'student':
+        return reverse('edit-student', kwargs={'pk': pk})
+    elif kind == 'teacher':
+        return reverse('edit-user', kwargs={'pk': pk})
+    return f'{reverse("dismissed-students")}?{urlencode({"q": name.split(" ")[0]})}'
+
+
+def search_words(query):
+    return re.findall(r'\w+', query)[:10]
+
+
+def search_people(query, kinds=None, limit=10):
+    # [{'kind', 'id', 'name', 'url'}], every word is matched as a prefix
+    words = search_words(query)
+    kinds = [kind for kind in (kinds or person_querysets()) if kind in person_querysets()]
+    if not words or not kinds:
+        return []
+
+    if use_fts():
+        rows = fts_search(words, kinds, limit)
+    elif connection.vendor == 'postgresql':
+        rows = postgres_search(words, kinds, limit)
+    else:
+        rows = orm_search(words, kinds, limit)
+    return [{'kind': kind, 'id': pk, 'name': name, 'url': person_url(kind, pk, name)} for kind, pk, name in rows]
+
+
+def fts_search(words, kinds, limit):
+    match = ' '.join(f'"{word}"*' for word in words)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT kind, object_id, name FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                       f'AND kind IN ({", ".join(["%s"] * len(kinds))}) ORDER BY rank LIMIT %s',
+                       [match, *kinds, limit])
+        return [(kind, int(pk), name) for kind, pk, name in cursor.fetchall()]
+
+
+def postgres_search(words, kinds, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config='simple')
+    rows = []
+    for kind in kinds:
+        queryset = person_querysets()[kind]
+        # the "simple" parser keeps an email as one word, its parts are split like in the other searches
+        email = Func(F('email'), Value('[@.]'), Value(' '), Value('g'), function='regexp_replace')
+        fields = ['last_name', 'first_name', 'middle_name', 'phone_number', 'username', email]
+        if kind == 'student':
+            fields.append('number')
+        vector = SearchVector(*fields, config='simple')
+        for person in queryset.annotate(search=vector, rank=SearchRank(vector, query)).filter(
+                search=query).order_by('-rank')[:limit]:
+            rows.append((person.rank, kind, person.pk, full_name(person)))
+    return [row[1:] for row in sorted(rows, key=lambda row: -row[0])[:limit]]
+
+
+def orm_search(words, kinds, limit):
+    # search_words splits an email at "@" and ".", so its parts are matched anywhere in it
+    rows = []
+    for kind in kinds:
+        queryset = person_querysets()[kind]
+        for word in words:
+            queryset = queryset.filter(Q(last_name__istartswith=word) | Q(first_name__istartswith=word) |
+                                       Q(middle_name__istartswith=word) | Q(phone_number__startswith=word) |
+                                       Q(username__istartswith=word) | Q(email__icontains=word))
+        rows.extend((kind, person.pk, full_name(person)) for person in queryset[:limit - len(rows)])
+        if len(rows) >= limit:
+            break
+    return rows
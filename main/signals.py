@@ -0,0 +1,177 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .backends import forget_users
+from .journal import add_mark_delta, apply_summary_deltas, refresh_mark_summaries
+from .models import DismissedStudent, Group, Mark, Module, Notification, Schedule, Student, Topic, User
+from .notifications import broadcast_audiences, bump_feed_version, deliver_broadcasts
+from .roles import invalidate_roles
+from .search import index_people, needs_reindex, unindex_person
+from .timetable import invalidate_schedule_rows, invalidate_schedules
+
+
+# The journal save path keeps summaries up to date with bulk deltas,
+# these cover marks changed anywhere else (admin, shell, cascades)
+@receiver(post_save, sender=Mark)
+def refresh_student_summary(sender, instance, **kwargs):
+    if instance.module_id is not None:
+        transaction.on_commit(lambda: refresh_mark_summaries(instance.module_id, [instance.student_id]))
+
+
+# Queryset deletes and cascades send it for every mark, the journal path deletes without it
+@receiver(post_delete, sender=Mark)
+def subtract_deleted_mark(sender, instance, **kwargs):
+    deltas = {}
+    add_mark_delta(deltas, instance.student_id, instance.mark, -1)
+    apply_summary_deltas(instance.module_id, deltas)
+
+
+@receiver(post_delete, sender=Topic)
+def refresh_module_summaries(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_mark_summaries(instance.module_id))
+
+
+# Cached timetables, see main.timetable
+@receiver(pre_save, sender=Schedule)
+def invalidate_old_schedule(sender, instance, **kwargs):
+    if instance.pk is not None:
+        invalidate_schedule_rows(Schedule.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Schedule)
+def invalidate_saved_schedule(sender, instance, **kwargs):
+    invalidate_schedules([instance.group_id])
+
+
+@receiver(pre_delete, sender=Schedule)
+def invalidate_deleted_schedule(sender, instance, **kwargs):
+    invalidate_schedule_rows(Schedule.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Schedule.teachers.through)
+def invalidate_schedule_teachers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            invalidate_schedule_rows(Schedule.objects.filter(teachers=instance))
+        else:
+            invalidate_schedule_rows(Schedule.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        if reverse:
+            invalidate_schedules(Schedule.objects.filter(pk__in=pk_set).values_list('group_id', flat=True),
+                                 [instance.pk])
+        else:
+            invalidate_schedules([instance.group_id], pk_set)
+
+
+@receiver(post_save, sender=Module)
+@receiver(pre_delete, sender=Module)
+def invalidate_module_schedules(sender, instance, **kwargs):
+    invalidate_schedule_rows(Schedule.objects.filter(module=instance))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_schedules(sender, instance, **kwargs):
+    invalidate_schedule_rows(Schedule.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=User)
+def invalidate_teacher_schedules(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, students never teach
+    if instance.student_profile_id is None and update_fields != frozenset(['last_login']):
+        invalidate_schedule_rows(Schedule.objects.filter(teachers=instance))
+
+
+# Full-text search of people, see main.search
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=DismissedStudent)
+@receiver(pre_save, sender=User)
+def check_reindex(sender, instance, update_fields=None, **kwargs):
+    instance._reindex = needs_reindex(instance, update_fields)
+
+
+@receiver(post_save, sender=Student)
+def index_student(sender, instance, **kwargs):
+    if getattr(instance, '_reindex', True):
+        index_people('student', [instance])
+
+
+@receiver(post_delete, sender=Student)
+def unindex_student(sender, instance, **kwargs):
+    unindex_person('student', instance.pk)
+
+
+@receiver(post_save, sender=DismissedStudent)
+def index_dismissed_student(sender, instance, **kwargs):
+    if getattr(instance, '_reindex', True):
+        index_people('dismissed', [instance])
+
+
+@receiver(post_delete, sender=DismissedStudent)
+def unindex_dismissed_student(sender, instance, **kwargs):
+    unindex_person('dismissed', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def index_teacher(sender, instance, **kwargs):
+    if not getattr(instance, '_reindex', True):
+        return
+    if instance.is_teacher and instance.student_profile_id is None:
+        index_people('teacher', [instance])
+    else:
+        unindex_person('teacher', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def unindex_teacher(sender, instance, **kwargs):
+    unindex_person('teacher', instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notifications_changed(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(pre_save, sender=User)
+def remember_broadcast_audiences(sender, instance, update_fields=None, **kwargs):
+    instance._audiences = set()
+    if update_fields is not None and not {'is_teacher', 'student_profile'} & set(update_fields):
+        instance._audiences = None
+    elif instance.pk is not None:
+        old = User.objects.filter(pk=instance.pk).values_list('is_teacher', 'student_profile_id').first()
+        if old is not None:
+            instance._audiences = broadcast_audiences(*old)
+
+
+@receiver(post_save, sender=User)
+def deliver_joined_broadcasts(sender, instance, **kwargs):
+    # Students and teachers that are new to their audience get the broadcasts sent before
+    old = getattr(instance, '_audiences', None)
+    if old is not None:
+        deliver_broadcasts([instance.pk], broadcast_audiences(instance.is_teacher, instance.student_profile_id) - old)
+
+
+# Role contexts kept in sessions and cached session users, see main.roles and main.backends
+@receiver(post_save, sender=User)
+def user_role_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields != frozenset(['last_login']):
+        invalidate_roles([instance.pk])
+        forget_users([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(pre_delete, sender=Student)
+def student_role_changed(sender, instance, **kwargs):
+    invalidate_roles(User.objects.filter(student_profile=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_roles_changed(sender, instance, **kwargs):
+    invalidate_roles(User.objects.filter(student_profile__group=instance).values_list('pk', flat=True))
@@ -0,0 +1,18 @@
+from django.db.backends.sqlite3 import base
+
+from project_college.settings import SQLITE_PRAGMAS
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # The stock SQLite backend plus SQLITE_PRAGMAS on every new connection: WAL lets readers run
+    # next to the writer, busy_timeout waits for the write lock instead of failing at once
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads before writing can't wait for the write lock,
+        # SQLite fails it with "database is locked" to avoid a deadlock. Taking the lock at BEGIN can wait
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,42 @@
+// Sends only the edited journal cells instead of the whole form
+$(function () {
+    let form = $('.journal-table');
+    let dirty = new Set();
+
+    form.on('input', 'input[type=text]', function () {
+        dirty.add(this);
+    });
+
+    form.on('submit', function (event) {
+        event.preventDefault();
+
+        let cells = {};
+        dirty.forEach(function (input) {
+            cells[input.name] = input.value;
+        });
+
+        $.ajax({
+            url: form.data('cellsUrl'),
+            method: 'POST',
+            contentType: 'application/json',
+            headers: {'X-CSRFToken': form.find('input[name=csrfmiddlewaretoken]').val()},
+            data: JSON.stringify({version: form.data('version'), cells: cells}),
+        }).done(function (response) {
+            form.data('version', response.version);
+            $.each(response.renamed, function (oldName, newName) {
+                form.find('input[name="' + oldName + '"]').attr('name', newName);
+            });
+            $('.mid-mark-total').each(function (i) {
+                $(this).text(response.mid_marks[i]);
+            });
+            $('.absences-count').each(function (i) {
+                $(this).text(response.absences[i]);
+            });
+            dirty.clear();
+            $('.journal-msg').text(response.msg || '');
+        }).fail(function (xhr) {
+            let response = xhr.responseJSON || {};
+            $('.journal-msg').text(response.msg || xhr.statusText);
+        });
+    });
+});
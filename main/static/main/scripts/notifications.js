@@ -0,0 +1,25 @@
+// Polls the notification feed for notifications newer than the first shown one
+$(function () {
+    let feed = $('.notif-feed[data-feed-url]');
+    if (!feed.length) {
+        return;
+    }
+    let since = feed.data('since');
+
+    setInterval(function () {
+        // the browser revalidates with If-None-Match, an unchanged feed answers 304 without a body
+        $.ajax({url: feed.data('feedUrl'), data: {since: since}, dataType: 'json', ifModified: true}).done(function (data, status) {
+            if (status === 'notmodified' || !data) {
+                return;
+            }
+            $.each(data.notifications, function (i, notification) {
+                let box = $('<div class="notif-box notif-unread">');
+                box.append($('<div class="date-time-notif">').text(new Date(notification.date_time).toLocaleString()));
+                box.append($('<div class="notif-content">').text(notification.content));
+                feed.prepend(box);
+            });
+            since = data.last_id;
+            $('.notif-count').text(data.unread);
+        });
+    }, 30000);
+});
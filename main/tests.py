@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
+import zipfile
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .accounts import default_password_hash
+from .checks import check_shared_caches
+from .backends import user_cache
+from .conflicts import group_conflicts, timetable_conflicts
+from .forms import ScheduleForm, UserForm
+from .functions import add_students
+from .generator import apply_timetable, generate_timetable, solve_timetable
+from .imports import fail_stale_import_jobs, run_import_job
+from .loadtest import JOURNEYS, route_summary, run_journeys, seed_college
+from .journal import build_journal_grid, fake_journal, parse_journal_post, save_journal
+from .notifications import deliver_notification, notification_cache, user_notifications
+from .reports import collect_report_data
+from .search import rebuild_search_index, search_people, use_fts
+from .timetable import get_group_schedule, get_teacher_schedule, schedule_cache
+from .models import *
+from project_college.settings import DEFAULT_ACCOUNT_PASSWORD, MIDDLEWARE
+from .management.commands.benchmark_timetable import synthetic_college
+
+
+class JournalGridTests(SimpleTestCase):
+    def test_grid(self):
+        topics = [Topic(pk=1, name='A', hours=2, module_id=1), Topic(pk=2, name='B', hours=3, module_id=1)]
+        students = [Student(pk=10), Student(pk=20)]
+        marks = [Mark(pk=100, topic_id=1, student_id=10, mark=80),
+                 Mark(pk=101, topic_id=2, student_id=10, mark=None),
+                 Mark(pk=102, topic_id=2, student_id=20, mark=61)]
+        completed = [CompletedTopic(pk=5, topic_id=2, module_id=1)]
+
+        journal = build_journal_grid(topics, students, marks, completed)
+
+        self.assertEqual(journal['total_hours'], 5)
+        self.assertEqual(journal['marks'][0], [(topics[0], ' ', 'date'), (100, 80), (' ', 20)])
+        self.assertEqual(journal['marks'][1], [(topics[1], completed[0], 'date'), (101, None), (102, 61)])
+        self.assertEqual(journal['mid_marks'], [80, 61])
+
+    def test_grid_scales_linearly(self):
+        # Marks and completed topics are indexed in one pass, never scanned per cell, so the work grows with
+        # the cells. Timings are left to the benchmark_journal command
+        class CountedRows(list):
+            reads = 0
+
+            def __iter__(self):
+                for row in super().__iter__():
+                    self.reads += 1
+                    yield row
+
+        topics, students, marks, completed = fake_journal(120, 30)
+        marks, completed = CountedRows(marks), CountedRows(completed)
+        journal = build_journal_grid(topics, students, marks, completed)
+
+        self.assertEqual(len(journal['marks']), 120)
+        self.assertEqual((marks.reads, completed.reads), (len(marks), len(completed)))
+
+
+class JournalSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.module = Module.objects.create(module_name='Математика', exam_type='e')
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+        cls.sch = Schedule.objects.create(group=cls.group, module=cls.module, date=0)
+        cls.sch.teachers.add(cls.teacher)
+        cls.students = Student.objects.bulk_create(
+            [Student(username=f'st{i}', first_name=f'{i}', last_name=f'{i}', group=cls.group) for i in range(30)])
+        cls.topics = Topic.objects.bulk_create(
+            [Topic(name=f'Тема {i}', hours=2, module=cls.module) for i in range(120)])
+
+    def test_parse_post(self):
+        diff, msg = parse_journal_post({
+            'csrfmiddlewaretoken': 'x',
+            '5': '90', '6': 'н', '7': '', '8': '1000',
+            '1_2': '70', '1_3': '',
+            'date_empty_4': '01.09.23', 'date_empty_5': 'bad',
+            'date_9': '', 'date_10': '02.09.23',
+        })
+
+        self.assertEqual(diff['marks'], {5: 90, 6: None})
+        self.assertEqual(diff['deleted_marks'], {7})
+        self.assertEqual(diff['new_marks'], {(1, 2): 70})
+        self.assertEqual(list(diff['new_dates']), [4])
+        self.assertEqual(list(diff['dates']), [10])
+        self.assertEqual(diff['deleted_dates'], {9})
+        self.assertIsNotNone(msg)
+
+    def test_full_journal_save_is_batched(self):
+        existing = Mark.objects.bulk_create([Mark(student=student, topic=topic, module=self.module, mark=50)
+                                             for topic in self.topics[:60] for student in self.students])
+        compl_topic = CompletedTopic.objects.create(date_time=timezone.now(), topic=self.topics[0],
+                                                    module=self.module)
+
+        data = {str(mark.pk): '' if n % 10 == 0 else '80' for n, mark in enumerate(existing)}
+        for topic in self.topics[60:]:
+            data[f'date_empty_{topic.pk}'] = '01.09.23'
+            for student in self.students:
+                data[f'{topic.pk}_{student.pk}'] = '75'
+        data[f'date_{compl_topic.pk}'] = '02.09.23'
+        self.assertEqual(len(data), 120 * 30 + 61)
+
+        with CaptureQueriesContext(connection) as queries:
+            save_journal(self.sch, self.teacher, data)
+
+        # SQLite caps query parameters, so batches are split, but never per cell
+        self.assertLess(len(queries), 50)
+
+        self.assertEqual(Mark.objects.filter(mark=80).count(), 1620)
+        self.assertEqual(Mark.objects.filter(mark=75).count(), 1800)
+        self.assertEqual(CompletedTopic.objects.count(), 61)
+
+        for summary in MarkSummary.objects.filter(module=self.module):
+            marks = [mark.mark for mark in Mark.objects.filter(student_id=summary.student_id)]
+            self.assertEqual((summary.marks_count, summary.marks_sum, summary.absences),
+                             (len(marks), sum(marks), 0))
+        self.assertEqual(MarkSummary.objects.count(), 30)
+
+    def test_stale_empty_cells_update_existing_rows(self):
+        topic, student = self.topics[0], self.students[0]
+        mark = Mark.objects.create(student=student, topic=topic, module=self.module, mark=50)
+        compl_topic = CompletedTopic.objects.create(date_time=timezone.now(), topic=topic, module=self.module)
+
+        # Page loaded before the mark and date were saved from another tab
+        save_journal(self.sch, self.teacher, {f'{topic.pk}_{student.pk}': '90', f'date_empty_{topic.pk}': '03.09.23'})
+
+        self.assertEqual(list(Mark.objects.values_list('pk', 'mark')), [(mark.pk, 90)])
+        self.assertEqual(list(CompletedTopic.objects.values_list('pk', flat=True)), [compl_topic.pk])
+        self.assertEqual(CompletedTopic.objects.get().date_time.day, 3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Mark.objects.create(student=student, topic=topic, module=self.module, mark=70)
+
+    def test_summary_deltas(self):
+        student = self.students[0]
+        save_journal(self.sch, self.teacher, {f'{self.topics[0].pk}_{student.pk}': '90',
+                                              f'{self.topics[1].pk}_{student.pk}': 'н'})
+        summary = MarkSummary.objects.get(student=student, module=self.module)
+        self.assertEqual((summary.marks_count, summary.marks_sum, summary.absences), (1, 90, 1))
+
+        marks = {mark.topic_id: mark.pk for mark in Mark.objects.filter(student=student)}
+        save_journal(self.sch, self.teacher, {str(marks[self.topics[0].pk]): '',
+                                              str(marks[self.topics[1].pk]): '70',
+                                              f'{self.topics[2].pk}_{student.pk}': '60'})
+        summary.refresh_from_db()
+        self.assertEqual((summary.marks_count, summary.marks_sum, summary.absences), (2, 130, 0))
+        self.assertEqual(summary.average(), 65)
+        self.assertEqual(summary.rating(), 'mid')
+
+    def test_summaries_follow_deletes_outside_journal(self):
+        student = self.students[0]
+        save_journal(self.sch, self.teacher, {f'{self.topics[0].pk}_{student.pk}': '90',
+                                              f'{self.topics[1].pk}_{student.pk}': '60',
+                                              f'{self.topics[2].pk}_{student.pk}': 'н'})
+        summary = MarkSummary.objects.get(student=student, module=self.module)
+
+        Mark.objects.filter(student=student, topic=self.topics[0]).delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.marks_count, summary.marks_sum, summary.absences), (1, 60, 1))
+
+        # cascade from the topic
+        self.topics[2].delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.marks_count, summary.marks_sum, summary.absences), (1, 60, 0))
+
+    def test_cells_endpoint(self):
+        mark = Mark.objects.create(student=self.students[0], topic=self.topics[0], module=self.module, mark=50)
+        self.client.force_login(self.teacher)
+        url = reverse('teacher-journal-cells', kwargs={'sch_pk': self.sch.pk})
+
+        response = self.client.post(url, {'version': 0, 'cells': {
+            str(mark.pk): '90',
+            f'{self.topics[1].pk}_{self.students[1].pk}': 'н',
+        }}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+        new_mark = Mark.objects.get(topic=self.topics[1], student=self.students[1])
+        self.assertEqual(response.json()['renamed'], {f'{self.topics[1].pk}_{self.students[1].pk}': str(new_mark.pk)})
+        mark.refresh_from_db()
+        self.assertEqual(mark.mark, 90)
+        # the page updates its averages and absences from the response
+        self.assertEqual(response.json()['mid_marks'][:3], [90, 0, 0])
+        self.assertEqual(response.json()['absences'][:3], [0, 1, 0])
+
+        response = self.client.post(url, {'version': 0, 'cells': {str(mark.pk): ''}},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Mark.objects.filter(pk=mark.pk).exists())
+
+        response = self.client.post(url, {'version': 1, 'cells': {str(mark.pk): ''}},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['renamed'], {str(mark.pk): f'{self.topics[0].pk}_{self.students[0].pk}'})
+        self.assertFalse(Mark.objects.filter(pk=mark.pk).exists())
+
+
+class StudentMarksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.module = Module.objects.create(module_name='Математика', exam_type='e')
+        cls.sch = Schedule.objects.create(group=cls.group, module=cls.module, date=0)
+        cls.sch.teachers.add(User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True))
+        cls.student = Student.objects.create(username='student', first_name='S', last_name='S', group=cls.group)
+        cls.user = User.objects.create(username='student', first_name='S', last_name='S', student_profile=cls.student)
+
+    def add_topics(self, count):
+        topics = Topic.objects.bulk_create([Topic(name=f'Тема {i}', module=self.module) for i in range(count)])
+        Mark.objects.bulk_create([Mark(student=self.student, topic=topic, module=self.module, mark=60 + i % 40)
+                                  for i, topic in enumerate(topics) if i % 3])
+        CompletedTopic.objects.bulk_create([CompletedTopic(topic=topic, module=self.module, date_time=timezone.now())
+                                            for topic in topics[::2]])
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student-marks', kwargs={'sch_pk': self.sch.pk}))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_constant_queries(self):
+        self.client.force_login(self.user)
+        # the first page caches the role context and the unread count
+        self.get_page()
+
+        self.add_topics(3)
+        response, small = self.get_page()
+        marks = response.context['data']['tables'][0]['marks']
+        self.assertEqual([mark['mark'] for mark in marks], [' ', 61, 62])
+        self.assertEqual([mark['average'] for mark in marks], [0, 61, 61.5])
+        self.assertIsNotNone(marks[0]['date'])
+        self.assertIsNone(marks[1]['date'])
+
+        self.add_topics(60)
+        response, big = self.get_page()
+        self.assertEqual(len(response.context['data']['tables'][0]['marks']), 63)
+        self.assertEqual(small, big)
+        self.assertLessEqual(big, 10)
+
+
+def notify(groups=(), modules=(), users=(), **fields):
+    notification = Notification.objects.create(**fields)
+    notification.groups.set(groups)
+    notification.modules.set(modules)
+    notification.users.set(users)
+    deliver_notification(notification)
+    return notification
+
+
+def excel_upload(rows):
+    excel = openpyxl.Workbook()
+    for row in rows:
+        excel.active.append(row)
+    file = io.BytesIO()
+    excel.save(file)
+    return SimpleUploadedFile('import.xlsx', file.getvalue())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExcelImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+        cls.group = Group.objects.create(name='П-11')
+
+    def import_students(self, rows):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('add-student-file'), {
+            'group': self.group.pk, 'excel_file': excel_upload(rows)})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertEqual(job.status, 'pending')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(run_import_job(job.pk))
+        job.refresh_from_db()
+        return job, len(queries)
+
+    def test_student_import(self):
+        rows = [['header']] + [[f'st{i}', f'Имя {i}', f'Фамилия {i}', None, None, '01.09.05', None, i]
+                               for i in range(250)]
+
+        job, queries = self.import_students(rows)
+
+        self.assertEqual((job.status, job.rows_total, job.rows_processed, job.errors), ('done', 250, 250, []))
+        self.assertFalse(job.file)
+        # users are inserted in batches of 999 / 20 columns on SQLite
+        self.assertLess(queries, 25)
+        self.assertEqual(Student.objects.filter(group=self.group).count(), 250)
+        user = User.objects.select_related('student_profile').get(username='st7')
+        self.assertEqual(user.student_profile.number, 7)
+        self.assertEqual(user.student_profile.birthday, datetime.date(2005, 9, 1))
+        self.assertTrue(user.check_password(DEFAULT_ACCOUNT_PASSWORD))
+        self.assertFalse(run_import_job(job.pk))
+
+        response = self.client.get(reverse('import-job-status', kwargs={'pk': job.pk}))
+        self.assertEqual(response.json()['status'], 'done')
+
+    def test_student_import_errors(self):
+        rows = [['header'], ['admin', 'A', 'A'], ['new', None, 'B'], ['dup', 'C', 'C'], ['dup', 'D', 'D'],
+                [None, 'E', 'E'], [None, 'F', 'F']]
+
+        job, queries = self.import_students(rows)
+
+        self.assertEqual(job.status, 'failed')
+        # empty logins are empty cells, not duplicates of each other
+        self.assertEqual([(error['row'], error['column']) for error in job.errors],
+                         [(3, 2), (6, 1), (7, 1), (2, 1), (5, 1)])
+        self.assertFalse(Student.objects.exists())
+        response = self.client.get(job.get_absolute_url())
+        self.assertContains(response, 'строка - 3')
+
+    def test_stale_jobs_fail(self):
+        old = timezone.now() - datetime.timedelta(hours=1)
+        job = ImportJob.objects.create(kind='students', params={'group': self.group.pk})
+        ImportJob.objects.filter(pk=job.pk).update(status='running', updated_at=old)
+        alive = ImportJob.objects.create(kind='students', params={'group': self.group.pk}, status='running')
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('import-job-status', kwargs={'pk': job.pk}))
+
+        self.assertEqual(response.json()['status'], 'failed')
+        job.refresh_from_db()
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(len(job.errors), 1)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, 'running')
+        self.assertEqual(fail_stale_import_jobs(), 0)
+
+    def test_topic_upsert(self):
+        module = Module.objects.create(module_name='Математика', exam_type='e')
+        self.client.force_login(self.admin)
+        rows = [['header']] + [[2, f'Тема {i}', f'Задание {i}'] for i in range(100)]
+
+        for update_existing in (True, True, False):
+            self.client.post(reverse('add-topic-file'), {
+                'module': module.pk, 'update_existing': update_existing, 'excel_file': excel_upload(rows)})
+            job = ImportJob.objects.latest('pk')
+            run_import_job(job.pk)
+            job.refresh_from_db()
+            rows[5][0] = 4
+            rows.append([1, 'Новая тема', 'Задание'])
+
+        results = [job.result for job in ImportJob.objects.order_by('pk')]
+        self.assertEqual(results, [{'inserted': 100, 'updated': 0, 'unchanged': 0},
+                                   {'inserted': 1, 'updated': 1, 'unchanged': 99},
+                                   {'inserted': 102, 'updated': 0, 'unchanged': 0}])
+        self.assertEqual(Topic.objects.get(module=module, position=5).hours, 4)
+        self.assertEqual(Topic.objects.filter(module=module).count(), 203)
+
+    def test_topic_reimport_without_positions(self):
+        module = Module.objects.create(module_name='Математика', exam_type='e')
+        # created before topics had positions
+        Topic.objects.bulk_create([Topic(name=f'Тема {i}', hours=2, home_task=f'Задание {i}', module=module)
+                                   for i in range(10)])
+        self.client.force_login(self.admin)
+        rows = [['header']] + [[2, f'Тема {i}', f'Задание {i}'] for i in range(10)]
+        rows.insert(4, [2, 'Новая тема', 'Задание'])
+
+        self.client.post(reverse('add-topic-file'), {
+            'module': module.pk, 'update_existing': True, 'excel_file': excel_upload(rows)})
+        job = ImportJob.objects.get()
+        run_import_job(job.pk)
+        job.refresh_from_db()
+
+        self.assertEqual(job.result, {'inserted': 1, 'updated': 10, 'unchanged': 0})
+        self.assertEqual(list(Topic.objects.filter(module=module).values_list('name', flat=True)),
+                         [row[1] for row in rows[1:]])
+        self.assertEqual(list(Topic.objects.filter(module=module).values_list('position', flat=True)),
+                         list(range(1, 12)))
+
+
+class JournalExportTests(TestCase):
+    def test_export(self):
+        group = Group.objects.create(name='П-11')
+        module = Module.objects.create(module_name='Математика', exam_type='e')
+        teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+        sch = Schedule.objects.create(group=group, module=module, date=0)
+        sch.teachers.add(teacher)
+        students = Student.objects.bulk_create([Student(username=f'st{i}', first_name='И', last_name=f'Ф{i}',
+                                                        group=group) for i in range(3)])
+        topics = Topic.objects.bulk_create([Topic(name=f'Тема {i}', hours=2, module=module) for i in range(2)])
+        save_journal(sch, teacher, {f'{topics[0].pk}_{students[0].pk}': '90',
+                                    f'{topics[1].pk}_{students[0].pk}': 'н',
+                                    f'{topics[1].pk}_{students[2].pk}': '70',
+                                    f'date_empty_{topics[0].pk}': '01.09.23'})
+
+        self.client.force_login(teacher)
+        response = self.client.get(reverse('export-journal', kwargs={'group_pk': group.pk, 'module_pk': module.pk}))
+        excel = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+        rows = list(excel.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:4], ('№', 'ФИО', 'Тема 0', 'Тема 1'))
+        self.assertEqual(rows[1][2], datetime.datetime(2023, 9, 1))
+        self.assertEqual(rows[3], (1, 'Ф0 И', 90, 'н', 90, 1))
+        self.assertEqual(rows[4], (2, 'Ф1 И', None, None, 0, 0))
+        self.assertEqual(rows[5], (3, 'Ф2 И', None, 70, 70, 0))
+
+        self.client.force_login(User.objects.create(username='other', first_name='O', last_name='O', is_teacher=True))
+        response = self.client.get(reverse('export-journal', kwargs={'group_pk': group.pk, 'module_pk': module.pk}))
+        self.assertEqual(response.status_code, 302)
+
+
+class ReportTests(TestCase):
+    def test_reports(self):
+        module = Module.objects.create(module_name='Математика', exam_type='e', hours_1=10, hours_2=6)
+        teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+        topics = Topic.objects.bulk_create([Topic(name=f'Тема {i}', hours=2, module=module) for i in range(3)])
+        for name in ('П-11', 'П-12'):
+            group = Group.objects.create(name=name)
+            sch = Schedule.objects.create(group=group, module=module, date=0)
+            student = Student.objects.create(username=name, first_name='И', last_name='Ф', group=group)
+            save_journal(sch, teacher, {f'{topics[0].pk}_{student.pk}': '90', f'{topics[1].pk}_{student.pk}': 'н',
+                                        f'date_empty_{topics[0].pk}': '01.09.23'})
+        Group.objects.create(name='П-13')
+        # two names that share the first 31 characters, the limit of a sheet title
+        long_names = [Group.objects.create(name='Программирование в компьютерных системах ' + suffix)
+                      for suffix in ('А', 'Б')]
+
+        with self.assertNumQueries(6):
+            data = collect_report_data(2)
+        self.assertEqual(data[0]['rows'], [['Математика', 6, 3, 1, 2, 90, 1]])
+        self.assertEqual(data[2]['rows'], [])
+
+        admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('reports'), {'semester': 0})
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            groups = dict(Group.objects.values_list('name', 'pk'))
+            self.assertEqual(len(archive.namelist()), 5)
+            self.assertIn(f'{long_names[1].pk} {long_names[1].name[:31]}.xlsx', archive.namelist())
+            excel = openpyxl.load_workbook(archive.open(f'{groups["П-12"]} П-12.xlsx'))
+        self.assertEqual(list(excel.active.iter_rows(values_only=True))[3][:2], ('Математика', 16))
+
+
+class ScheduleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.module = Module.objects.create(module_name='Математика', exam_type='e')
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+        cls.student = Student.objects.create(username='student', first_name='S', last_name='S', group=cls.group)
+        cls.user = User.objects.create(username='student', first_name='S', last_name='S', student_profile=cls.student)
+
+    def setUp(self):
+        schedule_cache().clear()
+
+    def add_schedule(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            sch = Schedule.objects.create(group=self.group, module=self.module, **kwargs)
+            sch.teachers.add(self.teacher)
+        return sch
+
+    def test_pages_are_cached_until_schedule_changes(self):
+        sch = self.add_schedule(date=0)
+        self.client.force_login(self.user)
+        url = reverse('student-modules')
+
+        self.assertEqual(self.client.get(url).context['week'][0][1], [sch])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if 'main_schedule' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sch.date = 2
+            sch.save()
+        week = self.client.get(url).context['week']
+        self.assertEqual((week[0][1], week[2][1]), ([], [sch]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sch.delete()
+        self.assertEqual(self.client.get(url).context['week'][2][1], [])
+
+    def test_teacher_cache_follows_teachers(self):
+        sch = self.add_schedule(date=1)
+        other = User.objects.create(username='other', first_name='O', last_name='O', is_teacher=True)
+        self.assertEqual(get_teacher_schedule(self.teacher.pk)[self.group.pk][1], [sch])
+        self.assertEqual(get_teacher_schedule(other.pk), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sch.teachers.set([other])
+        self.assertEqual(get_teacher_schedule(self.teacher.pk), {})
+        self.assertEqual(get_teacher_schedule(other.pk)[self.group.pk][1], [sch])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.schedule_set.clear()
+        self.assertEqual(get_teacher_schedule(other.pk), {})
+        self.assertEqual(list(get_group_schedule(self.group.pk)[1][0].teachers.all()), [])
+
+
+class ScheduleQueriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.teachers = [User.objects.create(username=f'teacher{i}', first_name='T', last_name=f'{i}', is_teacher=True)
+                        for i in range(3)]
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+        student = Student.objects.create(username='student', first_name='S', last_name='S', group=cls.group)
+        cls.student = User.objects.create(username='student', first_name='S', last_name='S', student_profile=student)
+
+    def add_lessons(self, count):
+        for i in range(count):
+            module = Module.objects.create(module_name=f'Предмет {i}', exam_type='e')
+            sch = Schedule.objects.create(group=self.group, module=module, date=i % 6,
+                                          time_start=datetime.time(8 + i // 6), time_end=datetime.time(9 + i // 6))
+            sch.teachers.set(self.teachers)
+
+    def setUp(self):
+        schedule_cache().clear()
+
+    def count_queries(self, user, url):
+        schedule_cache().clear()
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def pages(self):
+        return [
+            (self.admin, reverse('days-schedule', kwargs={'pk': self.group.pk})),
+            (self.teachers[0], reverse('teacher-modules', kwargs={'group_pk': self.group.pk})),
+            (self.student, reverse('student-modules')),
+            (self.teachers[0], reverse('teacher-groups')),
+            (self.teachers[0], reverse('teacher-week')),
+        ]
+
+    def test_constant_queries(self):
+        self.add_lessons(1)
+        small = [self.count_queries(user, url) for user, url in self.pages()]
+        self.add_lessons(20)
+        self.assertEqual([self.count_queries(user, url) for user, url in self.pages()], small)
+
+    def test_teacher_groups_and_week(self):
+        self.add_lessons(7)
+        other = Group.objects.create(name='А-11')
+        sch = Schedule.objects.create(group=other, module=Module.objects.get(module_name='Предмет 1'), date=0,
+                                      time_start=datetime.time(7), time_end=datetime.time(8))
+        sch.teachers.add(self.teachers[0])
+        Schedule.objects.create(group=other, module=sch.module, date=1).teachers.add(self.teachers[1])
+
+        self.client.force_login(self.teachers[0])
+        groups = list(self.client.get(reverse('teacher-groups')).context['groups'])
+        self.assertEqual([(group.name, group.lessons_count) for group in groups], [('А-11', 1), ('П-11', 7)])
+        self.assertEqual([str(lesson.module) for lesson in groups[0].teacher_lessons], ['Предмет 1'])
+        self.assertEqual(len({lesson.module_id for lesson in groups[1].teacher_lessons}), 7)
+
+        week = self.client.get(reverse('teacher-week')).context['week']
+        self.assertEqual([(lesson.group.name, lesson.time_start.hour) for lesson in week[0][1]],
+                         [('А-11', 7), ('П-11', 8), ('П-11', 9)])
+
+    def test_week_is_time_ordered(self):
+        self.add_lessons(13)
+        week = get_group_schedule(self.group.pk)
+        self.assertEqual(list(week), list(range(6)))
+        self.assertEqual([sch.time_start.hour for sch in week[0]], [8, 9, 10])
+        self.assertEqual(len(week[5]), 2)
+
+        sch = week[0][0]
+        with self.assertNumQueries(0):
+            str(sch)
+
+
+class ScheduleConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.groups = [Group.objects.create(name=f'П-1{i}') for i in range(2)]
+        cls.module = Module.objects.create(module_name='Математика', exam_type='e')
+        cls.teachers = [User.objects.create(username=f'teacher{i}', first_name='T', last_name=f'{i}', is_teacher=True)
+                        for i in range(2)]
+
+    def add_lesson(self, group, teacher, start, end, date=0):
+        sch = Schedule.objects.create(group=group, module=self.module, date=date, time_start=datetime.time(*start),
+                                      time_end=datetime.time(*end))
+        sch.teachers.add(teacher)
+        return sch
+
+    def test_find_conflicts(self):
+        first = self.add_lesson(self.groups[0], self.teachers[0], (8, 0), (10, 0))
+        inside = self.add_lesson(self.groups[1], self.teachers[0], (8, 30), (9, 0))
+        after = self.add_lesson(self.groups[1], self.teachers[0], (9, 30), (11, 0))
+        self.add_lesson(self.groups[0], self.teachers[1], (10, 0), (11, 0))
+        self.add_lesson(self.groups[0], self.teachers[1], (10, 0), (11, 0), date=1)
+        self.add_lesson(self.groups[1], self.teachers[1], (8, 0), (10, 0), date=1)
+
+        conflicts = [(conflict['kind'], conflict['first'], conflict['second']) for conflict in timetable_conflicts()]
+        self.assertEqual(conflicts, [('teacher', first, inside), ('teacher', first, after)])
+        self.assertEqual(len(group_conflicts(self.groups[1].pk)), 2)
+
+    def test_page_conflicts_are_cached(self):
+        schedule_cache().clear()
+        admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+        self.client.force_login(admin)
+        url = reverse('days-schedule', kwargs={'pk': self.groups[0].pk})
+        self.add_lesson(self.groups[0], self.teachers[0], (8, 0), (10, 0))
+        other = self.add_lesson(self.groups[1], self.teachers[0], (11, 0), (12, 0))
+
+        self.assertEqual(self.client.get(url).context['conflicts'], [])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if 'main_schedule' in query['sql']])
+
+        # the teacher's lesson in the other group now overlaps
+        with self.captureOnCommitCallbacks(execute=True):
+            other.time_start = datetime.time(9)
+            other.save()
+        self.assertEqual(len(self.client.get(url).context['conflicts']), 1)
+
+    def test_form_rejects_overlaps(self):
+        self.add_lesson(self.groups[0], self.teachers[0], (8, 0), (9, 30))
+        data = {'group': self.groups[1].pk, 'module': self.module.pk, 'teachers': [self.teachers[0].pk], 'date': 0,
+                'time_start': '09:00', 'time_end': '10:00'}
+
+        form = ScheduleForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn(str(self.teachers[0]), form.non_field_errors()[0])
+
+        form = ScheduleForm(data={**data, 'teachers': [self.teachers[1].pk]})
+        self.assertTrue(form.is_valid())
+        sch = form.save()
+
+        form = ScheduleForm(data={**data, 'teachers': [self.teachers[1].pk], 'time_end': '11:00'}, instance=sch)
+        self.assertTrue(form.is_valid())
+        form = ScheduleForm(data={**data, 'time_end': '08:00'}, instance=sch)
+        self.assertFalse(form.is_valid())
+
+
+class TimetableGeneratorTests(TestCase):
+    def test_solver_places_lessons_without_conflicts(self):
+        assignments = synthetic_college(30, lessons_per_group=20)
+        placements, unplaced = solve_timetable(assignments, 6, 6, max_per_day=4)
+
+        self.assertFalse(unplaced)
+        self.assertEqual(len(placements), 30 * 20)
+        cells = Counter()
+        for n, day, slot in placements:
+            cells[('group', assignments[n]['group'], day, slot)] += 1
+            for teacher in assignments[n]['teachers']:
+                cells[('teacher', teacher, day, slot)] += 1
+        self.assertEqual(max(cells.values()), 1)
+        days = Counter((assignments[n]['group'], day) for n, day, slot in placements)
+        self.assertLessEqual(max(days.values()), 4)
+
+    def test_generate_and_apply(self):
+        teachers = [User.objects.create(username=f'teacher{i}', first_name='T', last_name=f'{i}', is_teacher=True)
+                    for i in range(2)]
+        modules = [Module.objects.create(module_name=f'Предмет {i}', exam_type='e', hours_1=72, hours_3=36 * i)
+                   for i in range(3)]
+        for name in ('П-11', 'П-12'):
+            group = Group.objects.create(name=name)
+            for module in modules:
+                sch = Schedule.objects.create(group=group, module=module, date=0)
+                sch.teachers.add(teachers[module.pk % 2])
+
+        group = Group.objects.get(name='П-12')
+        # a second teacher on another day of the same module, and a module without hours in these semesters
+        Schedule.objects.create(group=group, module=modules[0], date=3).teachers.add(teachers[modules[0].pk % 2 - 1])
+        later = Module.objects.create(module_name='Предмет 5', exam_type='e', hours_5=36)
+        Schedule.objects.create(group=group, module=later, date=1).teachers.add(teachers[0])
+
+        call_command('generate_timetable', '--semester', '1', '--semester', '3', '--apply', stdout=io.StringIO())
+
+        self.assertEqual(Schedule.objects.exclude(module=later).count(), 2 * (2 + 3 + 4))
+        self.assertFalse(Schedule.objects.exclude(module=later).filter(time_start=None).exists())
+        self.assertEqual(Schedule.teachers.through.objects.exclude(schedule__module=later).count(),
+                         Schedule.objects.exclude(module=later).count() + 2)
+        self.assertEqual(set(Schedule.objects.filter(group=group, module=modules[0]).values_list(
+            'teachers', flat=True)), {teachers[0].pk, teachers[1].pk})
+        self.assertTrue(Schedule.objects.filter(group=group, module=later, teachers=teachers[0]).exists())
+        self.assertEqual(timetable_conflicts(), [])
+
+    def test_kept_rows_stay_busy(self):
+        teachers = [User.objects.create(username=f'teacher{i}', first_name='T', last_name=f'{i}', is_teacher=True)
+                    for i in range(2)]
+        groups = [Group.objects.create(name=f'П-1{i}') for i in range(2)]
+        modules = [Module.objects.create(module_name=f'Предмет {i}', exam_type='e', hours_1=36 * 4) for i in range(3)]
+        for group in groups:
+            for module in modules:
+                Schedule.objects.create(group=group, module=module, date=0).teachers.add(teachers[0])
+
+        # a module without hours in semester 1 and a module with more lessons than a week has keep their rows
+        later = Module.objects.create(module_name='Предмет 5', exam_type='e', hours_5=36)
+        too_long = Module.objects.create(module_name='Предмет 6', exam_type='e', hours_1=36 * 30)
+        kept = [Schedule.objects.create(group=groups[0], module=later, date=0, time_start=datetime.time(8),
+                                        time_end=datetime.time(20)),
+                Schedule.objects.create(group=groups[1], module=too_long, date=1, time_start=datetime.time(8),
+                                        time_end=datetime.time(13))]
+        kept[0].teachers.add(teachers[0])
+        kept[1].teachers.add(teachers[1])
+
+        assignments, placements, unplaced = generate_timetable([1])
+        self.assertEqual([assignments[n]['module'] for n in unplaced], [too_long])
+        self.assertEqual(len(placements), 2 * 3 * 4)
+        apply_timetable(assignments, placements)
+
+        self.assertEqual(list(Schedule.objects.filter(module__in=[later, too_long]).order_by('pk')), kept)
+        self.assertFalse(Schedule.objects.filter(date=0).exclude(module=later).exists())
+        self.assertFalse(Schedule.objects.filter(group=groups[1], date=1, time_start__lt=datetime.time(13)).exclude(
+            module=too_long).exists())
+        self.assertEqual(timetable_conflicts(), [])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.students = Student.objects.bulk_create([Student(
+            username=f'st{i}', first_name=f'Name{i % 7}', last_name=f'Last{i % 13}', number=i, group=cls.group,
+            phone_number=f'8777{i:07}'
+        ) for i in range(120)])
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('main_page'))
+
+    def get_page(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['keyset'], [row.pk for row in response.context['object_list']], len(queries)
+
+    def test_walk_pages(self):
+        url = reverse('students-list', kwargs={'group_id': self.group.pk})
+        expected = list(Student.objects.order_by('last_name', 'first_name', 'pk').values_list('pk', flat=True))
+
+        keyset, rows, first_queries = self.get_page(url)
+        self.assertIsNone(keyset['previous'])
+        pages = [rows]
+        while keyset['next']:
+            keyset, rows, queries = self.get_page(url, after=keyset['next'])
+            self.assertEqual(queries, first_queries)
+            pages.append(rows)
+        self.assertEqual([len(page) for page in pages], [50, 50, 20])
+        self.assertEqual(sum(pages, []), expected)
+
+        keyset, rows, queries = self.get_page(url, before=keyset['previous'])
+        self.assertEqual(rows, pages[1])
+        keyset, rows, queries = self.get_page(url, before=keyset['previous'])
+        self.assertEqual((rows, keyset['previous']), (pages[0], None))
+
+        keyset, rows, queries = self.get_page(url, after='not a cursor')
+        self.assertEqual(rows, pages[0])
+
+    def test_search(self):
+        url = reverse('students-list', kwargs={'group_id': self.group.pk})
+        keyset, rows, queries = self.get_page(url, q='last3 name')
+        self.assertEqual(set(rows), {student.pk for student in self.students if student.last_name == 'Last3'})
+        self.assertEqual(keyset['q'], 'last3 name')
+
+        keyset, rows, queries = self.get_page(url, q='42')
+        self.assertEqual(rows, [self.students[42].pk])
+        keyset, rows, queries = self.get_page(url, q='87770000011')
+        self.assertEqual(rows, [self.students[11].pk])
+
+    def test_descending_ordering_with_ties(self):
+        now = timezone.now()
+        Notification.objects.bulk_create([Notification(content=f'Объявление {i}') for i in range(60)])
+        Notification.objects.update(date_time=now)
+
+        keyset, first, queries = self.get_page(reverse('notifs-admin'))
+        keyset, second, queries = self.get_page(reverse('notifs-admin'), after=keyset['next'])
+        self.assertEqual(first + second, list(Notification.objects.order_by('-pk').values_list('pk', flat=True)))
+
+    def test_list_pages(self):
+        for name in ('dismissed-students', 'notifs-admin', 'teachers-list', 'no-group-students-list', 'modules-list',
+                     'topics-modules'):
+            keyset, rows, queries = self.get_page(reverse(name), q='a')
+            self.assertEqual(keyset['q'], 'a')
+
+
+class PeopleSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.student = Student.objects.create(username='ivanov', first_name='Пётр', last_name='Иванов', number=4217,
+                                             group=cls.group, phone_number='87771234567')
+        cls.teacher = User.objects.create(username='smirnova', first_name='Анна', last_name='Смирнова',
+                                          is_teacher=True)
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+
+    def found(self, query, kinds=None):
+        return [(person['kind'], person['id']) for person in search_people(query, kinds)]
+
+    def test_index_follows_signals(self):
+        self.assertTrue(use_fts())
+        self.assertEqual(self.found('ива'), [('student', self.student.pk)])
+        self.assertEqual(self.found('ИВАНОВ пёт'), [('student', self.student.pk)])
+        self.assertEqual(self.found('8777123'), [('student', self.student.pk)])
+        self.assertEqual(self.found('4217'), [('student', self.student.pk)])
+        self.assertEqual(self.found('смир'), [('teacher', self.teacher.pk)])
+        self.assertEqual(self.found('смир', ['student']), [])
+        self.assertEqual(self.found('"*'), [])
+
+        self.student.last_name = 'Петров'
+        self.student.save()
+        self.assertEqual(self.found('ива'), [])
+        self.assertEqual(self.found('петр'), [('student', self.student.pk)])
+
+        self.teacher.is_teacher = False
+        self.teacher.save()
+        self.assertEqual(self.found('смир'), [])
+
+    def test_unchanged_people_are_not_reindexed(self):
+        user = User.objects.create(username='ivanov', first_name='Пётр', last_name='Иванов',
+                                   student_profile=self.student)
+        for save in (lambda: user.save(update_fields=['last_login']), lambda: user.save(),
+                     lambda: self.teacher.save(update_fields=['password']), lambda: self.student.save()):
+            with CaptureQueriesContext(connection) as queries:
+                save()
+            self.assertFalse([query for query in queries if 'main_person_fts' in query['sql']])
+
+        self.teacher.first_name = 'Мария'
+        self.teacher.save()
+        self.assertEqual(self.found('мари'), [('teacher', self.teacher.pk)])
+
+    def test_email(self):
+        self.teacher.email = 'anna.smirnova@college.kz'
+        self.teacher.save()
+        Student.objects.create(username='petrov', first_name='Иван', last_name='Петров', group=self.group,
+                               email='ivan.petrov@mail.kz')
+        self.assertEqual(self.found('anna.smirnova@college.kz'), [('teacher', self.teacher.pk)])
+        self.assertEqual(self.found('colleg'), [('teacher', self.teacher.pk)])
+        self.assertEqual(len(self.found('ivan.petrov', ['student'])), 1)
+
+        self.teacher.email = ''
+        self.teacher.save(update_fields=['email'])
+        self.assertEqual(self.found('colleg'), [])
+
+    def test_dismissed_student(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('dismiss-student', kwargs={'pk': self.student.pk}))
+        dismissed = DismissedStudent.objects.get(username='ivanov')
+        self.assertEqual(self.found('иван'), [('dismissed', dismissed.pk)])
+
+    def test_bulk_added_students_and_rebuild(self):
+        Student.objects.bulk_create([Student(username='sidorov', first_name='Иван', last_name='Сидоров')])
+        self.assertEqual(self.found('сидор'), [])
+        self.assertEqual(rebuild_search_index(), 3)
+        self.assertEqual(len(self.found('сидор')), 1)
+
+    def test_endpoint(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('search-people'), {'q': 'смирнова', 'kind': 'teacher'})
+        self.assertEqual(response.json()['results'], [{
+            'kind': 'teacher', 'id': self.teacher.pk, 'name': 'Смирнова Анна',
+            'url': reverse('edit-user', kwargs={'pk': self.teacher.pk})
+        }])
+
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(reverse('search-people'), {'q': 'смир'}).status_code, 302)
+
+
+class NotificationFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(username='student', first_name='S', last_name='S')
+        cls.user = User.objects.create(username='student', first_name='S', last_name='S', student_profile=cls.student)
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+
+    def setUp(self):
+        notification_cache().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications = [notify(content=f'Объявление {i}', for_students=True) for i in range(25)]
+            notify(content='Для преподавателей', for_teachers=True)
+        self.client.force_login(self.user)
+
+    def feed(self, etag=None, **params):
+        if etag is None:
+            return self.client.get(reverse('notifications-feed'), params)
+        return self.client.get(reverse('notifications-feed'), params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_incremental_feed(self):
+        data = self.feed().json()
+        self.assertEqual([row['id'] for row in data['notifications']],
+                         [notification.pk for notification in self.notifications[:4:-1]])
+        self.assertTrue(data['more'])
+        self.assertEqual(data['unread'], 25)
+
+        older = self.feed(before=data['notifications'][-1]['id']).json()
+        self.assertEqual([row['id'] for row in older['notifications']],
+                         [notification.pk for notification in self.notifications[4::-1]])
+        self.assertFalse(older['more'])
+
+        last_id = data['last_id']
+        self.assertEqual(self.feed(since=last_id).json()['notifications'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            new = notify(content='Новое', for_students=True)
+        data = self.feed(since=last_id).json()
+        self.assertEqual(([row['id'] for row in data['notifications']], data['last_id'], data['unread']),
+                         ([new.pk], new.pk, 26))
+
+    def test_etag(self):
+        response = self.feed(since=0)
+        etag = response['ETag']
+        # only the session and the user, the notifications aren't touched
+        with self.assertNumQueries(2):
+            self.assertEqual(self.feed(etag, since=0).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications[0].content = 'Изменено'
+            self.notifications[0].save()
+        response = self.feed(etag, since=0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notifications'][0]['content'], 'Изменено')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('notifications-read'), {'last_id': self.notifications[0].pk})
+        self.assertEqual(self.feed(response['ETag'], since=0).status_code, 200)
+
+    def test_etag_follows_broadcast_audience(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            latest = notify(content='Новое', for_students=True)
+            self.client.post(reverse('notifications-read'), {'last_id': latest.pk})
+        etag = self.feed()['ETag']
+
+        # the teachers' broadcast is older than the read mark, the unread count stays the same
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_teacher = True
+            self.user.save()
+        response = self.feed(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['content'] for row in response.json()['notifications'][:2]],
+                         ['Новое', 'Для преподавателей'])
+        self.assertEqual(response.json()['unread'], 0)
+
+    def test_read_state(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('student-notifs'))
+        self.assertEqual(len(response.context['notifs']), 20)
+        self.assertEqual(response.context['last_read'], 0)
+        self.assertEqual(NotificationReadState.objects.get(user=self.user).last_read, self.notifications[-1].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(content='Новое', for_students=True)
+        self.assertEqual(self.feed().json()['unread'], 1)
+        response = self.client.get(reverse('student-profile'))
+        self.assertContains(response, '<span class="notif-count">1</span>')
+
+        # the read mark never passes the newest visible notification
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notifications-read'), {'last_id': 10 ** 6})
+        self.assertEqual(response.json(), {'unread': 0})
+        self.assertEqual(NotificationReadState.objects.get(user=self.user).last_read,
+                         Notification.objects.filter(for_students=True).order_by('-pk')[0].pk)
+
+    def test_teacher_feed(self):
+        self.client.force_login(self.teacher)
+        data = self.feed().json()
+        self.assertEqual(([row['content'] for row in data['notifications']], data['unread']),
+                         (['Для преподавателей'], 1))
+
+
+class NotificationTargetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.big, cls.small = Group.objects.create(name='П-11'), Group.objects.create(name='П-21')
+        students = Student.objects.bulk_create(
+            [Student(username=f'st{i}', first_name='S', last_name='S', group=cls.big) for i in range(1200)] +
+            [Student(username=f'small{i}', first_name='S', last_name='S', group=cls.small) for i in range(3)])
+        User.objects.bulk_create([User(username=student.username, student_profile=student) for student in students])
+        cls.module = Module.objects.create(module_name='Математика', exam_type='e')
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+        cls.other_teacher = User.objects.create(username='other', first_name='O', last_name='O', is_teacher=True)
+        Schedule.objects.create(group=cls.small, module=cls.module, date=0).teachers.add(cls.teacher)
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True)
+
+    def inbox(self, notification):
+        return set(NotificationInbox.objects.filter(notification=notification).values_list('user_id', flat=True))
+
+    def users(self, **filters):
+        return set(User.objects.filter(**filters).values_list('pk', flat=True))
+
+    def test_targets(self):
+        self.assertEqual(self.inbox(notify(content='Группа', groups=[self.small])),
+                         self.users(student_profile__group=self.small))
+        self.assertEqual(self.inbox(notify(content='Предмет', modules=[self.module])),
+                         self.users(student_profile__group=self.small) | {self.teacher.pk})
+        self.assertEqual(self.inbox(notify(content='Лично', users=[self.other_teacher])), {self.other_teacher.pk})
+        self.assertEqual(self.inbox(notify(content='Всем преподавателям', for_teachers=True)),
+                         {self.teacher.pk, self.other_teacher.pk})
+
+    def test_broadcasts_reach_later_accounts(self):
+        for_students = notify(content='Студентам', for_students=True)
+        for_teachers = notify(content='Преподавателям', for_teachers=True)
+        notify(content='Группа', groups=[self.small])
+
+        added = add_students([Student(username='late', first_name='L', last_name='L', group=self.big)])[0]
+        self.assertEqual(set(user_notifications(added.user).values_list('pk', flat=True)), {for_students.pk})
+
+        user = User.objects.create(username='newteacher', first_name='N', last_name='N')
+        self.assertFalse(user_notifications(user).exists())
+        user.is_teacher = True
+        user.save()
+        self.assertEqual(set(user_notifications(user).values_list('pk', flat=True)), {for_teachers.pk})
+        user.save()
+        self.assertEqual(NotificationInbox.objects.filter(user=user).count(), 1)
+
+    def test_bulk_fan_out(self):
+        notification = Notification.objects.create(content='Группа')
+        notification.groups.set([self.big])
+        with CaptureQueriesContext(connection) as queries:
+            deliver_notification(notification)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(self.inbox(notification)), 1200)
+        self.assertEqual(len(inserts), 3)
+        self.assertLess(len(queries), 15)
+
+        user = User.objects.get(username='st7')
+        plan = user_notifications(user).filter(position__gt=0).order_by('-position')[:20].explain()
+        self.assertIn('main_notificationinbox USING COVERING INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_edit_retargets(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('add-notif'), {'content': 'Собрание', 'groups': [self.small.pk]})
+        notification = Notification.objects.get()
+        self.assertEqual(self.inbox(notification), self.users(student_profile__group=self.small))
+
+        self.client.post(reverse('edit-notif', kwargs={'pk': notification.pk}),
+                         {'content': 'Собрание', 'users': [self.teacher.pk]})
+        self.assertEqual(self.inbox(notification), {self.teacher.pk})
+
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('teacher-notifs'))
+        self.assertEqual([row.pk for row in response.context['notifs']], [notification.pk])
+
+        NotificationInbox.objects.all().delete()
+        call_command('deliver_notifications', stdout=io.StringIO())
+        self.assertEqual(self.inbox(notification), {self.teacher.pk})
+
+
+# What settings_production enables on top of its shared cache
+cached_sessions = override_settings(
+    AUTHENTICATION_BACKENDS=['main.backends.CachedModelBackend'],
+    MIDDLEWARE=[middleware.replace('main.middleware.RoleContextMiddleware',
+                                   'main.middleware.SessionRoleContextMiddleware') for middleware in MIDDLEWARE],
+)
+
+
+@cached_sessions
+class RoleContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='П-11')
+        cls.student = Student.objects.create(username='student', first_name='Пётр', last_name='Иванов',
+                                             group=cls.group)
+        cls.user = User.objects.create(username='student', first_name='S', last_name='S', student_profile=cls.student)
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+
+    def get(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        return response, [query['sql'] for query in queries]
+
+    def test_resolved_once(self):
+        self.client.force_login(self.user)
+        response, queries = self.get('student-modules')
+        self.assertEqual(len([sql for sql in queries if 'FROM "main_student"' in sql]), 1)
+        self.assertEqual(response.context['group'], 'П-11')
+        self.assertContains(response, 'Иванов Пётр')
+
+        response, queries = self.get('student-modules')
+        self.assertFalse([sql for sql in queries if 'main_student' in sql or 'main_group' in sql])
+        self.assertEqual(self.get('main_page')[0].url, reverse('student-modules'))
+        self.assertEqual(self.get('teacher-groups')[0].status_code, 403)
+
+    def test_invalidation(self):
+        self.client.force_login(self.user)
+        self.get('student-modules')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.name = 'П-12'
+            self.group.save()
+        self.assertEqual(self.get('student-modules')[0].context['group'], 'П-12')
+
+        other = Group.objects.create(name='П-21')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.group = other
+            self.student.save()
+        self.assertEqual(self.get('student-modules')[0].context['group'], 'П-21')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertEqual(self.get('main_page')[0].url, reverse('logout'))
+
+    def test_resolved_per_request_without_shared_cache(self):
+        with override_settings(MIDDLEWARE=MIDDLEWARE):
+            self.client.force_login(self.user)
+            for _ in range(2):
+                response, queries = self.get('student-modules')
+                self.assertEqual(len([sql for sql in queries if 'FROM "main_student"' in sql]), 1)
+        # the tests' LocMemCache would not do for several processes
+        self.assertEqual([error.id for error in check_shared_caches(None)], ['main.E001', 'main.E001'])
+        with override_settings(MIDDLEWARE=MIDDLEWARE, AUTHENTICATION_BACKENDS=[]):
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_role_change(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.get('teacher-groups')[0].status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.is_teacher = False
+            self.teacher.is_junioradmin = True
+            self.teacher.save()
+        self.assertEqual(self.get('teacher-groups')[0].status_code, 403)
+        self.assertEqual(self.get('dashboard')[0].status_code, 200)
+
+
+@cached_sessions
+class SessionUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username='teacher', first_name='T', last_name='T', is_teacher=True)
+
+    def setUp(self):
+        user_cache().clear()
+
+    def user_queries(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        return response, len([query for query in queries if 'FROM "main_user"' in query['sql']])
+
+    def test_cached_user(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.user_queries('teacher-week')[1], 1)
+        self.assertEqual(self.user_queries('teacher-week')[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.is_teacher = False
+            self.teacher.save()
+        response, queries = self.user_queries('teacher-week')
+        self.assertEqual((response.status_code, queries), (302, 1))
+
+    def test_password_change_logs_out(self):
+        self.client.force_login(self.teacher)
+        self.user_queries('teacher-week')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.set_password('new password')
+            self.teacher.save()
+        self.assertEqual(self.user_queries('teacher-week')[0].url, f'{reverse("login_page")}?next=/teacher/week')
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        self.client.force_login(self.teacher)
+        self.client.get(reverse('main_page'))
+        # the session is in the cookie and the user in the cache
+        with self.assertNumQueries(0):
+            self.client.get(reverse('main_page'))
+        self.assertEqual(self.client.get(reverse('teacher-week')).status_code, 200)
+
+
+class AccountProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group, cls.other = Group.objects.create(name='П-11'), Group.objects.create(name='П-21')
+        cls.admin = User.objects.create(username='admin', first_name='A', last_name='A', is_junioradmin=True,
+                                        is_superuser=True, is_staff=True)
+
+    def test_hashed_once(self):
+        default_password_hash.cache_clear()
+        with mock.patch('main.accounts.make_password', wraps=make_password) as hasher:
+            add_students([Student(username=f'st{i}', first_name='S', last_name='S', group=self.group)
+                          for i in range(300)])
+            form = UserForm(data={'username': 'teacher', 'first_name': 'T', 'last_name': 'T', 'is_teacher': True})
+            form.save()
+        self.assertEqual(hasher.call_count, 1)
+
+        users = User.objects.exclude(pk=self.admin.pk)
+        self.assertEqual(set(users.values_list('password', 'must_change_password')),
+                         {(default_password_hash(), True)})
+        self.assertTrue(users.get(username='st7').check_password(DEFAULT_ACCOUNT_PASSWORD))
+
+    def test_forced_password_change(self):
+        user = add_students([Student(username='student', first_name='S', last_name='S', group=self.group)])[0].user
+        self.client.force_login(user)
+        self.assertRedirects(self.client.get(reverse('student-modules')), reverse('change-password'))
+
+        response = self.client.post(reverse('change-password'), {
+            'old_password': DEFAULT_ACCOUNT_PASSWORD, 'new_password': DEFAULT_ACCOUNT_PASSWORD,
+            'repeat_new_password': DEFAULT_ACCOUNT_PASSWORD})
+        self.assertTrue(response.context['forced'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('change-password'), {
+                'old_password': DEFAULT_ACCOUNT_PASSWORD, 'new_password': 'new password',
+                'repeat_new_password': 'new password'})
+        self.assertEqual(self.client.get(reverse('student-modules')).status_code, 200)
+
+    def test_reset_group_passwords(self):
+        students = add_students([Student(username=f'st{i}', first_name='S', last_name='S',
+                                         group=self.group if i % 2 else self.other) for i in range(40)])
+        User.objects.exclude(pk=self.admin.pk).update(password=make_password('changed'), must_change_password=False)
+        student = User.objects.get(username='st1')
+        self.client.force_login(student)
+        self.assertEqual(self.client.get(reverse('student-modules')).status_code, 200)
+
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            admin_client.post(reverse('reset-group-passwords', kwargs={'group_id': self.group.pk}))
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "main_user"')]), 1)
+
+        reset = User.objects.filter(must_change_password=True)
+        self.assertEqual(set(reset.values_list('student_profile__group', flat=True)), {self.group.pk})
+        self.assertEqual(reset.count(), 20)
+        # the old sessions end with the old password
+        self.assertEqual(self.client.get(reverse('student-modules')).status_code, 302)
+        self.assertEqual(len(students), 40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            admin_client.post(reverse('admin:main_group_changelist'),
+                              {'action': 'reset_passwords', '_selected_action': [self.other.pk]})
+        self.assertEqual(User.objects.filter(must_change_password=True).count(), 40)
+
+
+class SqliteTuningTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        self.assertEqual(connection.vendor, 'sqlite')
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_atomic_takes_write_lock(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Group.objects.exists()
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class LoadTestTests(TestCase):
+    def setUp(self):
+        # roles and users cached by earlier tests may have the same ids
+        caches['default'].clear()
+
+    def test_journeys_run_without_errors(self):
+        college = seed_college(groups=2, students_per_group=3, modules_per_group=2, topics_per_module=4)
+        self.assertEqual(Mark.objects.count(), 2 * 3 * 2 * 4)
+
+        results, wall_time = run_journeys(college, list(JOURNEYS), iterations=1)
+        self.assertIn('teacher-journal save', results)
+        self.assertIn('student-marks', results)
+        for route, result in results.items():
+            summary = route_summary(result, wall_time)
+            self.assertEqual(summary['errors'], 0, route)
+            self.assertGreater(summary['queries'], 0, route)
@@ -0,0 +1,97 @@
+import datetime
+
+from django.core.cache import caches
+from django.db import transaction
+
+from main.models import *
+from project_college.settings import SCHEDULE_CACHE, SCHEDULE_CACHE_TIMEOUT
+
+
+def schedule_cache():
+    return caches[SCHEDULE_CACHE]
+
+
+def group_schedule_key(group_id):
+    return f'schedule:group:{group_id}'
+
+
+def group_conflicts_key(group_id):
+    return f'schedule:group:{group_id}:conflicts'
+
+
+def teacher_schedule_key(teacher_id):
+    return f'schedule:teacher:{teacher_id}'
+
+
+def empty_week():
+    return {day: [] for day in range(len(DAY_NAMES))}
+
+
+def schedule_queryset():
+    return Schedule.objects.select_related('group', 'module').prefetch_related('teachers').order_by(
+        'date', 'time_start', 'time_end', 'pk')
+
+
+def bucket_by_day(entries):
+    week = empty_week()
+    for sch in entries:
+        week[sch.date].append(sch)
+    return week
+
+
+def schedule_days(week):
+    # [(day name, [Schedule])], what the schedule templates iterate over
+    return [(DAY_NAMES[day], entries) for day, entries in week.items()]
+
+
+def get_group_schedule(group_id):
+    # day -> [Schedule], shared by the admin and student pages of the group
+    key = group_schedule_key(group_id)
+    week = schedule_cache().get(key)
+    if week is None:
+        week = bucket_by_day(schedule_queryset().filter(group_id=group_id))
+        schedule_cache().set(key, week, SCHEDULE_CACHE_TIMEOUT)
+    return week
+
+
+def get_teacher_schedule(teacher_id):
+    # group_id -> day -> [Schedule], all groups of the teacher in one entry
+    key = teacher_schedule_key(teacher_id)
+    groups = schedule_cache().get(key)
+    if groups is None:
+        groups = {}
+        for sch in schedule_queryset().filter(teachers=teacher_id):
+            groups.setdefault(sch.group_id, empty_week())[sch.date].append(sch)
+        schedule_cache().set(key, groups, SCHEDULE_CACHE_TIMEOUT)
+    return groups
+
+
+def teacher_week_schedule(teacher_id):
+    # day -> [Schedule] of all the teacher's groups, built from the cached teacher entry
+    week = empty_week()
+    for group_week in get_teacher_schedule(teacher_id).values():
+        for day, entries in group_week.items():
+            week[day].extend(entries)
+    for entries in week.values():
+        entries.sort(key=lambda sch: (sch.time_start or datetime.time.max, sch.time_end or datetime.time.max,
+                                      str(sch.group)))
+    return week
+
+
+def invalidate_schedules(group_ids=(), teacher_ids=()):
+    group_ids, teacher_ids = set(group_ids), set(teacher_ids)
+    # a group's conflicts include its teachers' lessons in other groups, see main.conflicts.get_group_conflicts
+    conflict_group_ids = group_ids | set(Schedule.objects.filter(teachers__in=teacher_ids).values_list(
+        'group_id', flat=True)) if teacher_ids else group_ids
+    keys = [*map(group_schedule_key, group_ids), *map(group_conflicts_key, conflict_group_ids),
+            *map(teacher_schedule_key, teacher_ids)]
+    if keys:
+        # after commit, so a page rendered meanwhile can't cache the old rows again
+        transaction.on_commit(lambda: schedule_cache().delete_many(keys))
+
+
+def invalidate_schedule_rows(schedules):
+    # schedules: Schedule queryset whose groups and teachers are affected
+    rows = list(schedules.values_list('group_id', 'teachers'))
+    invalidate_schedules([group_id for group_id, teacher_id in rows],
+                         [teacher_id for group_id, teacher_id in rows if teacher_id is not None])
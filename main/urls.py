@@ -7,11 +7,16 @@ urlpatterns = [
     path('logout', user_logout, name='logout'),
     path('change-password', change_password, name='change-password'),
     path('reset-password', reset_password, name='reset-password'),
+    path('reset-password/group/<int:group_id>', reset_group_passwords, name='reset-group-passwords'),
     path('user-profile', UserProfileView.as_view(), name='user-profile'),
     path('edit/user-profile', EditUserProfile.as_view(), name='edit-user-profile'),
     path('recovery-student/<int:pk>', recovery_student, name='recovery-student'),
     # Teacher journal
     path('teacher/schedule/<int:sch_pk>/journal', teacher_journal, name='teacher-journal'),
+    path('teacher/schedule/<int:sch_pk>/journal/cells', teacher_journal_cells, name='teacher-journal-cells'),
+    path('export/journal/group/<int:group_pk>/module/<int:module_pk>', export_journal, name='export-journal'),
+    path('export/journal/group/<int:group_pk>', export_group_journals, name='export-group-journals'),
+    path('reports', reports, name='reports'),
     # Schedule
     path('schedule/groups', GroupsScheduleView.as_view(), name='groups-schedule'),
     path('schedule/group/<int:pk>/days', days_schedule, name='days-schedule'),
@@ -24,9 +29,10 @@ urlpatterns = [
     path('notifications-admin', NotificationsAdminView.as_view(), name='notifs-admin'),
     path('teachers', TeachersView.as_view(), name='teachers-list'),
     path('students-groups', StudentsViewGroups.as_view(), name='students-groups'),
-    path('students/group/<int:group_id>', students_view, name='students-list'),
+    path('students/group/<int:group_id>', StudentsView.as_view(), name='students-list'),
     path('students', StudentsWithoutGroup.as_view(), name='no-group-students-list'),
     path('dashboard', dashboard, name='dashboard'),
+    path('search/people', search_people_json, name='search-people'),
     path('groups', GroupsView.as_view(), name='groups-list'),
     path('modules', ModulesView.as_view(), name='modules-list'),
     path('topics-modules', TopicsViewModules.as_view(), name='topics-modules'),
@@ -35,11 +41,14 @@ urlpatterns = [
     path('specializations', SpecializationsView.as_view(), name='specs-list'),
     # Teacher
     path('teacher/groups', TeacherGroupsView.as_view(), name='teacher-groups'),
+    path('teacher/week', teacher_week, name='teacher-week'),
     path('teacher/notifications', TeacherNotificationsView.as_view(), name='teacher-notifs'),
     path('teacher/group/<int:group_pk>/modules', teacher_modules, name='teacher-modules'),
     # Student
     path('student/modules', StudentModulesView.as_view(), name='student-modules'),
     path('student/notifications', StudentNotificationsView.as_view(), name='student-notifs'),
+    path('notifications/feed', notifications_feed, name='notifications-feed'),
+    path('notifications/read', notifications_read, name='notifications-read'),
     path('student/schedule/<int:sch_pk>/marks', StudentMarksView.as_view(), name='student-marks'),
     path('student/profile', StudentProfileView.as_view(), name='student-profile'),
     # Add
@@ -58,6 +67,8 @@ urlpatterns = [
     path('add/topic/module/<int:module_id>', add_topic, name='add-topic'),
     path('add/topic/file', add_topic_from_file, name='add-topic-file'),
     path('download/topics-pattern', download_pattern_topic, name='topic-pattern-page'),
+    path('import/<int:pk>', import_job, name='import-job'),
+    path('import/<int:pk>/status', import_job_status, name='import-job-status'),
 
     path('add/qualification', AddQualification.as_view(), name='add-qual'),
 
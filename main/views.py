@@ -3,17 +3,20 @@ import json
 import openpyxl
 import os
 
-from django.http import FileResponse
+from django.db.models import Count, Prefetch
+from django.http import FileResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse, reverse_lazy
-from project_college.settings import MARKS_SYSTEM, MARK_VALUES, MARKS_RATING, MEDIA_ROOT
+from project_college.settings import MARKS_SYSTEM, MARK_VALUES, MARKS_RATING, MEDIA_ROOT, NOTIFICATION_FEED_LIMIT
 from django.utils.translation import gettext_lazy as _
 
-from django.contrib.auth import login, logout
+from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.decorators import user_passes_test
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 
 from .forms import *
 from .models import *
@@ -21,6 +24,15 @@ from .mixins import *
 from .validators import *
 
 from .functions import *
+from .journal import *
+from .imports import *
+from .exports import *
+from .reports import *
+from .timetable import *
+from .conflicts import *
+from .search import search_people
+from .notifications import *
+from .accounts import reset_passwords
 
 
 def page_not_found(request, exception):
@@ -29,11 +41,11 @@ def page_not_found(request, exception):
 
 @login_required(login_url=reverse_lazy('login_page'))
 def main_page(request):
-    if request.user.is_superuser or request.user.is_junioradmin:
+    if request.role.is_admin:
         return redirect('dashboard')
-    elif request.user.is_teacher:
+    elif request.role.is_teacher:
         return redirect('teacher-groups')
-    elif request.user.student_profile:
+    elif request.role.is_student:
         return redirect('student-modules')
     return redirect('logout')
 
@@ -67,6 +79,38 @@ def dashboard(request):
                                                    'teachers_count': User.objects.filter(is_teacher=True).count()})
 
 
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def search_people_json(request):
+    kinds = request.GET.getlist('kind') or None
+    return JsonResponse({'results': search_people(request.GET.get('q', ''), kinds)})
+
+
+def int_param(params, name):
+    value = params.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notification_feed_etag)
+def notifications_feed(request):
+    return JsonResponse(notification_feed(request.user, int_param(request.GET, 'since'),
+                                          int_param(request.GET, 'before')))
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@require_POST
+def notifications_read(request):
+    last_id = int_param(request.POST, 'last_id')
+    if last_id:
+        last_id = user_notifications(request.user).filter(position__lte=last_id).order_by(
+            '-position').values_list('position', flat=True).first()
+    if last_id:
+        mark_notifications_read(request.user, last_id)
+    return JsonResponse({'unread': notification_state(request.user)[1]})
+
+
 @login_required(login_url=reverse_lazy('login_page'))
 @user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
 def reset_password(request):
@@ -79,15 +123,28 @@ def reset_password(request):
     return render(request, 'main/reset-password.html', {'form': form})
 
 
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def reset_group_passwords(request, group_id):
+    group = Group.objects.get(pk=group_id)
+    if request.method == 'POST':
+        reset_passwords(User.objects.filter(student_profile__group=group))
+        return redirect('students-list', group_id=group.pk)
+    return render(request, 'main/reset-group-passwords.html', {'group': group})
+
+
 @login_required(login_url=reverse_lazy('login_page'))
 def change_password(request):
     if request.method == 'POST':
         form = ChangePassword(user=request.user, data=request.POST)
         if form.is_valid():
+            # keeps this session logged in, the others end with the old password
+            update_session_auth_hash(request, form.current_user)
             return redirect('main_page')
     else:
         form = ChangePassword()
-    return render(request, 'main/change_password.html', {'form': form})
+    return render(request, 'main/change_password.html', {'form': form,
+                                                         'forced': request.user.must_change_password})
 
 
 class UserProfileView(ViewsMixin, LoginRequiredMixin, StuffRequiredMixin, DetailView):
@@ -121,28 +178,10 @@ class GroupsScheduleView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, Lis
 @user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
 def days_schedule(request, pk):
     group = Group.objects.get(pk=pk)
-    schedule = {
-        '0': [],
-        '1': [],
-        '2': [],
-        '3': [],
-        '4': [],
-        '5': [],
-    }
-    for i in Schedule.objects.filter(group__name=group.name).select_related('group', 'module').prefetch_related(
-            'teachers'
-    ):
-        schedule[str(i.date)].append(i)
+    schedule = get_group_schedule(group.pk)
     return render(request, 'main/schedule/days-schedule.html',
-                  {'days': DAY_NAMES,
-                   'group': group,
-                   'mon': schedule['0'],
-                   'tue': schedule['1'],
-                   'wed': schedule['2'],
-                   'thu': schedule['3'],
-                   'fri': schedule['4'],
-                   'sat': schedule['5'],
-                   })
+                  {'group': group, 'week': schedule_days(schedule),
+                   'conflicts': [conflict_message(conflict) for conflict in get_group_conflicts(group.pk)]})
 
 
 @login_required(login_url=reverse_lazy('login_page'))
@@ -167,7 +206,7 @@ def edit_schedule(request, group_pk, sch_pk):
 @login_required(login_url=reverse_lazy('login_page'))
 @user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
 def delete_schedule(request, group_pk, sch_pk):
-    sch = Schedule.objects.get(pk=sch_pk)
+    sch = schedule_queryset().get(pk=sch_pk)
 
     if request.method == 'POST':
         sch.delete()
@@ -200,43 +239,53 @@ class TeacherGroupsView(ViewsMixin, LoginRequiredMixin, TeacherRequiredMixin, Li
     context_object_name = 'groups'
 
     def get_queryset(self):
-        return set(map(lambda x: (x.group.pk, x.group.name),
-                       Schedule.objects.filter(teachers__pk=self.request.user.pk).select_related('group')))
+        lessons = Schedule.objects.filter(teachers=self.request.user).select_related('module').order_by(
+            'module__module_name', 'module_id')
+        return Group.objects.filter(schedule__teachers=self.request.user).annotate(
+            lessons_count=Count('schedule')
+        ).order_by('name').prefetch_related(Prefetch('schedule_set', queryset=lessons, to_attr='teacher_lessons'))
 
 
-class TeacherNotificationsView(ViewsMixin, LoginRequiredMixin, TeacherRequiredMixin, ListView):
+class NotificationsFeedView(KeysetPaginationMixin, ListView):
     model = Notification
-    template_name = 'main/teacher/notifications.html'
     context_object_name = 'notifs'
+    keyset_ordering = ('-position',)
+    page_size = NOTIFICATION_FEED_LIMIT
 
     def get_queryset(self):
-        return Notification.objects.filter(for_teachers=True)
+        return user_notifications(self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        last_read, unread = notification_state(self.request.user)
+        context['last_read'] = last_read
+        rows = context['object_list']
+        # Opening the newest page marks everything up to its first notification as read
+        if rows and not context['keyset']['previous']:
+            context['since'] = rows[0].pk
+            if rows[0].pk > last_read:
+                mark_notifications_read(self.request.user, rows[0].pk)
+        return context
+
+
+class TeacherNotificationsView(ViewsMixin, LoginRequiredMixin, TeacherRequiredMixin, NotificationsFeedView):
+    template_name = 'main/teacher/notifications.html'
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_teacher, login_url=reverse_lazy('main_page'))
+def teacher_week(request):
+    return render(request, 'main/teacher/teacher-week.html',
+                  {'week': schedule_days(teacher_week_schedule(request.user.pk))})
 
 
 @login_required(login_url=reverse_lazy('login_page'))
 @user_passes_test(only_teacher, login_url=reverse_lazy('main_page'))
 def teacher_modules(request, group_pk):
     group = Group.objects.get(pk=group_pk)
-    schedule = {
-        '0': [],
-        '1': [],
-        '2': [],
-        '3': [],
-        '4': [],
-        '5': [],
-    }
-    for i in Schedule.objects.filter(group__name=group.name, teachers__pk=request.user.pk).select_related('module'):
-        schedule[str(i.date)].append(i)
+    schedule = get_teacher_schedule(request.user.pk).get(group.pk, empty_week())
     return render(request, 'main/teacher/teacher-modules.html',
-                  {'days': DAY_NAMES,
-                   'group': group,
-                   'mon': schedule['0'],
-                   'tue': schedule['1'],
-                   'wed': schedule['2'],
-                   'thu': schedule['3'],
-                   'fri': schedule['4'],
-                   'sat': schedule['5'],
-                   })
+                  {'group': group, 'week': schedule_days(schedule)})
 
 
 @login_required(login_url=reverse_lazy('login_page'))
@@ -314,133 +363,92 @@ def recovery_student(request, pk):
 @login_required(login_url=reverse_lazy('login_page'))
 @user_passes_test(only_teacher, login_url=reverse_lazy('main_page'))
 def teacher_journal(request, sch_pk):
-    sch = Schedule.objects.select_related('module').prefetch_related('module__topic_set').get(pk=sch_pk)
+    sch = Schedule.objects.select_related('module', 'group').prefetch_related('module__topic_set').get(pk=sch_pk)
     msg = None
 
     if not check_teacher_pk(request, sch):
         return redirect('main_page')
 
-    # mark_id or topic_id, student_id; date, compl_topic_id or date, empty, topic_id;
     if request.method == 'POST':
-        for key, value in request.POST.items():
-            ids = key.split('_')
-            value = value.strip()
-
-            if ids[0] == 'date':
-                if ids[1] == 'empty':
-                    if value:
-                        try:
-                            date_time = datetime.datetime.strptime(value, '%d.%m.%y')
-                            now = datetime.datetime.now()
-                            date_time = date_time.replace(hour=now.hour,
-                                                          minute=now.minute,
-                                                          second=now.second)
-                            compl_topic = CompletedTopic(
-                                date_time=date_time,
-                                topic_id=ids[2],
-                                module_id=sch.module_id
-                            )
-                            compl_topic.teacher = request.user
-                            compl_topic.save()
-                        except ValueError:
-                            msg = _('Неправильный формат даты, нужный формат: дд.мм.гг')
-                else:
-                    if value:
-                        try:
-                            date_time = datetime.datetime.strptime(value, '%d.%m.%y')
-                            now = datetime.datetime.now()
-                            date_time = date_time.replace(hour=now.hour,
-                                                          minute=now.minute,
-                                                          second=now.second)
-
-                            compl_topic = CompletedTopic.objects.get(pk=ids[1])
-                            compl_topic.date_time = date_time
-                            compl_topic.teacher = request.user
-                            compl_topic.save()
-                        except ValueError:
-                            pass
-                    else:
-                        CompletedTopic.objects.get(pk=ids[1]).delete()
-            else:
-                if len(ids) == 1:
-                    if str(value) in MARK_VALUES:
-                        new_mark = Mark.objects.get(pk=ids[0])
-                        if value.isdigit():
-                            if new_mark.mark != int(value):
-                                new_mark.mark = int(value)
-                                new_mark.teacher = request.user
-                                new_mark.save()
-                        elif new_mark.mark is not None:
-                            new_mark.mark = None
-                            new_mark.teacher = request.user
-                            new_mark.save()
-                    elif value == '':
-                        Mark.objects.get(pk=ids[0]).delete()
-                elif len(ids) == 2:
-                    if str(value) in MARK_VALUES:
-                        new_mark = Mark(
-                            student_id=ids[1],
-                            teacher_id=request.user.pk,
-                            topic_id=ids[0],
-                            module_id=sch.module_id,
-                        )
-                        if value.isdigit():
-                            if new_mark.mark != int(value):
-                                new_mark.mark = int(value)
-                        elif new_mark.mark is not None:
-                            new_mark.mark = None
-                        new_mark.save()
-
-    journal = {
-        'students': sch.group.student_set.all(),
-        'topics': [i for i in sch.module.topic_set.all()],
-        'marks': []
-    }
-    total_hours = 0
-    mid_marks = {}
-
-    marks_query = Mark.objects.select_related('teacher', 'student', 'topic', 'module').filter(module_id=sch.module_id).all()
-    compl_topic_query = CompletedTopic.objects.select_related('topic', 'teacher', 'module').filter(module_id=sch.module_id)
-
-    for topic in journal['topics']:
-        topic_marks = []
-        compl_topic = list(filter(lambda x: x.topic_id == topic.pk and x.module_id == sch.module_id, compl_topic_query))
-        if compl_topic:
-            topic_marks.append((topic, compl_topic[0], 'date'))
-        else:
-            topic_marks.append((topic, ' ', 'date'))
-        total_hours += topic.hours
-        for student in journal['students']:
-            if student.pk not in mid_marks.keys():
-                mid_marks[student.pk] = []
-            mark = list(filter(lambda x: x.module == sch.module and x.student == student and x.topic == topic, marks_query))
-            if not mark:
-                topic_marks.append((' ', student.pk))
-            else:
-                if mark[0].mark:
-                    mid_marks[student.pk].append(mark[0].mark)
-                topic_marks.append((mark[0].pk, mark[0].mark))
-        journal['marks'].append(topic_marks)
-
-    mid_marks = list(mid_marks.values())
-    for n, i in enumerate(mid_marks):
-        marks_sum = sum(mid_marks[n])
-        if marks_sum:
-            mid_marks[n] = round(marks_sum / len(mid_marks[n]), 1)
-        else:
-            mid_marks[n] = 0
+        msg = save_journal(sch, request.user, request.POST)
+
+    journal = build_journal(sch)
 
     return render(request, 'main/teacher/journal.html', {
         'sch': sch,
-        'total_hours': total_hours,
+        'version': get_journal_version(sch),
+        'total_hours': journal['total_hours'],
         'journal': journal,
-        'mid_marks': mid_marks,
+        'mid_marks': journal['mid_marks'],
         'mark_values': {'data': MARK_VALUES},
         'marks_rating': MARKS_RATING,
         'msg': msg,
     })
 
 
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_teacher, login_url=reverse_lazy('main_page'))
+@require_POST
+def teacher_journal_cells(request, sch_pk):
+    sch = Schedule.objects.get(pk=sch_pk)
+
+    if not check_teacher_pk(request, sch):
+        return JsonResponse({'msg': str(_('Нет доступа к журналу'))}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        cells = {str(key): str(value) for key, value in data['cells'].items()}
+        version = int(data['version'])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'msg': str(_('Неверный формат данных'))}, status=400)
+
+    renamed, msg = save_journal_cells(sch, request.user, cells, version)
+    if renamed is None:
+        return JsonResponse({'msg': str(_('Журнал был изменен другим пользователем, обновите страницу')),
+                             'version': get_journal_version(sch)}, status=409)
+
+    mid_marks, absences = journal_totals(sch)
+    return JsonResponse({'version': version + 1, 'renamed': renamed, 'msg': str(msg) if msg else None,
+                         'mid_marks': mid_marks, 'absences': absences})
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+def export_journal(request, group_pk, module_pk):
+    group = Group.objects.get(pk=group_pk)
+    module = Module.objects.get(pk=module_pk)
+
+    if not only_admin(request.user) and not Schedule.objects.filter(
+            group_id=group_pk, module_id=module_pk, teachers__pk=request.user.pk).exists():
+        return redirect('main_page')
+
+    return FileResponse(journal_workbook(group, [module]), as_attachment=True,
+                        filename=f'{sheet_title(group.name)} - {sheet_title(str(module))}.xlsx')
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def export_group_journals(request, group_pk):
+    group = Group.objects.get(pk=group_pk)
+    modules = Module.objects.filter(schedule__group_id=group_pk).distinct()
+
+    return FileResponse(journal_workbook(group, modules), as_attachment=True,
+                        filename=f'{sheet_title(group.name)}.xlsx')
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def reports(request):
+    if 'semester' in request.GET:
+        form = ReportForm(data=request.GET)
+        if form.is_valid():
+            semester = form.cleaned_data['semester'] or None
+            filename = f'reports-{semester}.zip' if semester else 'reports.zip'
+            return FileResponse(build_reports(semester), as_attachment=True, filename=filename)
+    else:
+        form = ReportForm()
+    return render(request, 'main/reports.html', {'form': form})
+
+
 # Student
 class StudentModulesView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, ListView):
     model = Schedule
@@ -450,40 +458,18 @@ class StudentModulesView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, L
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context['group'] = self.request.user.student_profile.group
-
-        schedule = {
-            '0': [],
-            '1': [],
-            '2': [],
-            '3': [],
-            '4': [],
-            '5': [],
-        }
-        for i in Schedule.objects.filter(group=context['group']).select_related('module'):
-            schedule[str(i.date)].append(i)
-
-        context['days'] = DAY_NAMES
-        context['mon'] = schedule['0']
-        context['tue'] = schedule['1']
-        context['wed'] = schedule['2']
-        context['thu'] = schedule['3']
-        context['fri'] = schedule['4']
-        context['sat'] = schedule['5']
+        context['group'] = self.request.role.group_name
+
+        context['week'] = schedule_days(get_group_schedule(self.request.role.group_id))
 
         return context
 
     def get_queryset(self):
-        return Schedule.objects.filter(group=self.request.user.student_profile.group)
+        return Schedule.objects.filter(group_id=self.request.role.group_id)
 
 
-class StudentNotificationsView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, ListView):
-    model = Notification
+class StudentNotificationsView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, NotificationsFeedView):
     template_name = 'main/student/notifications.html'
-    context_object_name = 'notifs'
-
-    def get_queryset(self):
-        return Notification.objects.filter(for_students=True)
 
 
 class StudentMarksView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, DetailView):
@@ -499,19 +485,29 @@ class StudentMarksView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, Det
         return context
 
     def get_object(self, queryset=None):
-        schedule = Schedule.objects.get(pk=self.kwargs['sch_pk'])
-        data = {'tables': [], 'module_name': schedule.module.__str__(), 'teachers': schedule.teachers.all()}
+        schedule = Schedule.objects.select_related('module').get(pk=self.kwargs['sch_pk'])
+        data = {'tables': [], 'module_name': schedule.module.__str__(), 'teachers': list(schedule.teachers.all())}
         table = {'marks': []}
 
+        marks = {mark.topic_id: mark.mark for mark in Mark.objects.filter(
+            module_id=schedule.module_id, student_id=self.request.role.student_id).only('topic', 'mark')}
+        compl_topics = {}
+        for compl_topic in CompletedTopic.objects.filter(module_id=schedule.module_id).order_by('pk').only(
+                'topic', 'date_time'):
+            compl_topics.setdefault(compl_topic.topic_id, compl_topic.date_time)
+
+        marks_count, marks_sum = 0, 0
         for topic in schedule.module.topic_set.all():
-            try:
-                table['marks'].append({'title': topic.__str__(),
-                                       'mark': topic.mark_set.get(
-                                           student__pk=self.request.user.student_profile.pk).mark})
-            except ObjectDoesNotExist:
-                table['marks'].append({'title': topic.__str__(),
-                                       'mark': ' '})
+            mark = marks.get(topic.pk, ' ')
+            if mark != ' ' and mark:
+                marks_count += 1
+                marks_sum += mark
+            table['marks'].append({'title': topic.__str__(),
+                                   'mark': mark,
+                                   'date': compl_topics.get(topic.pk),
+                                   'average': round(marks_sum / marks_count, 1) if marks_count else 0})
         data['tables'].append(table)
+        data['average'] = round(marks_sum / marks_count, 1) if marks_count else 0
 
         return data
 
@@ -526,31 +522,39 @@ class StudentProfileView(ViewsMixin, LoginRequiredMixin, StudentRequiredMixin, D
 
 
 # List Views
-class DismissedStudentsView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
+class DismissedStudentsView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = DismissedStudent
     template_name = 'main/list-views/dismissed-students.html'
     context_object_name = 'students'
+    keyset_ordering = ('last_name', 'first_name', 'pk')
+    search_fields = PERSON_SEARCH_FIELDS
 
 
-class NotificationsAdminView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
+class NotificationsAdminView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Notification
     template_name = 'main/notifications.html'
     context_object_name = 'notifs'
+    keyset_ordering = ('-date_time', '-pk')
+    search_fields = ('content__icontains',)
 
 
-class TeachersView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
+class TeachersView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = 'main/list-views/teachers-list.html'
     context_object_name = 'teachers'
+    keyset_ordering = ('last_name', 'first_name', 'pk')
+    search_fields = PERSON_SEARCH_FIELDS
 
     def get_queryset(self):
         return User.objects.filter(is_teacher=True, is_junioradmin=False, is_superuser=False)
 
 
-class StudentsWithoutGroup(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
+class StudentsWithoutGroup(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Student
     template_name = 'main/list-views/students-list.html'
     context_object_name = 'students'
+    keyset_ordering = ('last_name', 'first_name', 'pk')
+    search_fields = (*PERSON_SEARCH_FIELDS, 'number')
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -574,15 +578,20 @@ class StudentsViewGroups(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, Lis
         return context
 
 
-@login_required(login_url=reverse_lazy('login_page'))
-@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
-def students_view(request, group_id):
-    if not group_id:
-        return redirect('no-group-students-list')
+class StudentsView(StudentsWithoutGroup):
+    def get(self, request, *args, **kwargs):
+        if not self.kwargs['group_id']:
+            return redirect('no-group-students-list')
+        return super().get(request, *args, **kwargs)
 
-    return render(request, 'main/list-views/students-list.html',
-                  {'students': Student.objects.filter(group_id=group_id),
-                   'group': Group.objects.get(pk=group_id)})
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['group'] = Group.objects.get(pk=self.kwargs['group_id'])
+
+        return context
+
+    def get_queryset(self):
+        return Student.objects.filter(group_id=self.kwargs['group_id'])
 
 
 @login_required(login_url=reverse_lazy('login_page'))
@@ -591,12 +600,9 @@ def add_student_from_file(request):
     if request.method == 'POST':
         form = AddStudentsFileForm(data=request.POST, files=request.FILES)
         if form.is_valid():
-            errors = excel_handler_student(request)
-            if not errors:
-                return redirect('students-list', int(form.data['group'][0]))
-            else:
-                for error in errors:
-                    form.add_error('excel_file', error)
+            job = create_import_job(request, 'students', form.cleaned_data['excel_file'],
+                                    {'group': form.cleaned_data['group'].pk})
+            return redirect(job)
     else:
         form = AddStudentsFileForm()
     return render(request, 'main/create-views/student-excel.html', {'form': form})
@@ -614,16 +620,16 @@ class GroupsView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
     context_object_name = 'groups'
 
 
-class ModulesView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
+class ModulesView(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Module
     template_name = 'main/list-views/modules-list.html'
     context_object_name = 'modules'
+    keyset_ordering = ('module_name', 'pk')
+    search_fields = ('module_name__icontains', 'module_index__istartswith')
 
 
-class TopicsViewModules(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, ListView):
-    model = Module
+class TopicsViewModules(ModulesView):
     template_name = 'main/list-views/topics-list-modules.html'
-    context_object_name = 'modules'
 
 
 @login_required(login_url=reverse_lazy('login_page'))
@@ -639,17 +645,40 @@ def add_topic_from_file(request):
     if request.method == 'POST':
         form = AddTopicsFileForm(data=request.POST, files=request.FILES)
         if form.is_valid():
-            errors = excel_handler_topic(request)
-            if not errors:
-                return redirect('topics-list')
-            else:
-                for error in errors:
-                    form.add_error('excel_file', error)
+            job = create_import_job(request, 'topics', form.cleaned_data['excel_file'],
+                                    {'module': form.cleaned_data['module'].pk,
+                                     'update_existing': form.cleaned_data['update_existing']})
+            return redirect(job)
     else:
         form = AddTopicsFileForm()
     return render(request, 'main/create-views/topic-excel.html', {'form': form})
 
 
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def import_job(request, pk):
+    fail_stale_import_jobs()
+    job = ImportJob.objects.get(pk=pk)
+    result_url = None
+    if job.kind == 'students':
+        result_url = reverse('students-list', kwargs={'group_id': job.params['group']})
+    elif job.kind == 'topics':
+        result_url = reverse('topics-list', kwargs={'module_id': job.params['module']})
+
+    return render(request, 'main/import-job.html', {'job': job, 'result_url': result_url})
+
+
+@login_required(login_url=reverse_lazy('login_page'))
+@user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
+def import_job_status(request, pk):
+    fail_stale_import_jobs()
+    job = ImportJob.objects.only('status', 'rows_total', 'rows_processed').get(pk=pk)
+    return JsonResponse({'status': job.status,
+                         'status_display': str(job.get_status_display()),
+                         'rows_total': job.rows_total,
+                         'rows_processed': job.rows_processed})
+
+
 @login_required(login_url=reverse_lazy('login_page'))
 @user_passes_test(only_admin, login_url=reverse_lazy('main_page'))
 def download_pattern_topic(request):
@@ -675,6 +704,11 @@ class AddNotification(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, Create
     template_name = 'main/create-views/add-form.html'
     success_url = reverse_lazy('notifs-admin')
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        deliver_notification(self.object)
+        return response
+
 
 class AddUser(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, CreateView):
     form_class = UserForm
@@ -715,7 +749,7 @@ def add_topic(request, module_id):
             return redirect('topics-list', module_id=int(form.data['module']))
     else:
         form = TopicForm()
-        form.initial = {'module': module_id}
+        form.initial = {'module': module_id, 'position': next_topic_position(module_id)}
     return render(request, 'main/update-views/update-form.html', {'form': form})
 
 
@@ -748,6 +782,11 @@ class EditNotification(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, Updat
     context_object_name = 'notif'
     fields = '__all__'
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        deliver_notification(self.object)
+        return response
+
 
 class EditUser(ViewsMixin, LoginRequiredMixin, AdminRequiredMixin, UpdateView):
     model = User
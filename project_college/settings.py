@@ -52,6 +52,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.RoleContextMiddleware',
+    'main.middleware.PasswordChangeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -72,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.notifications',
             ],
         },
     },
@@ -83,11 +86,39 @@ WSGI_APPLICATION = 'project_college.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite unless DJANGO_DB_ENGINE=postgresql, the connection comes from DJANGO_DB_NAME, DJANGO_DB_USER,
+# DJANGO_DB_PASSWORD, DJANGO_DB_HOST and DJANGO_DB_PORT
+if os.environ.get('DJANGO_DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'project_college'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            # Persistent connections, checked before each request reuses them
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            # main.sqlite3 applies SQLITE_PRAGMAS and takes the write lock when a transaction starts,
+            # DJANGO_SQLITE_TUNING=0 falls back to the stock backend
+            'ENGINE': 'main.sqlite3' if os.environ.get('DJANGO_SQLITE_TUNING', '1') == '1'
+            else 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
     }
+# Several gunicorn workers share the SQLite file: WAL keeps reads going during a write, NORMAL syncs
+# on checkpoints only (safe in WAL mode), writers wait up to busy_timeout ms for the lock
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,
 }
 
 
@@ -160,3 +191,38 @@ INTERNAL_IPS = [
 DEFAULT_ACCOUNT_PASSWORD = '111111'
 DAY_NAMES = [_('Понедельник'), _('Вторник'), _('Среда'), _('Четверг'), _('Пятница'), _('Суббота')]
 MARK_VALUES = [*map(lambda x: str(x), range(1, MARKS_SYSTEM + 1)), 'a', 'н', 'ж']
+# Threads per process running Excel imports, 0 leaves them to "manage.py run_import_jobs".
+# The threads live in the web worker, a job is lost when gunicorn restarts or kills it; for anything
+# but small imports set 0 and keep "manage.py run_import_jobs --loop" running as its own service
+IMPORT_JOBS_WORKERS = 1
+# Seconds without progress after which a pending or running job is marked failed
+IMPORT_JOBS_STALE_TIMEOUT = 600
+# Worker processes of "manage.py build_reports" writing per-group workbooks, 0 writes them in the command's process.
+# The reports page always writes them in the web worker
+REPORTS_PROCESSES = 4
+# Timetables are cached per group and per teacher and dropped on every schedule change.
+# LocMemCache is per process, use a shared backend (FileBasedCache, DatabaseCache, Redis)
+# when running several workers so that invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+SCHEDULE_CACHE = 'default'
+SCHEDULE_CACHE_TIMEOUT = 60 * 60
+NOTIFICATION_CACHE = 'default'
+NOTIFICATION_CACHE_TIMEOUT = 60 * 60
+# Versions of the role context kept in sessions and the users of sessions, used by
+# main.middleware.SessionRoleContextMiddleware and main.backends.CachedModelBackend. Both are only enabled
+# in settings_production: with a per-process cache a change would only reach the worker that made it
+ROLE_CACHE = 'default'
+USER_CACHE = 'default'
+USER_CACHE_TIMEOUT = 5 * 60
+# Notifications per feed response and per notifications page
+NOTIFICATION_FEED_LIMIT = 20
+# Timetable generator: lesson times of a day, academic hours per lesson, weeks per semester
+LESSON_SLOTS = [('08:00', '09:30'), ('09:40', '11:10'), ('11:30', '13:00'), ('13:10', '14:40'),
+                ('14:50', '16:20'), ('16:30', '18:00')]
+LESSON_HOURS = 2
+SEMESTER_WEEKS = 18
+MAX_GROUP_LESSONS_PER_DAY = 4
@@ -0,0 +1,60 @@
+"""
+Production profile, used with DJANGO_SETTINGS_MODULE=project_college.settings_production.
+
+Everything not overridden here comes from project_college.settings. Environment variables:
+DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS (comma separated), DJANGO_SESSION_ENGINE
+(cached_db, cache, signed_cookies or db), DJANGO_REDIS_URL (shared cache, otherwise files in DJANGO_CACHE_DIR).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from project_college.settings import *
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'neptunus.kz,www.neptunus.kz').split(',')
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if not middleware.startswith('debug_toolbar.')]
+
+# gunicorn runs several worker processes, the caches (timetables, roles, session users, and sessions
+# with the cache engines) have to be shared between them
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
+# The cache is shared, so the session's user and role can be served from it, see main.checks
+AUTHENTICATION_BACKENDS = ['main.backends.CachedModelBackend']
+MIDDLEWARE = [middleware.replace('main.middleware.RoleContextMiddleware', 'main.middleware.SessionRoleContextMiddleware')
+              for middleware in MIDDLEWARE]
+
+# cached_db reads sessions from the cache and only writes through to the database,
+# signed_cookies keeps them in the browser and doesn't touch the database at all
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('DJANGO_SESSION_ENGINE', 'cached_db')]
+if SESSION_ENGINE == SESSION_ENGINES['signed_cookies'] and 'DJANGO_SECRET_KEY' not in os.environ:
+    raise ImproperlyConfigured('signed_cookies sessions are signed with SECRET_KEY, set DJANGO_SECRET_KEY')
+
+SESSION_COOKIE_SECURE = True
+SESSION_COOKIE_HTTPONLY = True
+CSRF_COOKIE_SECURE = True